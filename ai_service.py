@@ -2,6 +2,8 @@ import json
 import subprocess
 from fastapi.concurrency import run_in_threadpool
 
+import vendor_responses
+
 from .data_service import load_initiative_data, VENDOR_FOLDER
 
 
@@ -47,13 +49,10 @@ async def compare_vendors_from_ai(initiative_id: int) -> str:
     """
     Compares vendor responses using Ollama AI.
     """
-    combined_path = VENDOR_FOLDER / f"initiative_{initiative_id}" / "combined_vendor_responses.json"
-    if not combined_path.exists():
+    vendor_data = await run_in_threadpool(vendor_responses.load_texts, VENDOR_FOLDER / f"initiative_{initiative_id}")
+    if not vendor_data:
         raise FileNotFoundError("No vendor responses uploaded yet.")
 
-    with open(combined_path) as f:
-        vendor_data = json.load(f)
-
     prompt = f"""
 You are an RFP evaluation specialist. Compare the following vendor responses for initiative {initiative_id}.
 Each vendor's response includes their proposal for the same RFP.
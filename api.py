@@ -0,0 +1,280 @@
+"""
+JSON API for integrations and dashboards.
+
+    GET  /api/initiatives                 list, newest first, ``limit`` per page
+         ?cursor=...                      the ``next_cursor`` of the previous page
+         &request_type=Clinical           filters (case-insensitive; comma-separated values match any)
+         &services=Manufacturing
+         &status=compared
+         &fields=company_name,budget_range  project ``data`` to these fields
+         &comparison=false                leave out comparison summaries
+    GET  /api/initiatives/batch?ids=3,7   several initiatives in one call
+    POST /api/initiatives/batch           the same with {"ids": [...], "fields": [...], "comparison": true}
+    GET  /api/initiatives/{id}
+    GET  /api/initiatives/{id}/response_pages?file=X.pdf&first=1&last=10
+                                          page texts of one vendor response, including pages
+                                          past the extraction budget (read on demand)
+
+Each item carries the base and detail submissions merged into ``data``, the
+detail schemas saved, a ``status`` derived from which files exist and a
+summary of the latest comparison. Cursors are the last id of a page, so pages
+stay consistent while new initiatives are submitted. Parsed files are cached
+per (mtime, size), so repeated dashboard polls only re-read what changed; the
+``FILE_CACHE_SIZE`` least recently used files are kept.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+import storage
+import vendor_responses
+
+SUBMISSION_FOLDER = Path("data/submissions")
+RFP_FOLDER = Path("data/rfps")
+VENDOR_FOLDER = Path("data/vendor_responses")
+COMPARISON_FILE = "comparison_result.txt"
+MANIFEST_FILE = "responses_manifest.json"
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+MAX_BATCH = 500
+MAX_PAGES = 50  # per response_pages request
+# Furthest step reached, in workflow order
+STATUSES = ("submitted", "details_saved", "rfp_generated", "responses_uploaded", "compared")
+
+router = APIRouter(prefix="/api")
+
+FILE_CACHE_SIZE = 2048  # parsed files kept in memory, least recently used dropped first
+_file_cache = OrderedDict()  # path -> ((mtime_ns, size), parsed JSON)
+_file_cache_lock = threading.Lock()
+
+
+def _read_cached(path: Path, default=None):
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return default
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _file_cache_lock:
+        cached = _file_cache.get(path)
+        if cached and cached[0] == version:
+            _file_cache.move_to_end(path)
+            return cached[1]
+    try:
+        data = storage.read_json(path, default)
+    except ValueError:
+        return default
+    with _file_cache_lock:
+        _file_cache[path] = (version, data)
+        _file_cache.move_to_end(path)
+        while len(_file_cache) > FILE_CACHE_SIZE:
+            _file_cache.popitem(last=False)
+    return data
+
+
+# --- Building items ---
+def _scan() -> dict:
+    """One directory pass per folder: {id: {"details": [schema, ...], "rfp": bool, "responses": bool}}."""
+    initiatives = {}
+    with os.scandir(SUBMISSION_FOLDER) as entries:
+        for entry in entries:
+            match = re.fullmatch(r"initiative_(\d+)(?:_(.+))?\.json", entry.name)
+            if match:
+                record = initiatives.setdefault(int(match.group(1)), {"base": False, "details": []})
+                if match.group(2):
+                    record["details"].append(match.group(2))
+                else:
+                    record["base"] = True
+    initiatives = {i: r for i, r in initiatives.items() if r["base"]}
+    rfps = set(os.listdir(RFP_FOLDER)) if RFP_FOLDER.is_dir() else set()
+    uploads = set(os.listdir(VENDOR_FOLDER)) if VENDOR_FOLDER.is_dir() else set()
+    for initiative_id, record in initiatives.items():
+        record["details"].sort()
+        record["rfp"] = f"initiative_{initiative_id}_rfp.docx" in rfps
+        record["responses"] = f"initiative_{initiative_id}" in uploads
+    return initiatives
+
+
+def _status(initiative_id: int, scanned: dict) -> str:
+    upload_dir = VENDOR_FOLDER / f"initiative_{initiative_id}"
+    if scanned["responses"] and (upload_dir / COMPARISON_FILE).exists():
+        return "compared"
+    if scanned["responses"] and ((upload_dir / MANIFEST_FILE).exists()
+                                 or (upload_dir / vendor_responses.COMBINED_FILE).exists()):
+        return "responses_uploaded"
+    if scanned["rfp"]:
+        return "rfp_generated"
+    return "details_saved" if scanned["details"] else "submitted"
+
+
+def comparison_summary(initiative_id: int) -> dict:
+    """Ranking, recommendation and stability of the latest comparison, or None."""
+    path = VENDOR_FOLDER / f"initiative_{initiative_id}" / COMPARISON_FILE
+    result = _read_cached(path)
+    if not isinstance(result, dict):
+        return None
+    recommendation = result.get("recommendation", {})
+    summary = {
+        "compared_at": datetime.fromtimestamp(path.stat().st_mtime).isoformat(timespec="seconds"),
+        "top_vendors": recommendation.get("top_vendors", []),
+        "summary": recommendation.get("summary"),
+        "vendors": [{"vendor_name": v.get("vendor_name"), "response_file": v.get("response_file"),
+                     "weighted_score": v.get("weighted_score")} for v in result.get("vendors", [])],
+    }
+    if "stability" in result:
+        summary["stability"] = result["stability"]
+    return summary
+
+
+def _records(initiative_id: int, scanned: dict) -> tuple:
+    """(base, {schema: details}) as stored."""
+    base = _read_cached(SUBMISSION_FOLDER / f"initiative_{initiative_id}.json", {})
+    details = {schema: _read_cached(SUBMISSION_FOLDER / f"initiative_{initiative_id}_{schema}.json", {})
+               for schema in scanned["details"]}
+    return base, details
+
+
+def _values(value) -> set:
+    values = value if isinstance(value, list) else [value]
+    return {str(v).strip().lower() for v in values if v not in (None, "")}
+
+
+def _matches(base: dict, details: dict, status: str, filters: dict) -> bool:
+    if filters.get("request_type") and not _values(base.get("request_type")) & filters["request_type"]:
+        return False
+    if filters.get("services"):
+        offered = _values(base.get("services_needed"))
+        for record in details.values():
+            offered |= _values(record.get("services_needed"))
+        if not offered & filters["services"]:
+            return False
+    return not filters.get("status") or status in filters["status"]
+
+
+def _item(initiative_id: int, scanned: dict, base: dict, details: dict, status: str,
+          fields: list = None, with_comparison: bool = True) -> dict:
+    data = dict(base)
+    for schema in scanned["details"]:
+        data.update(details[schema])
+    data["initiative_id"] = initiative_id
+    if fields:
+        data = {field: data[field] for field in fields if field in data}
+    item = {"initiative_id": initiative_id, "status": status, "schemas": scanned["details"], "data": data}
+    if with_comparison:
+        item["comparison"] = comparison_summary(initiative_id) if status == "compared" else None
+    return item
+
+
+def _split(value) -> list:
+    if value is None:
+        return []
+    parts = value if isinstance(value, list) else str(value).split(",")
+    return [str(part).strip() for part in parts if str(part).strip()]
+
+
+def list_initiatives(limit: int = DEFAULT_LIMIT, cursor: str = None, filters: dict = None,
+                     fields: list = None, with_comparison: bool = True) -> dict:
+    """A page of initiatives, newest first, after ``cursor`` (the last id of the previous page)."""
+    limit = max(1, min(limit, MAX_LIMIT))
+    filters = {key: {v.lower() for v in values} for key, values in (filters or {}).items() if values}
+    scanned = _scan()
+    ids = sorted(scanned, reverse=True)
+    if cursor:
+        ids = [i for i in ids if i < int(cursor)]
+    items = []
+    for initiative_id in ids:
+        base, details = _records(initiative_id, scanned[initiative_id])
+        status = _status(initiative_id, scanned[initiative_id])
+        if not _matches(base, details, status, filters):
+            continue
+        if len(items) == limit:
+            # Only hand out a cursor when another matching item exists
+            return {"items": items, "next_cursor": str(items[-1]["initiative_id"])}
+        items.append(_item(initiative_id, scanned[initiative_id], base, details, status, fields, with_comparison))
+    return {"items": items, "next_cursor": None}
+
+
+def get_initiatives(ids: list, fields: list = None, with_comparison: bool = True) -> dict:
+    """Items for ``ids`` in the order given, plus the ids that do not exist."""
+    scanned = _scan()
+    items, missing = [], []
+    for initiative_id in dict.fromkeys(ids):
+        if initiative_id not in scanned:
+            missing.append(initiative_id)
+            continue
+        base, details = _records(initiative_id, scanned[initiative_id])
+        status = _status(initiative_id, scanned[initiative_id])
+        items.append(_item(initiative_id, scanned[initiative_id], base, details, status, fields, with_comparison))
+    return {"items": items, "missing": missing}
+
+
+# --- Routes ---
+def _error(message: str, status_code: int = 400) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+def _parse_ids(values) -> list:
+    ids = [int(v) for v in _split(values)]
+    if len(ids) > MAX_BATCH:
+        raise ValueError(f"at most {MAX_BATCH} ids per request")
+    return ids
+
+
+@router.get("/initiatives")
+async def api_list_initiatives(limit: int = DEFAULT_LIMIT, cursor: str = None, request_type: str = None,
+                               services: str = None, status: str = None, fields: str = None, comparison: bool = True):
+    if cursor is not None and not cursor.isdigit():
+        return _error("invalid cursor")
+    unknown = set(_split(status)) - set(STATUSES)
+    if unknown:
+        return _error(f"unknown status {', '.join(sorted(unknown))}; expected one of {', '.join(STATUSES)}")
+    filters = {"request_type": _split(request_type), "services": _split(services), "status": _split(status)}
+    return await storage.run(list_initiatives, limit, cursor, filters, _split(fields), comparison)
+
+
+@router.get("/initiatives/batch")
+async def api_batch_get(ids: str = "", fields: str = None, comparison: bool = True):
+    try:
+        parsed = _parse_ids(ids)
+    except ValueError as e:
+        return _error(f"invalid ids: {e}")
+    return await storage.run(get_initiatives, parsed, _split(fields), comparison)
+
+
+@router.post("/initiatives/batch")
+async def api_batch_post(request: Request):
+    try:
+        body = await request.json()
+        parsed = _parse_ids(body.get("ids", []))
+    except (ValueError, TypeError, AttributeError) as e:
+        return _error(f"expected {{\"ids\": [...]}}: {e}")
+    return await storage.run(get_initiatives, parsed, _split(body.get("fields")), bool(body.get("comparison", True)))
+
+
+@router.get("/initiatives/{initiative_id}")
+async def api_get_initiative(initiative_id: int, fields: str = None, comparison: bool = True):
+    result = await storage.run(get_initiatives, [initiative_id], _split(fields), comparison)
+    if not result["items"]:
+        return _error("Initiative not found", 404)
+    return result["items"][0]
+
+
+@router.get("/initiatives/{initiative_id}/response_pages")
+async def api_response_pages(initiative_id: int, file: str, first: int = 1, last: int = None):
+    upload_dir = VENDOR_FOLDER / f"initiative_{initiative_id}"
+    manifest = await storage.run(vendor_responses.load_manifest, upload_dir)
+    record = manifest.get(file)
+    if record is None:
+        return _error("Vendor response not found", 404)
+    last = min(last or first + MAX_PAGES - 1, first + MAX_PAGES - 1)
+    pages = await storage.run(vendor_responses.load_pages, upload_dir, file, first, last)
+    return {
+        "file": file, "page_count": record.get("pages"), "pages_extracted": record.get("pages_extracted"),
+        "truncated": record.get("truncated", False),
+        "pages": [{"page": number, "text": text} for number, text in pages],
+    }
@@ -0,0 +1,300 @@
+"""
+Reprocesses stored initiatives after a change to extraction, scoring or indexing.
+
+Walks every initiative in ``data/submissions`` and ``data/vendor_responses``
+and runs the selected steps on each one in a process pool. Each step calls the
+same functions as the web routes:
+
+* ``extract``: re-extracts vendor texts from the original files in the blob
+  store. It rewrites the texts, chunk index, similarity report and search
+  entries, as an upload does, but keeps the upload times. Folders still in
+  the legacy combined-file layout are re-extracted from their raw files and
+  migrated on the way (without deleting the legacy files). Vendors whose
+  original file is gone keep their stored text and are counted as missing.
+* ``compare``: re-runs the comparison and its .txt/.docx/.xlsx exports, as
+  /compare_vendors does. Cached evaluations of unchanged vendors are reused
+  unless ``--rescore`` is given. ``--samples N`` compares with an ensemble.
+* ``index``: re-indexes the submissions and vendor texts for search.
+
+Each finished initiative is appended to ``data/batch/checkpoint.jsonl``. A run
+that was interrupted therefore resumes where it stopped, and initiatives that
+failed are retried. Changing the steps, ``--rescore`` or ``--samples``
+starts over.
+
+Usage:
+    python batch.py run                                    # every step, one worker per CPU
+    python batch.py run --steps extract,index --workers 4 --ids 3,7
+    python batch.py run --restart --rescore                # ignore the checkpoint, re-evaluate every vendor
+    python batch.py status
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+
+import blob_store
+import event_log
+import search_index
+import storage
+import vendor_responses
+
+SUBMISSION_FOLDER = Path("data/submissions")
+VENDOR_FOLDER = vendor_responses.VENDOR_FOLDER
+CHECKPOINT_FILE = Path("data/batch/checkpoint.jsonl")
+STEPS = ("extract", "compare", "index")
+COUNTERS = ("files", "bytes", "changed", "missing", "rescored", "unstable")  # summed per initiative and per run
+PROGRESS_EVERY = 10  # print a progress line every N initiatives
+
+
+def initiative_ids(submission_folder: Path = SUBMISSION_FOLDER, vendor_folder: Path = VENDOR_FOLDER) -> list:
+    """Ids of every initiative with a base submission or an upload folder."""
+    ids = set()
+    for path in submission_folder.glob("initiative_*.json"):
+        if match := re.fullmatch(r"initiative_(\d+)\.json", path.name):
+            ids.add(int(match.group(1)))
+    for path in vendor_responses.initiative_folders(vendor_folder):
+        if match := re.fullmatch(r"initiative_(\d+)", path.name):
+            ids.add(int(match.group(1)))
+    return sorted(ids)
+
+
+# --- Steps (run in the worker processes) ---
+def reextract(initiative_id: int) -> dict:
+    import comparison
+    import main
+
+    upload_dir = VENDOR_FOLDER / f"initiative_{initiative_id}"
+    # Held from reading the manifest to writing it back, so an upload in the meantime
+    # (a "replace" that drops vendors, say) is never overwritten with the old set
+    with storage.initiative_lock(initiative_id):
+        manifest = vendor_responses.load_manifest(upload_dir)
+        uploads, page_texts, missing = {}, {}, []
+        for filename, record in manifest.items():
+            original = vendor_responses.read_original(upload_dir, filename, record)
+            if original is None:
+                missing.append(filename)
+                continue
+            uploads[filename], page_texts[filename] = main.extract_upload(filename, original)
+            # Legacy raw files go into the blob store like any upload
+            uploads[filename].update(blob=record.get("blob") or blob_store.put(original),
+                                     uploaded_at=record.get("uploaded_at"))
+        if not uploads:
+            return {"missing": len(missing)}
+
+        # The file hashes stay the same, so evaluations of vendors whose text changed must go explicitly
+        changed = [filename for filename, upload in uploads.items()
+                   if vendor_responses.load_text(upload_dir, filename, manifest).strip() != upload["text"]]
+        if changed:
+            evaluations = comparison.load_evaluations(upload_dir)
+            comparison.save_evaluations(upload_dir, {k: v for k, v in evaluations.items() if k not in changed})
+        # Append mode keeps the vendors that could not be re-extracted
+        manifest = main.store_vendor_upload(upload_dir, uploads, page_texts, "append")
+    texts = {filename: upload["text"] for filename, upload in uploads.items()}
+    sources = {filename: vendor_responses.text_path(upload_dir, filename, manifest) for filename in manifest}
+    search_index.index_vendor_responses(initiative_id, texts, sources, list(manifest))
+    event_log.append("vendor_responses_reextracted", initiative_id, changed=changed, files={
+        filename: {key: upload[key] for key in ("sha256", "pages", "extraction_ms")} for filename, upload in uploads.items()
+    })
+    return {"files": len(uploads), "bytes": sum(upload["size"] for upload in uploads.values()),
+            "changed": len(changed), "missing": len(missing)}
+
+
+def recompare(initiative_id: int, rescore: bool = False, samples: int = 1) -> dict:
+    import comparison
+    import main
+
+    upload_dir = VENDOR_FOLDER / f"initiative_{initiative_id}"
+    vendors = list(vendor_responses.load_manifest(upload_dir))
+    if not vendors:
+        return {"rescored": 0}
+    model = main.get_gemini_model()
+    if not model:
+        raise RuntimeError("Gemini API is not configured. Set GOOGLE_API_KEY.")
+    with storage.initiative_lock(initiative_id):
+        if rescore:
+            comparison.save_evaluations(upload_dir, {})
+        result = main.compare_and_export(initiative_id, upload_dir, vendors, model, samples)
+    parsed_data = result["data"]
+    unstable = parsed_data.get("stability", {}).get("unstable", False)
+    main.record_vendor_participation(parsed_data, initiative_id)
+    event_log.append("comparison_run", initiative_id, rescored=result["rescored"],
+                     reused=result["reused"], top_vendors=parsed_data["recommendation"]["top_vendors"],
+                     samples=samples, unstable=unstable)
+    return {"rescored": len(result["rescored"]), "unstable": int(unstable)}
+
+
+def reindex(initiative_id: int) -> dict:
+    search_index.reindex_initiative(initiative_id)
+    upload_dir = VENDOR_FOLDER / f"initiative_{initiative_id}"
+    if upload_dir.is_dir():
+        manifest = vendor_responses.load_manifest(upload_dir)
+        texts = vendor_responses.load_texts(upload_dir)
+        sources = {filename: vendor_responses.text_path(upload_dir, filename, manifest) for filename in manifest}
+        search_index.index_vendor_responses(initiative_id, texts, sources, list(manifest))
+    return {}
+
+
+def process_initiative(job: tuple) -> dict:
+    """Runs ``steps`` on one initiative; returns its checkpoint record. Never raises."""
+    initiative_id, steps, rescore, samples = job
+    result = {"initiative_id": initiative_id, "status": "ok", "steps": {}, **dict.fromkeys(COUNTERS, 0)}
+    started = time.perf_counter()
+    try:
+        for step in steps:
+            step_started = time.perf_counter()
+            if step == "extract":
+                stats = reextract(initiative_id)
+            elif step == "compare":
+                stats = recompare(initiative_id, rescore, samples)
+            else:
+                stats = reindex(initiative_id)
+            for counter in COUNTERS:
+                result[counter] += stats.get(counter, 0)
+            result["steps"][step] = round(time.perf_counter() - step_started, 3)
+    except Exception as e:
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+    finally:
+        event_log.flush()
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+# --- Checkpoint ---
+def read_checkpoint(checkpoint_file: Path = CHECKPOINT_FILE) -> tuple:
+    """``(header, {initiative_id: latest record})`` of the checkpoint, or ``(None, {})``."""
+    if not checkpoint_file.exists():
+        return None, {}
+    header, done = None, {}
+    with open(checkpoint_file, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interruption
+            if header is None:
+                header = record
+            else:
+                done[record["initiative_id"]] = record
+    return header, done
+
+
+def _ends_mid_line(path: Path) -> bool:
+    with open(path, "rb") as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+def run_batch(steps: list, workers: int = None, ids: list = None, restart: bool = False,
+              rescore: bool = False, samples: int = 1, checkpoint_file: Path = CHECKPOINT_FILE) -> dict:
+    """Processes every initiative not yet done in the checkpoint; returns throughput stats."""
+    steps = [step for step in STEPS if step in steps]
+    signature = {"steps": steps, "rescore": rescore, "samples": samples}
+    header, done = read_checkpoint(checkpoint_file)
+    if restart or header is None or header.get("signature") != signature:
+        header, done = {"signature": signature, "started_at": datetime.now().isoformat(timespec="seconds")}, {}
+        storage.atomic_write_text(checkpoint_file, json.dumps(header) + "\n")
+    todo = [i for i in (ids if ids is not None else initiative_ids()) if done.get(i, {}).get("status") != "ok"]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo) or 1))
+    print(f"{len(todo)} initiative(s) to process with {workers} worker(s), "
+          f"{len(done)} already in the checkpoint; steps: {', '.join(steps)}.")
+
+    stats = {"processed": 0, "errors": 0, **dict.fromkeys(COUNTERS, 0), "step_seconds": dict.fromkeys(steps, 0.0)}
+    jobs = [(initiative_id, steps, rescore, samples) for initiative_id in todo]
+    started = time.perf_counter()
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    results = pool.imap_unordered(process_initiative, jobs) if pool else map(process_initiative, jobs)
+    try:
+        with open(checkpoint_file, "a") as checkpoint:
+            if _ends_mid_line(checkpoint_file):
+                checkpoint.write("\n")  # the last record was cut short by an interruption
+            for result in results:
+                checkpoint.write(json.dumps(result) + "\n")
+                checkpoint.flush()
+                stats["processed"] += 1
+                for counter in COUNTERS:
+                    stats[counter] += result[counter]
+                for step, seconds in result["steps"].items():
+                    stats["step_seconds"][step] += seconds
+                if result["status"] != "ok":
+                    stats["errors"] += 1
+                    print(f"initiative {result['initiative_id']}: {result['error']}")
+                if stats["processed"] % PROGRESS_EVERY == 0:
+                    elapsed = time.perf_counter() - started
+                    print(f"{stats['processed']}/{len(todo)} done, {stats['processed'] / elapsed:.1f} initiatives/s")
+    except KeyboardInterrupt:
+        stats["interrupted"] = True
+    finally:
+        if pool:
+            if stats.get("interrupted"):
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def _report(stats: dict):
+    seconds = max(stats["seconds"], 1e-9)
+    print(f"Processed {stats['processed']} initiative(s) in {seconds:.1f}s "
+          f"({stats['processed'] / seconds:.2f}/s), {stats['errors']} error(s).")
+    if stats["files"]:
+        print(f"Re-extracted {stats['files']} file(s), {stats['bytes'] / 1e6:.1f} MB "
+              f"({stats['files'] / seconds:.1f} files/s, {stats['bytes'] / 1e6 / seconds:.2f} MB/s); "
+              f"{stats['changed']} text(s) changed.")
+    if stats["missing"]:
+        print(f"{stats['missing']} vendor file(s) could not be re-extracted: the original is gone.")
+    if "compare" in stats["step_seconds"]:
+        unstable = f"; {stats['unstable']} ranking(s) unstable across samples" if stats["unstable"] else ""
+        print(f"Re-evaluated {stats['rescored']} vendor(s){unstable}.")
+    if stats["processed"]:
+        print("Mean seconds per initiative: " + ", ".join(
+            f"{step} {total / stats['processed']:.3f}" for step, total in stats["step_seconds"].items()))
+    if stats.get("interrupted"):
+        print("Interrupted; run the same command again to resume.")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Reprocess stored initiatives in parallel, resumably.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="Re-extract, re-compare and re-index initiatives.")
+    run_cmd.add_argument("--steps", default=",".join(STEPS), help=f"comma-separated subset of {', '.join(STEPS)}")
+    run_cmd.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    run_cmd.add_argument("--ids", default=None, help="comma-separated initiative ids (default: all)")
+    run_cmd.add_argument("--restart", action="store_true", help="ignore the checkpoint of an earlier run")
+    run_cmd.add_argument("--rescore", action="store_true", help="drop cached evaluations before comparing")
+    run_cmd.add_argument("--samples", type=int, default=1, help="compare with an ensemble of this many samples")
+    sub.add_parser("status", help="Summarise the checkpoint of the last run.")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        steps = [step.strip() for step in args.steps.split(",") if step.strip()]
+        unknown = set(steps) - set(STEPS)
+        if unknown:
+            parser.error(f"unknown step(s): {', '.join(sorted(unknown))}")
+        ids = [int(i) for i in args.ids.split(",")] if args.ids else None
+        _report(run_batch(steps, args.workers, ids, args.restart, args.rescore, args.samples))
+    else:
+        header, done = read_checkpoint()
+        if header is None:
+            print("No checkpoint.")
+            return
+        errors = {i: r for i, r in done.items() if r["status"] != "ok"}
+        signature = header["signature"]
+        options = (" (rescore)" if signature["rescore"] else "") + (
+            f", {signature['samples']} samples" if signature.get("samples", 1) > 1 else "")
+        print(f"Run started {header['started_at']}, steps: {', '.join(signature['steps'])}{options}.")
+        print(f"{len(done) - len(errors)} done, {len(errors)} failed, "
+              f"{len(set(initiative_ids()) - set(done))} not yet processed.")
+        for initiative_id, record in sorted(errors.items()):
+            print(f"  initiative {initiative_id}: {record['error']}")
+
+
+if __name__ == "__main__":
+    main_cli()
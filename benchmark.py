@@ -0,0 +1,505 @@
+"""
+Benchmark suite for the RFP assistant hot paths.
+
+Every case runs inside a throw-away working directory (all app paths are
+relative, so each case gets its own ``data/`` tree) and uses the deterministic
+``FakeGeminiModel`` instead of Gemini. For each case we report latency
+percentiles and the peak traced memory of a single run (the startup case
+runs in fresh interpreters and reports their peak RSS instead). Results are stored in
+``bench_results/`` and compared with the previous run so regressions show up.
+
+Usage:
+    python benchmark.py                      # full suite
+    python benchmark.py --quick              # small sizes, few repeats
+    python benchmark.py --cases list_initiatives,compare_vendors
+    python benchmark.py --baseline bench_results/20250101T120000.json
+"""
+import argparse
+import asyncio
+import gzip
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = REPO_DIR / "bench_results"
+SAMPLE_VENDOR_DIR = REPO_DIR / "data" / "vendor_responses"
+REGRESSION_THRESHOLD = 0.20  # flag cases whose p50 got >20% slower
+
+sys.path.insert(0, str(REPO_DIR))
+from fake_llm import FakeGeminiModel  # noqa: E402
+from synthetic_data import DETAIL_SCHEMA, make_initiative, write_initiatives, write_schemas  # noqa: E402
+import storage  # noqa: E402
+import vendor_responses  # noqa: E402
+
+APP_DIRS = ["data/submissions", "data/rfps", "data/vendor_responses", "global", "schema", "templates/rfp_templates"]
+
+
+# --- Helpers ---
+def percentile(sorted_values: list, q: float) -> float:
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(samples: list, peak_bytes: int) -> dict:
+    values = sorted(samples)
+    return {
+        "runs": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+        "peak_kib": round(peak_bytes / 1024, 1),
+    }
+
+
+def http_request(headers: dict = None):
+    """A bare ``Request`` for calling route handlers directly."""
+    from starlette.requests import Request
+
+    raw = [(key.encode(), value.encode()) for key, value in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def measure(fn, repeats: int) -> dict:
+    """Times ``fn`` ``repeats`` times, then runs it once more under tracemalloc."""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return summarize(samples, peak)
+
+
+def enter_workdir(root: Path, name: str) -> Path:
+    """Creates a fresh app working directory for a case and chdirs into it."""
+    workdir = root / name
+    for folder in APP_DIRS:
+        (workdir / folder).mkdir(parents=True, exist_ok=True)
+    os.chdir(workdir)
+    return workdir
+
+
+def run(loop, coro):
+    return loop.run_until_complete(coro)
+
+
+# --- Synthetic inputs ---
+def large_schema(sections: int = 40, fields_per_section: int = 25) -> dict:
+    types = ["text", "number", "textarea", "select", "checkbox", "radio", "email"]
+    fields = []
+    for s in range(sections):
+        for n in range(fields_per_section):
+            ftype = types[(s + n) % len(types)]
+            field = {"name": f"field_{s}_{n}", "label": f"Field {s}.{n}", "type": ftype, "section": f"Section {s}"}
+            if ftype in ("select", "checkbox", "radio"):
+                field["options"] = [f"Option {k}" for k in range(12)]
+            fields.append(field)
+    return {"title": "Large Benchmark Form", "fields": fields}
+
+
+def seven_vendor_comparison() -> dict:
+    model = FakeGeminiModel()
+    names = {f"Vendor {chr(65 + i)} Response.pdf": "" for i in range(7)}
+    prompt = f"Vendor Responses:\n{json.dumps(names, indent=2)}\n\n**JSON Output Structure:**"
+    return json.loads(model.generate_content(prompt).text)
+
+
+def vendor_text(name: str, paragraphs: int = 60) -> str:
+    body = []
+    for p in range(paragraphs):
+        body.append(
+            f"Section {p} - {name} operates FDA and EMA inspected facilities with validated "
+            f"fill-finish lines, dedicated program management and dual-site supply for batch {p}."
+        )
+    return "\n".join(body)
+
+
+def store_vendor_texts(upload_dir: Path, count: int = 7, paragraphs: int = 60):
+    """Stores ``count`` synthetic vendor responses the way an upload does."""
+    uploads = {}
+    for i in range(count):
+        text = vendor_text(f"Vendor {chr(65 + i)}", paragraphs)
+        uploads[f"Vendor {chr(65 + i)} Response.pdf"] = {
+            "text": text, "sha256": vendor_responses.content_hash(text.encode("utf-8")), "size": len(text), "pages": 10,
+        }
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    vendor_responses.save_responses(upload_dir, uploads)
+
+
+# --- Cases ---
+def case_list_initiatives(main, loop, root: Path, sizes: list, repeats: int) -> dict:
+    import api
+
+    results = {}
+    for size in sizes:
+        enter_workdir(root, f"list_{size}")
+        write_initiatives(size, Path("data/submissions"), detail_ratio=0.5)
+        case_repeats = max(2, repeats if size <= 10000 else repeats // 5)
+        results[f"list_initiatives[{size}]"] = measure(
+            lambda: run(loop, main.list_initiatives(http_request())), case_repeats)
+        # Browser revalidating an unchanged list: only the directory is scanned
+        etag = run(loop, main.list_initiatives(http_request())).headers["etag"]
+        revalidate = http_request({"if-none-match": etag})
+        results[f"list_initiatives[{size}, 304]"] = measure(
+            lambda: run(loop, main.list_initiatives(revalidate)), case_repeats)
+        # JSON API: one filtered, projected page (files are parsed once, then served from the cache)
+        results[f"api_initiatives[{size}, page of 50]"] = measure(
+            lambda: api.list_initiatives(50, None, {"request_type": ["Commercial"]}, ["company_name", "budget_range"]),
+            case_repeats)
+    return results
+
+
+def case_generate_form_html(main, loop, root: Path, repeats: int) -> dict:
+    enter_workdir(root, "form")
+    schema = large_schema()
+    defaults = {f["name"]: "Option 3" for f in schema["fields"]}
+    return {
+        "generate_form_html[1000 fields]": measure(lambda: main.generate_form_html(schema, defaults=defaults), repeats),
+    }
+
+
+def case_validate_form(main, loop, root: Path, repeats: int) -> dict:
+    import validators
+
+    enter_workdir(root, "validate")
+    schema = large_schema()
+    storage.atomic_write_json(Path("schema/large.json"), schema)
+    items = []
+    for field in schema["fields"]:
+        if field["type"] == "number":
+            items.append((field["name"], "1,250"))
+        elif field["type"] == "checkbox":
+            items += [(field["name"], "Option 1"), (field["name"], "Option 4")]
+        elif field["type"] in ("select", "radio"):
+            items.append((field["name"], "Option 3"))
+        else:
+            items.append((field["name"], "value"))
+    return {
+        "validate_form[1000 fields]": measure(lambda: validators.validate_form("large", items), repeats),
+    }
+
+
+def case_upload_vendor_files(main, loop, root: Path, repeats: int) -> dict:
+    from starlette.datastructures import UploadFile
+
+    enter_workdir(root, "upload")
+    pdfs = {}
+    for path in sorted(SAMPLE_VENDOR_DIR.glob("initiative_*/*.pdf")):
+        pdfs.setdefault(path.name, path.read_bytes())
+    # Sample folders that were already migrated keep their PDFs in the blob store
+    for path in sorted((REPO_DIR / "data/blobs").glob("??/*")):
+        content = gzip.decompress(path.read_bytes()) if path.suffix == ".gz" else path.read_bytes()
+        if content.startswith(b"%PDF"):
+            pdfs.setdefault(f"{path.name[:12]}.pdf", content)
+    if len(pdfs) < 2:
+        return {}
+
+    def upload():
+        files = [UploadFile(file=io.BytesIO(content), filename=name) for name, content in pdfs.items()]
+        run(loop, main.upload_vendor_files(1, files))
+
+    return {f"upload_vendor_files[{len(pdfs)} pdfs]": measure(upload, repeats)}
+
+
+def case_rfp_result(main, loop, root: Path, repeats: int) -> dict:
+    enter_workdir(root, "rfp")
+    base, details = make_initiative(1, random.Random(0))
+    with open("data/submissions/initiative_1.json", "w") as f:
+        json.dump(base, f)
+    with open(f"data/submissions/initiative_1_{DETAIL_SCHEMA}.json", "w") as f:
+        json.dump(details, f)
+    section = "\n".join(f"## {key}\n{key.replace('_', ' ')}: {{{{{key}}}}}\n" for key in {**base, **details})
+    template = "# RFP {{project_name}}\nDate: {{CURRENT_DATE}}\n\n" + section * 20
+    Path(f"templates/rfp_templates/{DETAIL_SCHEMA}.txt").write_text(template)
+    import rfp_docx
+
+    markdown = "\n".join(f"## Section {i}\n- **Requirement** {i}\n  - detail *{i}*\n1. step\n| a | b |\n|---|---|\n| {i} | x |"
+                         for i in range(200))
+    return {
+        # The RFP text does not change between runs, so the .docx is reused after the first
+        "rfp_result[template]": measure(lambda: run(loop, main.rfp_result(1, DETAIL_SCHEMA, http_request())), repeats),
+        "rfp_docx[markdown, 200 sections]": measure(lambda: rfp_docx.markdown_to_docx(markdown), repeats),
+    }
+
+
+def case_comparison_exports(main, loop, root: Path, repeats: int) -> dict:
+    enter_workdir(root, "exports")
+    (Path("data/vendor_responses") / "initiative_1").mkdir(parents=True, exist_ok=True)
+    data = seven_vendor_comparison()
+    return {
+        "save_comparison_docx[7 vendors]": measure(lambda: main.save_comparison_docx(data, 1), repeats),
+        "save_comparison_xlsx[7 vendors]": measure(lambda: main.save_comparison_xlsx(data, 1), repeats),
+    }
+
+
+def case_compare_vendors(main, loop, root: Path, repeats: int) -> dict:
+    enter_workdir(root, "compare")
+    upload_dir = Path("data/vendor_responses") / "initiative_1"
+    store_vendor_texts(upload_dir)
+    main.gemini_model = FakeGeminiModel()
+
+    def cold():
+        # Drop cached evaluations so every vendor is re-scored
+        (upload_dir / "vendor_evaluations.json").unlink(missing_ok=True)
+        run(loop, main.compare_vendors_page(1))
+
+    results = {
+        "compare_vendors_page[7 vendors, cold]": measure(cold, repeats),
+        "compare_vendors_page[7 vendors, cached]": measure(lambda: run(loop, main.compare_vendors_page(1)), repeats),
+    }
+
+    # Five samples against a model with 50 ms latency: one concurrent ensemble vs. five re-clicks
+    main.gemini_model = FakeGeminiModel(latency=0.05)
+    samples = 5
+
+    def reclicks():
+        for _ in range(samples):
+            cold()
+
+    def ensemble():
+        (upload_dir / "vendor_evaluations.json").unlink(missing_ok=True)
+        run(loop, main.compare_vendors_page(1, samples=samples))
+
+    results[f"compare_vendors_page[{samples} sequential cold runs, 50ms model]"] = measure(reclicks, repeats)
+    results[f"compare_vendors_page[{samples}-sample ensemble, 50ms model]"] = measure(ensemble, repeats)
+    return results
+
+
+def case_vendor_responses(main, loop, root: Path, repeats: int) -> dict:
+    """Upload status (manifest only) vs. loading one or all of seven large responses."""
+    enter_workdir(root, "vendor_responses")
+    upload_dir = Path("data/vendor_responses") / "initiative_1"
+    store_vendor_texts(upload_dir, paragraphs=3000)
+    return {
+        "vendor_responses[manifest]": measure(lambda: vendor_responses.load_manifest(upload_dir), repeats),
+        "vendor_responses[1 of 7 texts]": measure(
+            lambda: vendor_responses.load_texts(upload_dir, ["Vendor A Response.pdf"]), repeats),
+        "vendor_responses[7 texts]": measure(lambda: vendor_responses.load_texts(upload_dir), repeats),
+    }
+
+
+def case_mixed_load(main, loop, root: Path, repeats: int) -> dict:
+    """Light page loads while comparisons and RFP exports are written, with and without thread offload.
+
+    Readers keep loading small pages until a fixed amount of export work is
+    done; throughput is the number of page loads they completed per second.
+    """
+    import httpx
+    import storage
+
+    enter_workdir(root, "mixed")
+    write_initiatives(200, Path("data/submissions"))
+    write_schemas(Path("schema"))
+    section = "\n".join(f"## {key}\n{key.replace('_', ' ')}: {{{{{key}}}}}\n" for key in make_initiative(1, random.Random(0))[1])
+    Path(f"templates/rfp_templates/{DETAIL_SCHEMA}.txt").write_text("# RFP {{project_name}}\n\n" + section * 5)
+    upload_dir = Path("data/vendor_responses") / "initiative_1"
+    store_vendor_texts(upload_dir)
+    main.gemini_model = FakeGeminiModel()
+    app = main.create_app()
+    exports_per_worker = max(2, repeats // 2)
+    light_pages = ["/health", "/initiative/{id}", "/edit/{id}", "/upload_vendor_responses/{id}"]
+
+    async def scenario():
+        latencies = []
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            exports_done = asyncio.Event()
+
+            async def exporter():
+                for _ in range(exports_per_worker):
+                    (upload_dir / "vendor_evaluations.json").unlink(missing_ok=True)
+                    await client.get("/compare_vendors/1")
+                    await client.get(f"/rfp_result/1/{DETAIL_SCHEMA}")
+
+            async def exporters():
+                await asyncio.gather(*[exporter() for _ in range(2)])
+                exports_done.set()
+
+            async def reader(worker: int):
+                i = 0
+                while not exports_done.is_set():
+                    path = light_pages[i % len(light_pages)].format(id=2 + (worker * 7 + i) % 150)
+                    start = time.perf_counter()
+                    await client.get(path)
+                    latencies.append(time.perf_counter() - start)
+                    i += 1
+                    # The in-memory transport never suspends on a socket; yield like a real client would
+                    await asyncio.sleep(0)
+
+            start = time.perf_counter()
+            await asyncio.gather(exporters(), *[reader(w) for w in range(8)])
+            elapsed = time.perf_counter() - start
+        return latencies, elapsed
+
+    async def inline(fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    results = {}
+    for label, offload in (("offloaded", True), ("inline", False)):
+        original = storage.run
+        if not offload:
+            storage.run = inline  # what every handler did before: blocking I/O on the event loop
+        try:
+            latencies, elapsed = run(loop, scenario())
+        finally:
+            storage.run = original
+        summary = summarize(latencies, 0)
+        summary["throughput_rps"] = round(len(latencies) / elapsed, 1)
+        results[f"mixed_load[page loads during exports, {label}]"] = summary
+    return results
+
+
+STARTUP_SCRIPT = """
+import resource, time
+start = time.perf_counter()
+import main
+application = main.create_app()
+if {prewarm}:
+    main.prewarm()
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def case_startup(main, loop, root: Path, repeats: int) -> dict:
+    """Import + app creation in a fresh interpreter, lazily and with every dependency prewarmed."""
+    workdir = enter_workdir(root, "startup")
+    env = {**os.environ, "PYTHONPATH": str(REPO_DIR), "USE_FAKE_LLM": "1"}
+    results = {}
+    for label, prewarm in (("lazy", False), ("prewarmed", True)):
+        samples, peak_kib = [], 0
+        for _ in range(max(3, min(repeats, 10))):
+            output = subprocess.run(
+                [sys.executable, "-c", STARTUP_SCRIPT.format(prewarm=prewarm)],
+                cwd=workdir, env=env, capture_output=True, text=True, check=True,
+            ).stdout.split()
+            samples.append(float(output[0]))
+            peak_kib = max(peak_kib, int(output[1]))  # ru_maxrss is in KiB on Linux
+        results[f"startup[{label}]"] = summarize(samples, peak_kib * 1024)
+    return results
+
+
+CASES = {
+    "startup": case_startup,
+    "list_initiatives": case_list_initiatives,
+    "generate_form_html": case_generate_form_html,
+    "validate_form": case_validate_form,
+    "upload_vendor_files": case_upload_vendor_files,
+    "rfp_result": case_rfp_result,
+    "comparison_exports": case_comparison_exports,
+    "compare_vendors": case_compare_vendors,
+    "vendor_responses": case_vendor_responses,
+    "mixed_load": case_mixed_load,
+}
+
+
+# --- Result storage ---
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def latest_result(exclude: Path = None) -> Path:
+    runs = sorted(p for p in RESULTS_DIR.glob("*.json") if p != exclude)
+    return runs[-1] if runs else None
+
+
+def print_report(results: dict, baseline: dict = None):
+    header = f"{'case':<40} {'runs':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'peak KiB':>10}"
+    if baseline:
+        header += f" {'Δp50':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        line = f"{name:<40} {r['runs']:>5} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['p99_ms']:>10.2f} {r['peak_kib']:>10.1f}"
+        previous = (baseline or {}).get(name)
+        if previous and previous.get("p50_ms"):
+            delta = (r["p50_ms"] - previous["p50_ms"]) / previous["p50_ms"]
+            flag = "  REGRESSION" if delta > REGRESSION_THRESHOLD else ""
+            line += f" {delta:>+7.0%}{flag}"
+        if "throughput_rps" in r:
+            line += f"  ({r['throughput_rps']} req/s)"
+        print(line)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark the RFP assistant hot paths.")
+    parser.add_argument("--cases", default=",".join(CASES), help="Comma separated case names.")
+    parser.add_argument("--sizes", default="100,10000,100000", help="Initiative counts for list_initiatives.")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--quick", action="store_true", help="Small sizes and few repeats.")
+    parser.add_argument("--baseline", help="Result file to compare against (default: previous run).")
+    parser.add_argument("--no-save", action="store_true", help="Do not store the results.")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    repeats = args.repeats
+    if args.quick:
+        sizes, repeats = [100, 1000], 5
+
+    root = Path(tempfile.mkdtemp(prefix="rfp_bench_"))
+    cwd = os.getcwd()
+    enter_workdir(root, "import")
+    import main  # imported inside the scratch dir so its folder setup stays there
+
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        for name in args.cases.split(","):
+            case = CASES[name]
+            print(f"running {name} ...", file=sys.stderr)
+            if name == "list_initiatives":
+                results.update(case(main, loop, root, sizes, repeats))
+            else:
+                results.update(case(main, loop, root, repeats))
+    finally:
+        loop.close()
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+    baseline_path = Path(args.baseline) if args.baseline else latest_result()
+    baseline = json.loads(baseline_path.read_text())["results"] if baseline_path and baseline_path.exists() else None
+    print_report(results, baseline)
+    if baseline_path and baseline:
+        print(f"\ncompared with {baseline_path}")
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        out = RESULTS_DIR / f"{stamp}.json"
+        out.write_text(json.dumps({
+            "timestamp": stamp,
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }, indent=2))
+        print(f"results saved to {out}")
+
+
+if __name__ == "__main__":
+    main_cli()
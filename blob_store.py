@@ -0,0 +1,119 @@
+"""
+Content-addressed store for uploaded vendor files.
+
+Each file is stored once under ``data/blobs/<aa>/<sha256>``, named by the
+SHA-256 of its original bytes, so the same PDF uploaded to several
+initiatives takes space only once and an integrity check is a re-hash.
+Files that compress well are kept gzip-compressed (``<sha256>.gz``) and
+decompressed transparently on read. Initiatives reference blobs by hash from
+their response manifest; ``collect_garbage`` removes blobs no manifest
+references any more.
+"""
+import gzip
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import storage
+
+BLOB_FOLDER = Path("data/blobs")
+COMPRESSED_SUFFIX = ".gz"
+MIN_COMPRESSION_SAVING = 0.1  # keep the gzip copy only if it is at least 10% smaller
+READ_CHUNK = 64 * 1024
+GC_GRACE_SECONDS = 3600  # never collect blobs this recent: an upload may not have written its manifest yet
+
+
+def blob_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _base_path(sha256: str) -> Path:
+    return BLOB_FOLDER / sha256[:2] / sha256
+
+
+def blob_path(sha256: str):
+    """Stored file for ``sha256`` (compressed or not), or None."""
+    base = _base_path(sha256)
+    for path in (base.with_name(base.name + COMPRESSED_SUFFIX), base):
+        if path.exists():
+            return path
+    return None
+
+
+def exists(sha256: str) -> bool:
+    return blob_path(sha256) is not None
+
+
+def put(content: bytes) -> str:
+    """Stores ``content`` unless an identical blob exists; returns its hash."""
+    sha256 = blob_hash(content)
+    existing = blob_path(sha256)
+    if existing is not None:
+        # Refresh the mtime so a concurrent garbage collection treats it as new
+        os.utime(existing)
+        return sha256
+    compressed = gzip.compress(content, compresslevel=6, mtime=0)
+    base = _base_path(sha256)
+    if len(compressed) <= len(content) * (1 - MIN_COMPRESSION_SAVING):
+        storage.atomic_write_bytes(base.with_name(base.name + COMPRESSED_SUFFIX), compressed)
+    else:
+        storage.atomic_write_bytes(base, content)
+    return sha256
+
+
+def open_blob(sha256: str):
+    """Binary file object yielding the original bytes."""
+    path = blob_path(sha256)
+    if path is None:
+        raise FileNotFoundError(f"Blob {sha256} not found")
+    return gzip.open(path, "rb") if path.name.endswith(COMPRESSED_SUFFIX) else open(path, "rb")
+
+
+def iter_blob(sha256: str, chunk_size: int = READ_CHUNK):
+    """Streams the original bytes in chunks (for download responses)."""
+    with open_blob(sha256) as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+def read(sha256: str) -> bytes:
+    with open_blob(sha256) as f:
+        return f.read()
+
+
+def verify(sha256: str) -> bool:
+    """True if the stored blob still hashes to its name."""
+    digest = hashlib.sha256()
+    try:
+        for chunk in iter_blob(sha256):
+            digest.update(chunk)
+    except (OSError, EOFError):
+        return False
+    return digest.hexdigest() == sha256
+
+
+def all_blobs() -> dict:
+    """sha256 -> stored path for every blob on disk."""
+    blobs = {}
+    for path in BLOB_FOLDER.glob("??/*"):
+        if path.name.startswith("."):
+            continue  # temporary file of an in-flight write
+        blobs[path.name.removesuffix(COMPRESSED_SUFFIX)] = path
+    return blobs
+
+
+def collect_garbage(referenced: set, dry_run: bool = False, grace_seconds: int = GC_GRACE_SECONDS) -> dict:
+    """Deletes blobs not in ``referenced`` that are older than the grace period."""
+    stats = {"kept": 0, "removed": 0, "freed_bytes": 0}
+    cutoff = time.time() - grace_seconds
+    for sha256, path in all_blobs().items():
+        stat = path.stat()
+        if sha256 in referenced or stat.st_mtime > cutoff:
+            stats["kept"] += 1
+            continue
+        if not dry_run:
+            path.unlink(missing_ok=True)
+        stats["removed"] += 1
+        stats["freed_bytes"] += stat.st_size
+    return stats
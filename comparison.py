@@ -0,0 +1,426 @@
+"""
+Incremental vendor comparison.
+
+Each vendor is evaluated (summary, per-criterion scores, strengths,
+weaknesses, risks) once per content hash and the result is cached in
+``vendor_evaluations.json`` next to the uploads, keyed by that hash and a
+fingerprint of the evidence passages sent for it (which change when shared
+boilerplate or the other vendors change). A comparison run only sends
+new or changed vendors to the model, then ranks all vendors locally using the
+initiative's criteria weights - a cheap step that is simply re-run whenever
+the vendor set or the weights change.
+
+An ensemble run evaluates each vendor several times at once (one sample per
+model or temperature) and keeps the median score per criterion with its
+spread. Its ranking is flagged as unstable when neighbouring vendors'
+weighted-score ranges overlap across samples. Every model call, single or
+ensemble, shares the process-wide ``MODEL_CONCURRENCY`` budget.
+"""
+import hashlib
+import json
+import os
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import llm_output
+import retrieval
+import similarity
+import storage
+import vendor_responses
+
+EVALUATION_FILE = "vendor_evaluations.json"
+EVALUATION_VERSION = "1"  # bump when the evaluation prompt changes to invalidate the cache
+
+# Criterion -> field in the details form holding its weight (percent)
+CRITERIA_WEIGHT_FIELDS = {
+    "Technical Capability": "criteria_technical",
+    "Quality & Compliance": "criteria_quality",
+    "Project Management": "criteria_pm",
+    "Supply Reliability": "criteria_supply",
+    "Cost Competitiveness": "criteria_cost",
+}
+CRITERIA = list(CRITERIA_WEIGHT_FIELDS)
+
+
+MAX_REPAIR_ROUNDS = 2
+ENSEMBLE_SAMPLES = 5  # samples of the "ensemble" re-run offered on the results page
+MAX_ENSEMBLE_SAMPLES = 7
+ENSEMBLE_TEMPERATURES = (0.2, 1.0)  # samples are spread evenly over this range
+MODEL_CONCURRENCY = int(os.environ.get("MODEL_CONCURRENCY", "4"))  # model calls in flight across all comparisons
+
+_model_budget = threading.BoundedSemaphore(MODEL_CONCURRENCY)
+
+
+# --- Evaluation cache ---
+def load_evaluations(upload_dir: Path) -> dict:
+    path = upload_dir / EVALUATION_FILE
+    if not path.exists():
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_evaluations(upload_dir: Path, evaluations: dict):
+    storage.atomic_write_json(upload_dir / EVALUATION_FILE, evaluations)
+
+
+def evidence_fingerprint(vendor_evidence: dict) -> str:
+    """Hash of the passages (source and text) selected per criterion, independent of chunk numbering."""
+    passages = vendor_evidence["passages"]
+    selected = {criterion: [[passages[ref]["source"], passages[ref]["text"]] for ref in refs]
+                for criterion, refs in vendor_evidence["criteria"].items()}
+    return hashlib.sha256(json.dumps(selected, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(content_hash: str, fingerprint: str) -> str:
+    return f"{EVALUATION_VERSION}:{content_hash}:{fingerprint}"
+
+
+# --- Prompt ---
+def evaluation_prompt(initiative_id: int, evidence: dict) -> str:
+    return f"""
+You are an expert RFP evaluation specialist. Your task is to evaluate the following vendor responses for initiative {initiative_id}.
+
+**Instructions:**
+1.  For each vendor, the JSON below contains the passages of its response that are most relevant to each criterion. Each passage has a reference id (e.g. "P12") and a source (file and page).
+2.  For each vendor, provide a concise summary, list their key strengths and weaknesses, and identify any potential risks.
+3.  Score each vendor on a scale of 0 to 10 for the following criteria:
+    - Technical Capability
+    - Quality & Compliance
+    - Project Management
+    - Supply Reliability
+    - Cost Competitiveness
+4.  Calculate a percentage for each score (score / 10 * 100), and list the sources of the passages that support each score under "evidence".
+5.  Set "response_file" to the exact key the vendor's passages are listed under.
+6.  Format your entire output as a single, valid JSON object. Do not include any text or formatting outside of the JSON block.
+
+Vendor Responses:
+{json.dumps(evidence, indent=2)}
+
+**JSON Output Structure:**
+```json
+{{
+  "vendors": [
+    {{
+      "response_file": "Vendor A.pdf",
+      "vendor_name": "Vendor A Name",
+      "summary": "A brief summary of Vendor A's proposal.",
+      "scores": {{
+        "Technical Capability": {{"score": 8, "percentage": 80, "evidence": ["Vendor A.pdf, p. 3"]}},
+        "Quality & Compliance": {{"score": 9, "percentage": 90}},
+        "Project Management": {{"score": 7, "percentage": 70}},
+        "Supply Reliability": {{"score": 8, "percentage": 80}},
+        "Cost Competitiveness": {{"score": 6, "percentage": 60}}
+      }},
+      "strengths": "List of strengths for Vendor A.",
+      "weaknesses": "List of weaknesses for Vendor A.",
+      "risks": "Identified risks for Vendor A."
+    }}
+  ]
+}}
+```
+"""
+
+
+def match_entries(entries: list, pending: list) -> dict:
+    """Maps model entries back to response files by ``response_file``, then name.
+
+    Entries that name no pending file (or one already matched) are dropped
+    with a warning; their vendors stay pending and are asked for again.
+    """
+    matched = {}
+    for entry in entries:
+        key = entry.get("response_file") if entry.get("response_file") in pending else None
+        if key is None and entry.get("vendor_name") in pending:
+            key = entry["vendor_name"]
+        if key is None or key in matched:
+            print(f"WARNING: dropped an evaluation for {entry.get('response_file') or entry.get('vendor_name')!r}: "
+                  f"it does not match a pending vendor response")
+        else:
+            matched[key] = entry
+    for name, entry in matched.items():
+        entry["response_file"] = name
+        entry.setdefault("vendor_name", name)
+    return matched
+
+
+# --- Ranking ---
+def criteria_weights(details: dict) -> dict:
+    """Criterion weights in percent from the details form; equal weights when missing."""
+    weights = {}
+    for criterion, field in CRITERIA_WEIGHT_FIELDS.items():
+        try:
+            weights[criterion] = float(details.get(field) or 0)
+        except (TypeError, ValueError):
+            weights[criterion] = 0.0
+    if sum(weights.values()) <= 0:
+        weights = {criterion: 100 / len(CRITERIA) for criterion in CRITERIA}
+    return weights
+
+
+def weighted_score(evaluation: dict, weights: dict) -> float:
+    total_weight = sum(weights.values())
+    score = 0.0
+    for criterion, weight in weights.items():
+        value = evaluation.get("scores", {}).get(criterion, {}).get("score")
+        if isinstance(value, (int, float)):
+            score += value * weight
+    return round(score / total_weight, 2) if total_weight else 0.0
+
+
+def rank(evaluations: list, weights: dict, top_n: int = 3) -> dict:
+    """Builds the comparison result (vendors sorted by weighted score plus a recommendation)."""
+    vendors = []
+    for evaluation in evaluations:
+        vendors.append({**evaluation, "weighted_score": weighted_score(evaluation, weights)})
+    vendors.sort(key=lambda v: -v["weighted_score"])
+    top = vendors[:top_n]
+    weight_text = ", ".join(f"{criterion} {weight:g}%" for criterion, weight in weights.items())
+    if top:
+        leaders = "; ".join(f"{v['vendor_name']} ({v['weighted_score']}/10)" for v in top)
+        summary = f"Vendors ranked by weighted score ({weight_text}). Recommended for negotiation: {leaders}."
+    else:
+        summary = "No vendor evaluations available."
+    return {
+        "vendors": vendors,
+        "recommendation": {"summary": summary, "top_vendors": [v["vendor_name"] for v in top]},
+    }
+
+
+# --- Ensembles ---
+def ensemble_temperatures(samples: int) -> list:
+    low, high = ENSEMBLE_TEMPERATURES
+    if samples <= 1:
+        return [low]
+    return [round(low + (high - low) * i / (samples - 1), 2) for i in range(samples)]
+
+
+def aggregate_samples(entries: list) -> dict:
+    """One evaluation from valid samples of the same vendor: the median score per criterion and its spread.
+
+    The prose fields come from the sample whose scores are closest to the medians.
+    """
+    scores = {}
+    for criterion in CRITERIA:
+        values = [float(entry["scores"][criterion]["score"]) for entry in entries]
+        median = statistics.median(values)
+        scores[criterion] = {
+            "score": median, "percentage": round(median * 10),
+            "evidence": list(dict.fromkeys(
+                source for entry in entries for source in entry["scores"][criterion].get("evidence") or [])),
+            "spread": max(values) - min(values), "samples": values,
+        }
+    representative = min(entries, key=lambda entry: sum(
+        abs(float(entry["scores"][c]["score"]) - scores[c]["score"]) for c in CRITERIA))
+    return {**representative, "scores": scores, "samples": len(entries)}
+
+
+def _sample_weighted_scores(evaluation: dict, weights: dict) -> list:
+    samples = [evaluation.get("scores", {}).get(c, {}).get("samples") for c in weights]
+    if not all(samples):
+        return [weighted_score(evaluation, weights)]
+    return [weighted_score({"scores": {c: {"score": values[i]} for c, values in zip(weights, samples)}}, weights)
+            for i in range(min(len(values) for values in samples))]
+
+
+def ranking_stability(vendors: list, weights: dict, top_n: int = 3) -> dict:
+    """Adds each ranked vendor's weighted-score range across samples and flags rankings that could flip.
+
+    Two neighbours in the top ``top_n`` (or just below it) are contested when
+    their ranges overlap: some sample would have ordered them the other way.
+    """
+    for vendor in vendors:
+        per_sample = _sample_weighted_scores(vendor, weights)
+        vendor["weighted_score_range"] = [min(per_sample), max(per_sample)]
+    contested = []
+    for higher, lower in zip(vendors[:top_n], vendors[1:top_n + 1]):
+        if lower["weighted_score_range"][1] >= higher["weighted_score_range"][0]:
+            contested.append([higher["vendor_name"], lower["vendor_name"]])
+    return {
+        "samples": max((vendor.get("samples", 1) for vendor in vendors), default=1),
+        "unstable": bool(contested),
+        "contested": contested,
+    }
+
+
+def budgeted(generate):
+    """Wraps ``generate`` so each call (streamed to the end) holds one ``MODEL_CONCURRENCY`` slot."""
+    def call(prompt):
+        with _model_budget:
+            yield from _chunks(generate(prompt))
+    return call
+
+
+def _evaluate_sample(initiative_id: int, evidence: dict, generate) -> dict:
+    """The valid entries of one ensemble sample; a failed sample just contributes nothing."""
+    valid = {}
+    try:
+        evaluate_vendors(initiative_id, evidence, generate, valid.__setitem__)
+    except Exception as e:
+        print(f"Ensemble sample failed: {e}")
+    return valid
+
+
+def evaluate_ensemble(initiative_id: int, evidence: dict, generators: list, on_valid) -> dict:
+    """Runs one ``evaluate_vendors`` per generator concurrently and aggregates each vendor's samples.
+
+    Returns {vendor: [problems]} for vendors without a single valid sample.
+    """
+    with ThreadPoolExecutor(max_workers=len(generators), thread_name_prefix="ensemble") as pool:
+        samples = list(pool.map(lambda generate: _evaluate_sample(initiative_id, evidence, generate), generators))
+    problems = {}
+    for name in evidence:
+        entries = [sample[name] for sample in samples if name in sample]
+        if entries:
+            on_valid(name, aggregate_samples(entries))
+        else:
+            problems[name] = [f"no valid evaluation in {len(generators)} samples"]
+    return problems
+
+
+def repair_prompt(initiative_id: int, entry: dict, problems: list, evidence: dict) -> str:
+    """Asks for the missing fields of one vendor evaluation only."""
+    return f"""
+You previously evaluated vendor "{entry.get('response_file')}" for initiative {initiative_id}, but the evaluation is incomplete: {'; '.join(problems)}.
+
+Return a single JSON object containing only the corrected fields, using the same structure as before
+(e.g. {{"scores": {{"Cost Competitiveness": {{"score": 6, "percentage": 60, "evidence": ["file, p. 2"]}}}}, "risks": "..."}}).
+Scores are on a scale of 0 to 10. Do not include any text outside of the JSON object.
+
+Current evaluation:
+{json.dumps(entry, indent=2)}
+
+Relevant passages:
+{json.dumps(evidence, indent=2)}
+"""
+
+
+# --- Pipeline ---
+def _chunks(output):
+    """``generate`` may return the full text or an iterable of streamed text chunks."""
+    return [output] if isinstance(output, str) else output
+
+
+def _stream_entries(prompt: str, generate) -> list:
+    """Collects every complete vendor entry, even when the stream breaks off mid-way."""
+    parser = llm_output.IncrementalJSONParser("vendors")
+    entries = []
+    try:
+        for chunk in _chunks(generate(prompt)):
+            entries += parser.feed(chunk)
+    except Exception as e:
+        if not entries:
+            raise
+        print(f"Comparison stream interrupted after {len(entries)} vendor(s): {e}")
+    return entries + parser.finish()
+
+
+def _repair(initiative_id: int, entry: dict, problems: list, evidence: dict, generate) -> list:
+    """Re-requests the invalid fields of one entry; returns the problems left afterwards."""
+    raw = "".join(_chunks(generate(repair_prompt(initiative_id, entry, problems, evidence))))
+    try:
+        repair = llm_output.parse_json(raw)
+    except ValueError:
+        return problems
+    if isinstance(repair, dict):
+        llm_output.merge_repair(entry, repair)
+    return llm_output.validate_vendor_entry(entry, CRITERIA)
+
+
+def evaluate_vendors(initiative_id: int, evidence: dict, generate, on_valid) -> dict:
+    """Evaluates the vendors in ``evidence``; ``on_valid(name, entry)`` is called per valid entry.
+
+    Complete entries are kept as they stream in. Vendors missing from the
+    answer are re-requested on their own and invalid entries only have their
+    broken fields re-requested, for at most ``MAX_REPAIR_ROUNDS`` rounds.
+    Returns {vendor: [problems]} for whatever could not be fixed.
+    """
+    pending = list(evidence)
+    problems = {}
+    for _ in range(MAX_REPAIR_ROUNDS + 1):
+        if not pending:
+            break
+        entries = _stream_entries(evaluation_prompt(initiative_id, {n: evidence[n] for n in pending}), generate)
+        matched = match_entries(entries, pending)
+        for name, entry in matched.items():
+            issues = llm_output.validate_vendor_entry(entry, CRITERIA)
+            for _ in range(MAX_REPAIR_ROUNDS):
+                if not issues:
+                    break
+                issues = _repair(initiative_id, entry, issues, evidence[name], generate)
+            if issues:
+                problems[name] = issues
+            else:
+                problems.pop(name, None)
+                on_valid(name, entry)
+        pending = [name for name in pending if name not in matched]
+        for name in pending:
+            problems[name] = ["no evaluation returned"]
+    return problems
+
+
+def run_comparison(initiative_id: int, upload_dir: Path, vendors: list, details: dict, generate) -> dict:
+    """Evaluates new or changed vendors with ``generate`` and re-ranks everything.
+
+    ``vendors`` names the stored responses to compare (usually all of them).
+    ``generate(prompt)`` returns the model's text or an iterable of streamed
+    chunks. A list of such functions runs an ensemble with one sample each;
+    vendors whose cached evaluation has fewer samples are then evaluated again.
+    Valid evaluations are cached even when others fail, so a retry only
+    asks for what is still missing. Passages flagged as cross-vendor
+    boilerplate are left out of the evidence. Returns {"data", "rescored", "reused",
+    "prompt_chars", "full_chars", "samples"}.
+    """
+    generators = [budgeted(g) for g in (generate if isinstance(generate, (list, tuple)) else [generate])]
+    samples = len(generators)
+    manifest = vendor_responses.load_manifest(upload_dir)
+    vendors = [name for name in vendors if name in manifest]
+    hashes = vendor_responses.vendor_hashes(upload_dir, vendors)
+    # Cached evaluations of every stored vendor survive a comparison of a subset
+    cache = {name: entry for name, entry in load_evaluations(upload_dir).items() if name in manifest}
+
+    chunk_index = retrieval.load_chunk_index(upload_dir, vendors)
+    report = similarity.load_report(upload_dir, chunk_index)
+    # Evidence depends on the other vendors (boilerplate, BM25 statistics), so it is part of the key
+    skip = similarity.boilerplate_chunk_ids(chunk_index, report)
+    all_evidence = retrieval.select_evidence(chunk_index, vendors, skip=skip)
+    keys = {name: cache_key(hashes[name], evidence_fingerprint(all_evidence[name])) for name in vendors}
+    pending = [name for name in vendors if cache.get(name, {}).get("key") != keys[name]
+               or cache[name].get("samples", 1) < samples]
+    prompt_chars = 0
+    if pending:
+        evidence = {name: all_evidence[name] for name in pending}
+        prompt_chars = retrieval.evidence_size(evidence) * samples
+        now = datetime.now().isoformat(timespec="seconds")
+
+        def keep(name, entry):
+            cache[name] = {"key": keys[name], "evaluated_at": now, "evaluation": entry,
+                           "samples": entry.get("samples", 1)}
+
+        if samples > 1:
+            problems = evaluate_ensemble(initiative_id, evidence, generators, keep)
+        else:
+            problems = evaluate_vendors(initiative_id, evidence, generators[0], keep)
+        save_evaluations(upload_dir, cache)
+        if problems:
+            details_text = "; ".join(f"{name}: {', '.join(issues)}" for name, issues in problems.items())
+            raise ValueError(f"Could not obtain a valid evaluation for {details_text}")
+    else:
+        save_evaluations(upload_dir, cache)
+
+    weights = criteria_weights(details)
+    data = rank([cache[name]["evaluation"] for name in vendors], weights)
+    if any(cache[name].get("samples", 1) > 1 for name in vendors):
+        data["stability"] = ranking_stability(data["vendors"], weights)
+    data["similarity"] = similarity.summary(report)
+    return {
+        "data": data,
+        "rescored": pending,
+        "reused": [name for name in vendors if name not in pending],
+        "prompt_chars": prompt_chars,
+        "full_chars": sum(manifest[name]["chars"] for name in pending),
+        "samples": samples,
+    }
@@ -1,10 +1,10 @@
 import json
-import io
 from pathlib import Path
-from docx import Document
-from PyPDF2 import PdfReader
 from fastapi import UploadFile
 
+import rfp_docx
+import storage
+
 # --- Files / folders ---
 GLOBAL_COUNTER_FILE = Path("global/global_counter.json")
 SUBMISSION_FOLDER = Path("data/submissions")
@@ -18,27 +18,35 @@ for folder in [SUBMISSION_FOLDER, RFP_FOLDER, VENDOR_FOLDER, GLOBAL_COUNTER_FILE
 
 
 def get_next_initiative_id() -> int:
-    if not GLOBAL_COUNTER_FILE.exists():
-        counter = {"last_id": 0}
-    else:
-        with open(GLOBAL_COUNTER_FILE, "r") as f:
-            try:
-                counter = json.load(f)
-            except json.JSONDecodeError:
-                counter = {"last_id": 0}
-    counter["last_id"] = int(counter.get("last_id", 0)) + 1
-    with open(GLOBAL_COUNTER_FILE, "w") as f:
-        json.dump(counter, f, indent=2)
+    with storage.locked("global_counter"):
+        if not GLOBAL_COUNTER_FILE.exists():
+            counter = {"last_id": 0}
+        else:
+            with open(GLOBAL_COUNTER_FILE, "r") as f:
+                try:
+                    counter = json.load(f)
+                except json.JSONDecodeError:
+                    counter = {"last_id": 0}
+        counter["last_id"] = int(counter.get("last_id", 0)) + 1
+        storage.atomic_write_json(GLOBAL_COUNTER_FILE, counter)
     return counter["last_id"]
 
 
-def save_submission(initiative_id: int, data: dict, schema_name: str = None):
+def _submission_file(initiative_id: int, schema_name: str = None) -> Path:
     if schema_name:
-        file_path = SUBMISSION_FOLDER / f"initiative_{initiative_id}_{schema_name}.json"
-    else:
-        file_path = SUBMISSION_FOLDER / f"initiative_{initiative_id}.json"
-    with open(file_path, "w") as f:
-        json.dump(data, f, indent=2)
+        return SUBMISSION_FOLDER / f"initiative_{initiative_id}_{schema_name}.json"
+    return SUBMISSION_FOLDER / f"initiative_{initiative_id}.json"
+
+
+def save_submission(initiative_id: int, data: dict, schema_name: str = None):
+    with storage.initiative_lock(initiative_id):
+        storage.atomic_write_json(_submission_file(initiative_id, schema_name), data)
+
+
+async def save_submission_async(initiative_id: int, data: dict, schema_name: str = None):
+    """``save_submission`` for async callers; the write and the lock stay on a worker thread."""
+    await storage.write_json_async(_submission_file(initiative_id, schema_name), data,
+                                   lock=storage.initiative_lock_name(initiative_id))
 
 
 def load_initiative_data(initiative_id: int, schema_name: str) -> dict:
@@ -58,45 +66,13 @@ def load_initiative_data(initiative_id: int, schema_name: str) -> dict:
 
 
 def save_rfp_doc(text: str, initiative_id: int) -> str:
-    output_file = RFP_FOLDER / f"initiative_{initiative_id}_rfp.docx"
-    doc = Document()
-    for line in text.splitlines():
-        l = line.strip()
-        if l.startswith("###"):
-            doc.add_heading(l.lstrip("# ").strip(), level=3)
-        elif l.startswith("##"):
-            doc.add_heading(l.lstrip("# ").strip(), level=2)
-        elif l.startswith("#"):
-            doc.add_heading(l.lstrip("# ").strip(), level=1)
-        elif not l:
-            doc.add_paragraph("")
-        else:
-            doc.add_paragraph(l)
-    doc.save(output_file)
-    return str(output_file)
-
-
-async def save_vendor_files(initiative_id: int, files: list[UploadFile]):
-    upload_dir = VENDOR_FOLDER / f"initiative_{initiative_id}"
-    upload_dir.mkdir(parents=True, exist_ok=True)
-
-    combined_data = {}
-    for file in files:
-        content = await file.read()
-        text = ""
-        if file.filename.lower().endswith(".pdf"):
-            pdf = PdfReader(io.BytesIO(content))
-            text = "".join(page.extract_text() or "" for page in pdf.pages)
-        elif file.filename.lower().endswith(".docx"):
-            doc = Document(io.BytesIO(content))
-            text = "\n".join(para.text for para in doc.paragraphs)
-        else:
-            text = content.decode("utf-8", errors="ignore")
+    return rfp_docx.save_rfp_doc(text, initiative_id, RFP_FOLDER)
+
 
-        combined_data[file.filename] = text.strip()
-        with open(upload_dir / file.filename, "wb") as f:
-            f.write(content)
+async def save_vendor_files(initiative_id: int, files: list[UploadFile], mode: str = "replace") -> dict:
+    """Stores uploaded vendor responses exactly like the upload page does; returns the manifest."""
+    # main loads the whole app; only callers that store uploads pay for it
+    import main
 
-    combined_path = upload_dir / "combined_vendor_responses.json"
-    with open(combined_path, "w") as f:
-        json.dump(combined_data, f, indent=2)
\ No newline at end of file
+    contents = {file.filename: await file.read() for file in files}
+    return await main.save_vendor_upload(initiative_id, contents, mode)
@@ -0,0 +1,312 @@
+"""
+Append-only log of every state change.
+
+Submissions, edits, detail saves, RFP generations, vendor uploads and
+comparisons are appended as one JSON line each to ``EVENT_LOG``
+(``requests.jsonl`` at the repo root unless the ``EVENT_LOG`` environment
+variable says otherwise). Appends are a single write to a file kept open in
+append mode; a background thread fsyncs in batches (every ``FSYNC_INTERVAL``
+seconds or ``FSYNC_BATCH`` events), so requests never wait for the disk.
+
+Every event has a *position*: its byte offset in the log as if the log had
+never been compacted. Positions are appended to a small per-initiative index
+under ``data/events/index``, so an initiative's history is a few seeks rather
+than a scan. ``compact`` snapshots the current submissions, moves the log
+written so far into a gzip segment and restarts the live log with a header
+line recording where it continues. Lines that are not events (anything
+without an ``"event"`` key) are skipped everywhere.
+
+Usage:
+    python event_log.py replay [--out DIR]   # rebuild submissions, search and history indexes
+    python event_log.py compact
+    python event_log.py history 12
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import storage
+
+EVENT_LOG = Path(os.environ.get("EVENT_LOG", "requests.jsonl"))
+EVENT_FOLDER = Path("data/events")
+INDEX_FOLDER = EVENT_FOLDER / "index"
+SUBMISSION_FOLDER = Path("data/submissions")
+GLOBAL_COUNTER_FILE = Path("global/global_counter.json")
+FSYNC_INTERVAL = 0.2
+FSYNC_BATCH = 64
+LOG_START = "log_start"  # header event of a compacted log
+LOCK_NAME = "event_log"
+
+_handle = None
+_handle_start = 0
+_pending = 0
+_guard = threading.Lock()
+_flusher = None
+
+
+# --- Appending ---
+def _first_event(path: Path):
+    with open(path, "rb") as f:
+        return _decode(f.readline())
+
+
+def _decode(line: bytes):
+    """The event on ``line``, or None for blank lines and lines that are not events."""
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    return event if isinstance(event, dict) and "event" in event else None
+
+
+def _live_handle():
+    """Open handle on the live log, reopened after another process compacted it."""
+    global _handle, _handle_start
+    current = EVENT_LOG.stat().st_ino if EVENT_LOG.exists() else None
+    if _handle is None or os.fstat(_handle.fileno()).st_ino != current:
+        if _handle is not None:
+            _handle.close()
+        EVENT_LOG.parent.mkdir(parents=True, exist_ok=True)
+        _handle = open(EVENT_LOG, "ab")
+        header = _first_event(EVENT_LOG)
+        _handle_start = header["position"] if header and header["event"] == LOG_START else 0
+    return _handle
+
+
+def append(event_type: str, initiative_id: int, **data) -> int:
+    """Appends an event and returns its position. Durable within ``FSYNC_INTERVAL``."""
+    global _pending
+    line = json.dumps({
+        "event": event_type, "initiative_id": initiative_id,
+        "at": datetime.now().isoformat(timespec="milliseconds"), "data": data,
+    }, separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+    with _guard, storage.locked(LOCK_NAME):
+        handle = _live_handle()
+        position = _handle_start + handle.seek(0, os.SEEK_END)
+        handle.write(line)
+        handle.flush()
+        INDEX_FOLDER.mkdir(parents=True, exist_ok=True)
+        with open(INDEX_FOLDER / f"initiative_{initiative_id}.idx", "a") as index:
+            index.write(f"{position}\n")
+        _pending += 1
+        if _pending >= FSYNC_BATCH:
+            _fsync()
+    _start_flusher()
+    return position
+
+
+def _fsync():
+    global _pending
+    if _handle is not None and _pending:
+        os.fsync(_handle.fileno())
+    _pending = 0
+
+
+def flush():
+    """Forces pending events to disk (called on shutdown)."""
+    with _guard:
+        _fsync()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FSYNC_INTERVAL)
+        flush()
+
+
+def _start_flusher():
+    global _flusher
+    if _flusher is None:
+        with _guard:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_loop, name="event-log-fsync", daemon=True)
+                _flusher.start()
+
+
+# --- Reading ---
+def _segments() -> list:
+    """(start, end, path) of compacted log segments, oldest first."""
+    found = []
+    for path in EVENT_FOLDER.glob("segment_*_*.jsonl.gz"):
+        start, end = map(int, re.findall(r"\d+", path.name)[:2])
+        found.append((start, end, path))
+    # A compaction that crashed before replacing the log leaves a shorter duplicate behind
+    chain = []
+    for start, end, path in sorted(found, key=lambda s: (s[0], -s[1])):
+        if not chain or start >= chain[-1][1]:
+            chain.append((start, end, path))
+    return chain
+
+
+def _live_start() -> int:
+    header = _first_event(EVENT_LOG) if EVENT_LOG.exists() else None
+    return header["position"] if header and header["event"] == LOG_START else 0
+
+
+def iter_events(since: int = 0):
+    """Yields ``(position, event)`` for every event at or after ``since``."""
+    live_start = _live_start()
+    sources = [(start, path) for start, end, path in _segments() if end > since and start < live_start]
+    if EVENT_LOG.exists():
+        sources.append((live_start, EVENT_LOG))
+    for start, path in sources:
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rb") as f:
+            position = start
+            for line in f:
+                event = _decode(line)
+                if event and event["event"] != LOG_START and position >= since:
+                    yield position, event
+                position += len(line)
+
+
+def history(initiative_id: int) -> list:
+    """Events of one initiative, oldest first, each with its ``position``."""
+    index_file = INDEX_FOLDER / f"initiative_{initiative_id}.idx"
+    if not index_file.exists():
+        return []
+    positions = [int(line) for line in index_file.read_text().split()]
+    live_start = _live_start()
+    segments = _segments()
+    events = []
+    handles = {}
+    try:
+        for position in positions:
+            if position >= live_start:
+                path, offset = EVENT_LOG, position - live_start
+            else:
+                match = next(((start, path) for start, end, path in segments if start <= position < end), None)
+                if match is None:
+                    continue
+                path, offset = match[1], position - match[0]
+            if path not in handles:
+                handles[path] = gzip.open(path, "rb") if path.suffix == ".gz" else open(path, "rb")
+            handles[path].seek(offset)
+            event = _decode(handles[path].readline())
+            if event and event.get("initiative_id") == initiative_id:
+                events.append({**event, "position": position})
+    finally:
+        for handle in handles.values():
+            handle.close()
+    return events
+
+
+# --- Snapshots and replay ---
+def _latest_snapshot():
+    snapshots = sorted(EVENT_FOLDER.glob("snapshot_*.json"), key=lambda p: int(re.findall(r"\d+", p.name)[0]))
+    return storage.read_json(snapshots[-1]) if snapshots else None
+
+
+def current_state(submission_folder: Path = SUBMISSION_FOLDER) -> dict:
+    """Submissions on disk as {id: {"base": ..., "details": {schema: ...}}}."""
+    initiatives = {}
+    for path in submission_folder.glob("initiative_*.json"):
+        match = re.fullmatch(r"initiative_(\d+)(?:_(.+))?\.json", path.name)
+        if not match:
+            continue
+        record = initiatives.setdefault(match.group(1), {"base": None, "details": {}})
+        data = storage.read_json(path)
+        if match.group(2):
+            record["details"][match.group(2)] = data
+        else:
+            record["base"] = data
+    return initiatives
+
+
+def apply(state: dict, event: dict):
+    """Applies one event to a snapshot-shaped state (events carry full records, so this is idempotent)."""
+    record = state.setdefault(str(event["initiative_id"]), {"base": None, "details": {}})
+    data = event["data"]
+    if event["event"] in ("initiative_created", "initiative_updated"):
+        record["base"] = data["record"]
+    elif event["event"] == "details_saved":
+        record["details"][data["schema"]] = data["record"]
+
+
+def replay() -> dict:
+    """Latest snapshot plus every later event."""
+    snapshot = _latest_snapshot() or {"position": 0, "initiatives": {}}
+    state = snapshot["initiatives"]
+    for _, event in iter_events(since=snapshot["position"]):
+        apply(state, event)
+    return state
+
+
+def write_state(state: dict, submission_folder: Path = SUBMISSION_FOLDER):
+    for initiative_id, record in state.items():
+        if record["base"] is not None:
+            storage.atomic_write_json(submission_folder / f"initiative_{initiative_id}.json", record["base"])
+        for schema, details in record["details"].items():
+            storage.atomic_write_json(submission_folder / f"initiative_{initiative_id}_{schema}.json", details)
+
+
+def rebuild_history_index():
+    """Recreates every per-initiative index from the log."""
+    positions = {}
+    for position, event in iter_events():
+        positions.setdefault(event["initiative_id"], []).append(position)
+    with storage.locked(LOCK_NAME):
+        for path in INDEX_FOLDER.glob("initiative_*.idx"):
+            path.unlink()
+        for initiative_id, found in positions.items():
+            storage.atomic_write_text(INDEX_FOLDER / f"initiative_{initiative_id}.idx", "".join(f"{p}\n" for p in found))
+
+
+def compact() -> dict:
+    """Snapshots the submissions and moves the live log into a compressed segment."""
+    with _guard, storage.locked(LOCK_NAME):
+        _fsync()
+        if not EVENT_LOG.exists() or EVENT_LOG.stat().st_size == 0:
+            return {"archived_bytes": 0}
+        start = _live_start()
+        content = EVENT_LOG.read_bytes()
+        end = start + len(content)
+        # Segment and snapshot first: until the log is replaced, they only duplicate it
+        storage.atomic_write_bytes(EVENT_FOLDER / f"segment_{start}_{end}.jsonl.gz", gzip.compress(content))
+        storage.atomic_write_json(EVENT_FOLDER / f"snapshot_{end}.json",
+                                  {"position": end, "initiatives": current_state()})
+        header = json.dumps({"event": LOG_START, "position": end}) + "\n"
+        storage.atomic_write_text(EVENT_LOG, header)
+    return {"archived_bytes": len(content), "position": end}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Replay, compact or inspect the event log.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    replay_cmd = sub.add_parser("replay", help="Rebuild submissions and indexes from the snapshot and log.")
+    replay_cmd.add_argument("--out", type=Path, default=SUBMISSION_FOLDER)
+    sub.add_parser("compact", help="Snapshot submissions and archive the live log.")
+    history_cmd = sub.add_parser("history", help="Print the events of one initiative.")
+    history_cmd.add_argument("initiative_id", type=int)
+    args = parser.parse_args()
+
+    if args.command == "replay":
+        state = replay()
+        args.out.mkdir(parents=True, exist_ok=True)
+        write_state(state, args.out)
+        rebuild_history_index()
+        if args.out.resolve() == SUBMISSION_FOLDER.resolve():
+            import search_index
+
+            ids = [int(i) for i in state]
+            with storage.locked("global_counter"):
+                counter = storage.read_json(GLOBAL_COUNTER_FILE, {"last_id": 0})
+                counter["last_id"] = max([counter.get("last_id", 0), *ids])
+                storage.atomic_write_json(GLOBAL_COUNTER_FILE, counter)
+            print(search_index.rebuild_index())
+        print(f"Replayed {len(state)} initiative(s) into {args.out}.")
+    elif args.command == "compact":
+        print(compact())
+    elif args.command == "history":
+        for event in history(args.initiative_id):
+            print(f"{event['at']}  {event['event']:<28} {json.dumps(event['data'], default=str)[:120]}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,145 @@
+"""
+Text extraction from uploaded vendor files, page by page and within a budget.
+
+Only the first few tens of thousands of tokens of a response can reach a
+prompt, so PDFs are read one page at a time and extraction stops at the end
+of the page that crosses ``EXTRACTION_CHAR_BUDGET`` characters (about
+``EXTRACTION_TOKEN_BUDGET`` tokens). Word and plain-text files are cut at a
+line break (or else a space) in the last tenth of the budget. The result records where each page starts
+in the text and how many pages were left out; ``extract_pages`` reads any page
+later, on demand, from the original file.
+
+``extract_many`` extracts several files in parallel in a small process pool.
+PyPDF2 is pure Python, so threads would not help.
+"""
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+CHARS_PER_TOKEN = 4
+EXTRACTION_TOKEN_BUDGET = int(os.environ.get("EXTRACTION_TOKEN_BUDGET", "50000"))
+EXTRACTION_CHAR_BUDGET = int(os.environ.get("EXTRACTION_CHAR_BUDGET") or EXTRACTION_TOKEN_BUDGET * CHARS_PER_TOKEN)
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS") or min(4, os.cpu_count() or 1))
+PARALLEL_MIN_BYTES = 512 * 1024  # smaller uploads are extracted inline: handing them to the pool costs more
+PAGE_SEPARATOR = "\n"
+CUT_WINDOW = 0.1  # share of the budget, at its end, in which a text is cut at a line break or space
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _is_pdf(filename: str) -> bool:
+    return filename.lower().endswith(".pdf")
+
+
+def _whole_text(filename: str, content: bytes) -> str:
+    if filename.lower().endswith(".docx"):
+        from docx import Document
+
+        return "".join(para.text + "\n" for para in Document(io.BytesIO(content)).paragraphs)
+    return content.decode("utf-8", errors="ignore")
+
+
+def _cut(text: str, budget: int) -> str:
+    """``text`` shortened to at most ``budget`` characters, ending at a line break or space if one is near the end."""
+    floor = int(budget * (1 - CUT_WINDOW))
+    cut = text.rfind("\n", floor, budget)
+    if cut < 0:
+        cut = max(text.rfind(" ", floor, budget), text.rfind("\t", floor, budget))
+    return text[:cut if cut > 0 else budget]
+
+
+def extract(filename: str, content: bytes, budget: int = None) -> dict:
+    """Extracts ``filename`` up to ``budget`` characters (default ``EXTRACTION_CHAR_BUDGET``, 0: no limit).
+
+    Returns {"text", "pages": [(page number, page text)], "page_count",
+    "pages_extracted", "page_offsets", "truncated", "extraction_ms"}.
+    ``page_offsets[i]`` is where ``pages[i]`` starts in ``text``.
+    """
+    started = time.perf_counter()
+    budget = EXTRACTION_CHAR_BUDGET if budget is None else budget
+    pages = []
+    if _is_pdf(filename):
+        from PyPDF2 import PdfReader
+
+        reader = PdfReader(io.BytesIO(content))
+        page_count = len(reader.pages)
+        size = 0
+        for page_number in range(1, page_count + 1):
+            if budget and size >= budget:
+                break
+            page_text = reader.pages[page_number - 1].extract_text() or ""
+            pages.append((page_number, page_text))
+            size += len(page_text) + len(PAGE_SEPARATOR)
+        truncated = len(pages) < page_count
+    else:
+        text = _whole_text(filename, content)
+        page_count = 1
+        truncated = bool(budget) and len(text) > budget
+        if truncated:
+            text = _cut(text, budget)
+        pages.append((1, text))
+
+    offsets, parts, position = [], [], 0
+    for _, page_text in pages:
+        offsets.append(position)
+        parts.append(page_text)
+        position += len(page_text) + len(PAGE_SEPARATOR)
+    text = PAGE_SEPARATOR.join(parts)
+    # Strip like the stored text is, keeping the offsets pointing at the same characters
+    lead = len(text) - len(text.lstrip())
+    return {
+        "text": text.strip(),
+        "pages": pages,
+        "page_count": page_count,
+        "pages_extracted": len(pages),
+        "page_offsets": [max(0, offset - lead) for offset in offsets],
+        "truncated": truncated,
+        "extraction_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def extract_pages(filename: str, content: bytes, first: int, last: int) -> list:
+    """[(page number, text)] for pages ``first``..``last`` (1-based, inclusive), read from the original file."""
+    if not _is_pdf(filename):
+        return [(1, _whole_text(filename, content))] if first <= 1 <= last else []
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(io.BytesIO(content))
+    last = min(last, len(reader.pages))
+    return [(n, reader.pages[n - 1].extract_text() or "") for n in range(max(first, 1), last + 1)]
+
+
+# --- Several files ---
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Spawned workers import only this module, not the app and its threads
+                _pool = ProcessPoolExecutor(EXTRACTION_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _extract_job(job: tuple) -> dict:
+    return extract(*job)
+
+
+def extract_many(files: dict, budget: int = None) -> dict:
+    """filename -> ``extract`` result for {filename: content}, in parallel when it pays off."""
+    jobs = [(filename, content, budget) for filename, content in files.items()]
+    if len(jobs) < 2 or EXTRACTION_WORKERS < 2 or sum(len(content) for content in files.values()) < PARALLEL_MIN_BYTES:
+        return {filename: extract(filename, content, budget) for filename, content, budget in jobs}
+    return dict(zip(files, _get_pool().map(_extract_job, jobs)))
+
+
+def shutdown():
+    """Stops the worker processes (called on application shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
@@ -0,0 +1,167 @@
+"""
+Structured-output helpers for model responses.
+
+Models wrap JSON in markdown fences, prepend prose, or stop mid-object when a
+stream is cut off. ``IncrementalJSONParser`` consumes streamed text and hands
+back every complete element of a top-level array (``"vendors": [...]``) as
+soon as its closing brace arrives, so finished entries survive a truncated
+tail. ``validate_vendor_entry`` checks an entry against the comparison schema,
+repairing what can be fixed locally and reporting what has to be re-requested.
+"""
+import json
+import re
+
+
+def extract_json(text: str) -> str:
+    """Returns the JSON part of model output: fence contents, or from the first brace/bracket on."""
+    fenced = re.search(r"```(?:json)?\s*\n(.*?)(?:```|$)", text, re.S)
+    if fenced:
+        text = fenced.group(1)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    return text[min(starts):].strip() if starts else text.strip()
+
+
+def parse_json(text: str):
+    """``json.loads`` that tolerates fences and surrounding prose."""
+    candidate = extract_json(text)
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        # Trailing prose after the JSON value: decode the first complete value only
+        value, _ = json.JSONDecoder().raw_decode(candidate)
+        return value
+
+
+class IncrementalJSONParser:
+    """Streams elements of the array stored under ``array_key`` in the top-level object."""
+
+    def __init__(self, array_key: str = "vendors"):
+        self.array_key = array_key
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.last_string_start = None
+        self.last_string = None
+        self.in_array = False
+        self.element_start = None
+        self.emitted = 0
+        self.started = False
+
+    def feed(self, chunk: str) -> list:
+        """Adds streamed text; returns the array elements completed by it."""
+        self.buffer += chunk
+        complete = []
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self.last_string = self.buffer[self.last_string_start + 1:self.pos]
+            elif not self.started:
+                # Skip fences and prose until the top-level object opens
+                if ch == "{":
+                    self.started = True
+                    self.depth = 1
+            elif ch == '"':
+                self.in_string = True
+                self.last_string_start = self.pos
+            elif ch in "{[":
+                if ch == "[" and self.depth == 1 and self.last_string == self.array_key:
+                    self.in_array = True
+                elif ch == "{" and self.in_array and self.depth == 2:
+                    self.element_start = self.pos
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if ch == "}" and self.in_array and self.depth == 2 and self.element_start is not None:
+                    element = self._decode(self.buffer[self.element_start:self.pos + 1])
+                    if element is not None:
+                        complete.append(element)
+                    self.element_start = None
+                elif ch == "]" and self.in_array and self.depth == 1:
+                    self.in_array = False
+            self.pos += 1
+        self.emitted += len(complete)
+        return complete
+
+    def _decode(self, text: str):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return None
+
+    def finish(self) -> list:
+        """Elements recoverable only from the full text (e.g. a bare top-level list)."""
+        if self.emitted:
+            return []
+        try:
+            value = parse_json(self.buffer)
+        except (json.JSONDecodeError, ValueError):
+            return []
+        if isinstance(value, list):
+            return [v for v in value if isinstance(v, dict)]
+        if isinstance(value, dict):
+            if isinstance(value.get(self.array_key), list):
+                return [v for v in value[self.array_key] if isinstance(v, dict)]
+            return [value]
+        return []
+
+
+# --- Validation ---
+TEXT_FIELDS = ("summary", "strengths", "weaknesses", "risks")
+
+
+def validate_vendor_entry(entry: dict, criteria: list) -> list:
+    """Normalises ``entry`` in place and returns the problems that need the model.
+
+    Local repairs: numeric strings become numbers, missing percentages are
+    derived from scores, list-valued text fields are joined.
+    """
+    problems = []
+    for field in TEXT_FIELDS:
+        value = entry.get(field)
+        if isinstance(value, list):
+            entry[field] = "; ".join(map(str, value))
+        elif not isinstance(value, str) or not value.strip():
+            problems.append(f"missing {field}")
+
+    scores = entry.get("scores")
+    if not isinstance(scores, dict):
+        entry["scores"] = scores = {}
+    for criterion in criteria:
+        details = scores.get(criterion)
+        if isinstance(details, (int, float, str)):
+            details = scores[criterion] = {"score": details}
+        if not isinstance(details, dict):
+            problems.append(f"missing score for {criterion}")
+            continue
+        score = details.get("score")
+        try:
+            score = float(score)
+        except (TypeError, ValueError):
+            problems.append(f"missing score for {criterion}")
+            continue
+        if not 0 <= score <= 10:
+            problems.append(f"score for {criterion} out of range")
+            continue
+        details["score"] = int(score) if score.is_integer() else score
+        details.setdefault("percentage", round(score * 10))
+        details.setdefault("evidence", [])
+    return problems
+
+
+def merge_repair(entry: dict, repair: dict) -> dict:
+    """Merges a partial repair answer into an entry (scores are merged per criterion)."""
+    for key, value in repair.items():
+        if key == "scores" and isinstance(value, dict):
+            entry.setdefault("scores", {}).update(value)
+        elif key not in ("response_file", "vendor_name") or not entry.get(key):
+            entry[key] = value
+    return entry
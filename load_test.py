@@ -0,0 +1,188 @@
+"""
+Load driver for the full initiative workflow.
+
+Starts a local uvicorn server in a scratch directory with the fake model
+(``USE_FAKE_LLM=1``), seeds it with synthetic initiatives, then runs
+``--users`` concurrent virtual users that each repeat the browser flow:
+
+    POST /submit -> POST /submit/{schema}/{id} -> GET /rfp -> GET /rfp_result
+    -> POST /upload_vendor_responses/{id} -> GET /compare_vendors/{id}
+
+and reports throughput plus per-step tail latency.
+
+Usage:
+    python load_test.py --users 20 --flows 5 --vendors 4 --vendor-size-kb 100
+    python load_test.py --url http://127.0.0.1:8000 --users 10   # existing server
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmark import percentile
+from synthetic_data import DETAIL_SCHEMA, make_initiative, make_vendor_documents, write_initiatives, write_schemas
+
+REPO_DIR = Path(__file__).resolve().parent
+STEPS = ["submit", "submit_details", "rfp", "rfp_result", "upload", "compare"]
+
+
+def _form_data(record: dict) -> dict:
+    """Form fields as the browser posts them (checkbox lists become repeated keys)."""
+    return {
+        key: [str(v) for v in value] if isinstance(value, list) else str(value)
+        for key, value in record.items()
+        if key != "initiative_id"
+    }
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {step: [] for step in STEPS + ["flow"]}
+        self.errors = {}
+        self.requests = 0
+
+    def record(self, step: str, seconds: float):
+        self.latencies[step].append(seconds)
+
+    def error(self, step: str, detail: str):
+        self.errors.setdefault(step, []).append(detail)
+
+
+async def timed(stats: Stats, step: str, request):
+    start = time.perf_counter()
+    response = await request
+    stats.record(step, time.perf_counter() - start)
+    stats.requests += 1
+    if response.status_code >= 400:
+        stats.error(step, f"HTTP {response.status_code}")
+    return response
+
+
+async def run_flow(client: httpx.AsyncClient, stats: Stats, rng: random.Random, vendor_docs: dict):
+    base, details = make_initiative(0, rng)
+    flow_start = time.perf_counter()
+
+    response = await timed(stats, "submit", client.post("/submit", data=_form_data(base)))
+    match = re.search(rf"/submit/{DETAIL_SCHEMA}/(\d+)", response.text)
+    if not match:
+        stats.error("submit", "no details form in response")
+        return
+    initiative_id = int(match.group(1))
+
+    await timed(stats, "submit_details",
+                client.post(f"/submit/{DETAIL_SCHEMA}/{initiative_id}", data=_form_data(details)))
+    await timed(stats, "rfp", client.get(f"/rfp/{initiative_id}/{DETAIL_SCHEMA}"))
+    await timed(stats, "rfp_result", client.get(f"/rfp_result/{initiative_id}/{DETAIL_SCHEMA}"))
+
+    files = [("files", (name, content)) for name, content in vendor_docs.items()]
+    await timed(stats, "upload", client.post(f"/upload_vendor_responses/{initiative_id}", files=files))
+    await timed(stats, "compare", client.get(f"/compare_vendors/{initiative_id}"))
+    stats.record("flow", time.perf_counter() - flow_start)
+
+
+async def run_user(client, stats, user_id: int, flows: int, vendor_docs: dict):
+    rng = random.Random(user_id)
+    for _ in range(flows):
+        try:
+            await run_flow(client, stats, rng, vendor_docs)
+        except httpx.HTTPError as e:
+            stats.error("transport", repr(e))
+
+
+async def drive(url: str, users: int, flows: int, vendor_docs: dict, timeout: float) -> tuple:
+    stats = Stats()
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(run_user(client, stats, u, flows, vendor_docs) for u in range(users)))
+        elapsed = time.perf_counter() - start
+    return stats, elapsed
+
+
+def report(stats: Stats, elapsed: float):
+    completed = len(stats.latencies["flow"])
+    print(f"\nelapsed {elapsed:.2f}s  flows {completed}  requests {stats.requests}")
+    print(f"throughput {completed / elapsed:.2f} flows/s  {stats.requests / elapsed:.2f} req/s\n")
+    header = f"{'step':<16} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for step, samples in stats.latencies.items():
+        if not samples:
+            continue
+        values = sorted(samples)
+        print(f"{step:<16} {len(values):>6} {percentile(values, .5) * 1000:>10.1f} "
+              f"{percentile(values, .95) * 1000:>10.1f} {percentile(values, .99) * 1000:>10.1f} "
+              f"{values[-1] * 1000:>10.1f}")
+    for step, errors in stats.errors.items():
+        print(f"errors in {step}: {len(errors)} (first: {errors[0]})")
+
+
+def start_server(workdir: Path, port: int, workers: int, latency: float) -> subprocess.Popen:
+    env = dict(os.environ, USE_FAKE_LLM="1", FAKE_LLM_LATENCY=str(latency))
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(REPO_DIR),
+           "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=workdir, env=env)
+
+
+def wait_until_healthy(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not become healthy")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Concurrent load test of the initiative workflow.")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users.")
+    parser.add_argument("--flows", type=int, default=3, help="Workflows per user.")
+    parser.add_argument("--vendors", type=int, default=3, help="Vendor files per upload (2-7).")
+    parser.add_argument("--vendor-size-kb", type=int, default=50)
+    parser.add_argument("--vendor-format", choices=["pdf", "docx", "mixed"], default="mixed")
+    parser.add_argument("--seed-initiatives", type=int, default=500, help="Existing initiatives on disk.")
+    parser.add_argument("--url", help="Target an already running server instead of starting one.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Fake model latency in seconds.")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    vendor_docs = make_vendor_documents(args.vendors, args.vendor_size_kb, args.vendor_format)
+    server, workdir = None, None
+    url = args.url
+    if not url:
+        workdir = Path(tempfile.mkdtemp(prefix="rfp_load_"))
+        write_schemas(workdir / "schema")
+        write_initiatives(args.seed_initiatives, workdir / "data" / "submissions", start_id=1)
+        counter = workdir / "global" / "global_counter.json"
+        counter.parent.mkdir(parents=True, exist_ok=True)
+        counter.write_text(f'{{"last_id": {args.seed_initiatives}}}')
+        server = start_server(workdir, args.port, args.workers, args.llm_latency)
+        url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_healthy(url)
+        stats, elapsed = asyncio.run(drive(url, args.users, args.flows, vendor_docs, args.timeout))
+        report(stats, elapsed)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -4,26 +4,69 @@ import json
 from datetime import date
 from pathlib import Path
 from typing import Dict, Any
-from fastapi import FastAPI, Request, UploadFile, File
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, RedirectResponse
-from docx import Document
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment
+import asyncio
+import hashlib
+import threading
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, Request, UploadFile, File, Form
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, RedirectResponse, Response, StreamingResponse
 import html as html_lib
-import io
-import google.generativeai as genai
-from PyPDF2 import PdfReader
+import mimetypes
+from urllib.parse import quote
+
+import api
+import blob_store
+import comparison
+import event_log
+import extraction
+import llm_output
+import retrieval
+import rfp_docx
+import search_index
+import similarity
+import speculative
+import storage
+import validators
+import vendor_responses
+import vendors
 
 # --- Config ---
+# docx, openpyxl, PyPDF2 and google.generativeai are imported where they are
+# used, so starting a worker or serving /health does not pay for them.
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    print("WARNING: GOOGLE_API_KEY environment variable not set. AI features will not work.")
-    gemini_model = None
-else:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    gemini_model = genai.GenerativeModel('gemini-2.0-pro-exp')
-
-app = FastAPI()
+GEMINI_MODEL_NAME = 'gemini-2.0-pro-exp'
+USE_FAKE_LLM = os.environ.get("USE_FAKE_LLM") == "1"
+
+gemini_model = None  # set on first use by get_gemini_model(); tests may assign a model directly
+_gemini_loaded = False
+_gemini_lock = threading.Lock()
+
+def get_gemini_model():
+    """The Gemini model, configured on first call; None when no API key is set."""
+    global gemini_model, _gemini_loaded
+    if gemini_model is None and not _gemini_loaded:
+        with _gemini_lock:
+            if gemini_model is None and not _gemini_loaded:
+                if USE_FAKE_LLM:
+                    # Deterministic offline model for benchmarks and load tests
+                    from fake_llm import FakeGeminiModel
+                    gemini_model = FakeGeminiModel(latency=float(os.environ.get("FAKE_LLM_LATENCY", "0")))
+                elif GOOGLE_API_KEY:
+                    import google.generativeai as genai
+                    genai.configure(api_key=GOOGLE_API_KEY)
+                    gemini_model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+                _gemini_loaded = True
+    return gemini_model
+
+def prewarm():
+    """Loads the heavy libraries and configures Gemini ahead of the first request that needs them."""
+    import docx, openpyxl, PyPDF2  # noqa: F401
+    get_gemini_model()
+
+router = APIRouter()
 
 # --- Files / folders ---
 GLOBAL_COUNTER_FILE = Path("global/global_counter.json")
@@ -49,8 +92,7 @@ SCHEMA_MAP = {
 }
 
 # --- Styling and helpers for UI ---
-STYLE = """
-<style>
+STYLESHEET = """
 body { font-family: 'Segoe UI', Tahoma, sans-serif; background:#f6f8fa; color:#222; margin:0; padding:0; display: flex; }
 .sidebar { width: 240px; background: #2c3e50; color: #ecf0f1; padding: 20px; height: 100vh; position: fixed; }
 .sidebar h2 { color: #ecf0f1; border: none; }
@@ -85,15 +127,67 @@ button:hover { background: #155ab3; }
 .initiative-list .info { font-size: 16px; }
 .initiative-list .info strong { color: #1a73e8; }
 .initiative-list .actions a { margin-left: 10px; font-size: 14px; }
-</style>
 """
+# Served once as a static asset; the content hash in the URL lets browsers cache it forever
+STYLESHEET_VERSION = hashlib.sha256(STYLESHEET.encode("utf-8")).hexdigest()[:12]
+STYLESHEET_URL = f"/static/style.{STYLESHEET_VERSION}.css"
+STATIC_CACHE_CONTROL = "public, max-age=31536000, immutable"
+GZIP_MINIMUM_SIZE = 1024  # bytes; smaller responses are sent as-is
+# Vendor PDFs and Office downloads are compressed already; gzip only costs CPU and breaks byte ranges
+GZIP_EXCLUDED_CONTENT_TYPES = DEFAULT_EXCLUDED_CONTENT_TYPES + (
+    "application/pdf",
+    "application/octet-stream",
+    "application/msword",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+)
 
 def get_base_layout(title: str, content: str) -> HTMLResponse:
-    html = f"""<!DOCTYPE html><html><head><title>{html_lib.escape(title)}</title>{STYLE}</head><body>
-    <div class="sidebar"><h2>RFP Assistant</h2><nav><a href="/">New Vendor Request</a><a href="/initiatives">List Initiatives</a></nav></div>
+    html = f"""<!DOCTYPE html><html><head><title>{html_lib.escape(title)}</title><link rel="stylesheet" href="{STYLESHEET_URL}"></head><body>
+    <div class="sidebar"><h2>RFP Assistant</h2><nav><a href="/">New Vendor Request</a><a href="/initiatives">List Initiatives</a><a href="/search">Search</a></nav></div>
     <main class="main-content">{content}</main></body></html>"""
     return HTMLResponse(content=html)
 
+def page_etag(*versions) -> str:
+    """ETag for a page rendered from data with the given versions (plus the layout itself)."""
+    payload = json.dumps([STYLESHEET_VERSION, versions], sort_keys=True, default=str)
+    return '"' + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32] + '"'
+
+def not_modified(request: Request, etag: str):
+    """A 304 response if the client's cached copy still matches ``etag``, else None."""
+    cached = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+    if etag in cached:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+class WeakETagWhenCompressed:
+    """Marks the ETag of a gzipped response weak, as the same tag also names the uncompressed body."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_weak_etag(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                etag = headers.get("etag")
+                if etag and headers.get("content-encoding") == "gzip" and not etag.startswith("W/"):
+                    headers["etag"] = "W/" + etag
+            await send(message)
+
+        await self.app(scope, receive, send_with_weak_etag)
+
+def with_etag(response, etag: str):
+    # no-cache: the browser may keep the page but must revalidate it every time
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 def render_progress(step:int):
     steps = ["1. Basic Info", "2. Details & Scoring", "3. Generate RFP"]
     html = '<div class="progress">'
@@ -105,17 +199,18 @@ def render_progress(step:int):
 
 # --- Counter helper ---
 def get_next_initiative_id() -> int:
-    if not GLOBAL_COUNTER_FILE.exists():
-        counter = {"last_id": 0}
-    else:
-        with open(GLOBAL_COUNTER_FILE, "r") as f:
-            try:
-                counter = json.load(f)
-            except Exception:
-                counter = {"last_id": 0}
-    counter["last_id"] = int(counter.get("last_id", 0)) + 1
-    with open(GLOBAL_COUNTER_FILE, "w") as f:
-        json.dump(counter, f, indent=2)
+    # Locked so concurrent submissions (also from other workers) never get the same id
+    with storage.locked("global_counter"):
+        if not GLOBAL_COUNTER_FILE.exists():
+            counter = {"last_id": 0}
+        else:
+            with open(GLOBAL_COUNTER_FILE, "r") as f:
+                try:
+                    counter = json.load(f)
+                except Exception:
+                    counter = {"last_id": 0}
+        counter["last_id"] = int(counter.get("last_id", 0)) + 1
+        storage.atomic_write_json(GLOBAL_COUNTER_FILE, counter)
     return counter["last_id"]
 
 # --- Schema loader & HTML form generator (flat "fields" with "section") ---
@@ -192,28 +287,10 @@ def generate_form_html(schema: Dict[str,Any], action="/submit", defaults:Dict[st
     return html
 
 # --- Save DOCX helper ---
-def save_rfp_doc(text: str, initiative_id: int) -> str:
-    RFP_FOLDER.mkdir(parents=True, exist_ok=True)
-    output_file = RFP_FOLDER / f"initiative_{initiative_id}_rfp.docx"
-    doc = Document()
-    # Simple markup: lines starting with ### or ## or # as headings
-    for line in text.splitlines():
-        l = line.strip()
-        if l.startswith("###"):
-            doc.add_heading(l.lstrip("# ").strip(), level=3)
-        elif l.startswith("##"):
-            doc.add_heading(l.lstrip("# ").strip(), level=2)
-        elif l.startswith("#"):
-            doc.add_heading(l.lstrip("# ").strip(), level=1)
-        elif l == "":
-            doc.add_paragraph("")  # blank line
-        else:
-            doc.add_paragraph(l)
-    doc.save(output_file)
-    return str(output_file)
-
 def save_comparison_docx(data: dict, initiative_id: int) -> str:
     """Saves the vendor comparison data to a .docx file."""
+    from docx import Document
+
     output_file = VENDOR_FOLDER / f"initiative_{initiative_id}" / "comparison_result.docx"
     doc = Document()
     doc.add_heading(f"Vendor Comparison for Initiative #{initiative_id}", level=1)
@@ -222,26 +299,34 @@ def save_comparison_docx(data: dict, initiative_id: int) -> str:
         doc.add_heading("Overall Recommendation", level=2)
         doc.add_paragraph(data["recommendation"].get("summary", "No summary provided."))
         doc.add_paragraph("Top Vendors: " + ", ".join(data["recommendation"].get("top_vendors", ["N/A"])))
+        if "stability" in data:
+            doc.add_paragraph(stability_text(data["stability"]))
 
     for vendor in data.get("vendors", []):
         doc.add_heading(vendor.get("vendor_name", "Unknown Vendor"), level=2)
+        if "weighted_score" in vendor:
+            doc.add_paragraph(f"Weighted Score: {vendor['weighted_score']} / 10")
 
         doc.add_heading("Key Proposal Points", level=3)
         doc.add_paragraph(vendor.get("summary", "Not available."))
 
         doc.add_heading("Evaluation Scores", level=3)
-        table = doc.add_table(rows=1, cols=3)
+        table = doc.add_table(rows=1, cols=4)
         table.style = 'Table Grid'
         hdr_cells = table.rows[0].cells
         hdr_cells[0].text = 'Criterion'
         hdr_cells[1].text = 'Score (/10)'
         hdr_cells[2].text = 'Percentage'
+        hdr_cells[3].text = 'Evidence'
 
         for criterion, score_details in vendor.get("scores", {}).items():
             row_cells = table.add_row().cells
             row_cells[0].text = criterion
             row_cells[1].text = str(score_details.get("score", "N/A"))
+            if score_details.get("samples"):
+                row_cells[1].text += f" (range {min(score_details['samples']):g}-{max(score_details['samples']):g})"
             row_cells[2].text = f"{score_details.get('percentage', 'N/A')}%"
+            row_cells[3].text = "; ".join(score_details.get("evidence", []))
 
         doc.add_heading("Strengths", level=3)
         doc.add_paragraph(vendor.get("strengths", "Not available."))
@@ -254,17 +339,20 @@ def save_comparison_docx(data: dict, initiative_id: int) -> str:
 
         doc.add_paragraph() # Add space between vendors
 
-    doc.save(output_file)
+    storage.atomic_save_document(output_file, doc)
     return str(output_file)
 
 def save_comparison_xlsx(data: dict, initiative_id: int) -> str:
     """Saves the vendor comparison data to an .xlsx file."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment
+
     output_file = VENDOR_FOLDER / f"initiative_{initiative_id}" / "comparison_result.xlsx"
     wb = Workbook()
     ws = wb.active
     ws.title = "Vendor Comparison"
 
-    headers = ["Vendor Name", "Criterion", "Score (/10)", "Percentage", "Summary", "Strengths", "Weaknesses", "Risks"]
+    headers = ["Vendor Name", "Weighted Score", "Criterion", "Score (/10)", "Percentage", "Summary", "Strengths", "Weaknesses", "Risks", "Score Spread"]
     ws.append(headers)
     for cell in ws[1]:
         cell.font = Font(bold=True)
@@ -275,6 +363,7 @@ def save_comparison_xlsx(data: dict, initiative_id: int) -> str:
         for criterion, score_details in vendor.get("scores", {}).items():
             ws.append([
                 vendor_name,
+                vendor.get("weighted_score"),
                 criterion,
                 score_details.get("score"),
                 score_details.get("percentage"),
@@ -282,11 +371,42 @@ def save_comparison_xlsx(data: dict, initiative_id: int) -> str:
                 vendor.get("strengths"),
                 vendor.get("weaknesses"),
                 vendor.get("risks"),
+                score_details.get("spread"),
             ])
-    wb.save(output_file)
+    storage.atomic_save_document(output_file, wb)
     return str(output_file)
 
+def record_vendor_participation(data: dict, initiative_id: int):
+    """Feeds comparison scores back into the vendor registry used by /find_vendors."""
+    top_vendors = data.get("recommendation", {}).get("top_vendors", [])
+    # get_registry() re-reads the file under the lock, so other workers' updates are kept
+    with storage.locked(vendors.REGISTRY_LOCK):
+        registry = vendors.get_registry()
+        for vendor in data.get("vendors", []):
+            name = vendor.get("vendor_name")
+            if not name:
+                continue
+            scores = [s.get("score") for s in vendor.get("scores", {}).values() if isinstance(s.get("score"), (int, float))]
+            average = round(sum(scores) / len(scores), 2) if scores else None
+            rank = top_vendors.index(name) + 1 if name in top_vendors else None
+            registry.record_participation(name, initiative_id, average, rank)
+        registry.save()
+
 # --- Data loading helper ---
+def load_initiatives() -> list:
+    """All base submissions, newest file name first."""
+    initiatives = []
+    for file in sorted(SUBMISSION_FOLDER.glob("initiative_*.json"), reverse=True):
+        if "_" in file.stem.replace("initiative_", ""):
+            continue # Skip detailed schema files
+        try:
+            with open(file, "r") as f:
+                data = json.load(f)
+                initiatives.append(data)
+        except (json.JSONDecodeError, KeyError):
+            continue
+    return initiatives
+
 def load_initiative_data(initiative_id: int, schema_name: str) -> dict:
     """Loads and merges the base and detailed submission data for an initiative."""
     base_file = SUBMISSION_FOLDER / f"initiative_{initiative_id}.json"
@@ -303,25 +423,108 @@ def load_initiative_data(initiative_id: int, schema_name: str) -> dict:
     # Merge the two dictionaries
     return {**base_data, **details_data}
 
-@app.get("/", response_class=HTMLResponse)
+def load_details_data(initiative_id: int) -> dict:
+    """Loads the detailed submission(s) of an initiative without knowing the schema name."""
+    details = {}
+    for file in sorted(SUBMISSION_FOLDER.glob(f"initiative_{initiative_id}_*.json")):
+        with open(file, "r") as f:
+            details.update(json.load(f))
+    return details
+
+# --- RFP and vendor shortlist builders (also run speculatively) ---
+def rfp_fingerprint(initiative_data: dict, schema_name: str) -> str:
+    return speculative.fingerprint(initiative_data, speculative.file_version(RFP_TEMPLATE_FOLDER / f"{schema_name}.txt"))
+
+def build_rfp(initiative_data: dict, schema_name: str) -> dict:
+    """Returns {"text", "notice"}: the schema's template filled in, or a Gemini draft when there is none."""
+    template_path = RFP_TEMPLATE_FOLDER / f"{schema_name}.txt"
+
+    if template_path.exists():
+        # --- Use Template ---
+        with open(template_path, "r") as f:
+            rfp_text = f.read()
+
+        # Replace placeholders
+        for key, value in initiative_data.items():
+            # Handle list values by joining them
+            if isinstance(value, list):
+                value_str = ", ".join(map(str, value))
+            else:
+                value_str = "" if value is None else str(value)
+            rfp_text = rfp_text.replace(f"{{{{{key}}}}}", value_str)
+
+        # Special placeholder for current date
+        rfp_text = rfp_text.replace("{% raw %}{{% endraw %}CURRENT_DATE{% raw %}}{% endraw %}", date.today().isoformat())
+        return {"text": rfp_text, "notice": f"This RFP was generated from the '{template_path.name}' template."}
+
+    # --- Fallback to LLM ---
+    prompt = f"""
+    Based on the following sourcing initiative data, generate a professional and comprehensive Request for Proposal (RFP) document.
+    The document should be well-structured with clear sections, headings, and lists.
+
+    Sourcing Initiative Data:
+    {json.dumps(initiative_data, indent=2)}
+    """
+    response = get_gemini_model().generate_content(prompt)
+    return {"text": response.text, "notice": "This RFP was generated by Gemini. Review and edit as needed."}
+
+def vendors_fingerprint(initiative_data: dict) -> str:
+    return speculative.fingerprint(initiative_data, speculative.file_version(vendors.REGISTRY_FILE))
+
+def build_vendor_shortlist(initiative_data: dict) -> dict:
+    """Ranks registry vendors and asks Gemini for justifications.
+
+    When nothing in the registry matches, ``candidates`` is empty and
+    ``suggestions`` holds Gemini's own vendor suggestions (if available).
+    """
+    candidates = vendors.get_registry().shortlist(initiative_data, limit=7)
+    model = get_gemini_model()
+    justifications = {}
+    notice = "Vendors were ranked from the local vendor registry by matching services, GMP standard, markets and dosage form."
+    if not candidates:
+        suggestions = None
+        if model:
+            try:
+                suggestions = ai_vendor_suggestions(initiative_data)
+            except Exception:
+                pass  # the route retries and reports the error
+        return {"candidates": [], "justifications": {}, "notice": notice, "suggestions": suggestions}
+    if model:
+        try:
+            response = model.generate_content(vendors.justification_prompt(initiative_data, candidates))
+            parsed = llm_output.parse_json(response.text)
+            if isinstance(parsed, dict):
+                justifications = parsed
+            else:
+                notice += " Justifications could not be generated (the model did not return a vendor-to-reason object)."
+        except Exception as e:
+            notice += f" Justifications could not be generated ({html_lib.escape(str(e))})."
+    return {"candidates": candidates, "justifications": justifications, "notice": notice}
+
+async def schedule_speculation(initiative_id: int, schema_name: str):
+    """Starts RFP generation and vendor shortlisting in the background (SPECULATIVE_PRECOMPUTE=1)."""
+    initiative_data = await storage.run(load_initiative_data, initiative_id, schema_name)
+    jobs = {"vendors": (vendors_fingerprint(initiative_data), build_vendor_shortlist, initiative_data)}
+    if get_gemini_model() or (RFP_TEMPLATE_FOLDER / f"{schema_name}.txt").exists():
+        jobs["rfp"] = (rfp_fingerprint(initiative_data, schema_name), build_rfp, initiative_data, schema_name)
+    await speculative.schedule(initiative_id, jobs)
+
+@router.get("/", response_class=HTMLResponse)
 async def main_form():
-    if not SCHEMA_FILE.exists():
+    schema = await storage.run(load_schema, SCHEMA_FILE.name)
+    if not schema:
         return HTMLResponse("<h3>No main schema found at schema/form_schema.json</h3>", status_code=500)
-    schema = load_schema(SCHEMA_FILE.name)
     html = generate_form_html(schema, action="/submit")
     return get_base_layout("New Initiative", html)
 
-@app.get("/edit/{initiative_id}", response_class=HTMLResponse)
+@router.get("/edit/{initiative_id}", response_class=HTMLResponse)
 async def edit_initiative_form(initiative_id: int):
     """Displays the main form pre-filled with an initiative's data for editing."""
-    base_file = SUBMISSION_FOLDER / f"initiative_{initiative_id}.json"
-    if not base_file.exists():
+    defaults = await storage.read_json_async(SUBMISSION_FOLDER / f"initiative_{initiative_id}.json")
+    if defaults is None:
         return HTMLResponse("<h3>Initiative not found.</h3>", status_code=404)
 
-    with open(base_file, "r") as f:
-        defaults = json.load(f)
-
-    schema = load_schema(SCHEMA_FILE.name)
+    schema = await storage.run(load_schema, SCHEMA_FILE.name)
     if not schema:
         return HTMLResponse("<h3>No main schema found at schema/form_schema.json</h3>", status_code=500)
 
@@ -329,19 +532,20 @@ async def edit_initiative_form(initiative_id: int):
     html = generate_form_html(schema, action=action_url, defaults=defaults)
     return get_base_layout(f"Edit Initiative #{initiative_id}", html)
 
-@app.get("/initiatives", response_class=HTMLResponse)
-async def list_initiatives():
+def submissions_version() -> list:
+    """Name, mtime and size of every base submission: changes whenever the list page would."""
+    return sorted((entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                  for entry in os.scandir(SUBMISSION_FOLDER)
+                  if entry.name.startswith("initiative_") and "_" not in entry.name[len("initiative_"):])
+
+@router.get("/initiatives", response_class=HTMLResponse)
+async def list_initiatives(request: Request):
     """Lists all created initiatives."""
-    initiatives = []
-    for file in sorted(SUBMISSION_FOLDER.glob("initiative_*.json"), reverse=True):
-        if "_" in file.stem.replace("initiative_", ""):
-            continue # Skip detailed schema files
-        try:
-            with open(file, "r") as f:
-                data = json.load(f)
-                initiatives.append(data)
-        except (json.JSONDecodeError, KeyError):
-            continue
+    etag = page_etag("initiatives", await storage.run(submissions_version))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    initiatives = await storage.run(load_initiatives)
 
     list_html = "<h1>📝 All Initiatives</h1>"
     if not initiatives:
@@ -365,31 +569,39 @@ async def list_initiatives():
                 list_html += f'<a href="/rfp/{init_id}/{schema_name}">Generate RFP</a>'
             list_html += f'<a href="/upload_vendor_responses/{init_id}">Upload Responses</a>'
             list_html += f'<a href="/compare_vendors/{init_id}">Compare</a>'
+            list_html += f'<a href="/history/{init_id}">History</a>'
             list_html += '</div></li>'
         list_html += '</ul>'
 
     container_html = f'<div class="container">{list_html}</div>'
-    return get_base_layout("All Initiatives", container_html)
+    return with_etag(get_base_layout("All Initiatives", container_html), etag)
 
-@app.post("/submit", response_class=HTMLResponse)
-async def submit_main(request: Request):
+async def validated_form(request: Request, schema_name: str) -> tuple:
+    """Typed ``(record, errors)`` for the posted form, checked against ``schema/<schema_name>.json``."""
     form = await request.form()
-    # convert MultiDict -> dict with lists for repeated names (checkbox)
-    data = {}
-    for k, v in form.multi_items():
-        if k in data:
-            if isinstance(data[k], list):
-                data[k].append(v)
-            else:
-                data[k] = [data[k], v]
-        else:
-            data[k] = v
+    return validators.validate_form(schema_name, form.multi_items(), SCHEMA_DIR)
+
+def invalid_form_response(errors: list) -> HTMLResponse:
+    html = '<div class="container">'
+    html += "<h1>Please correct the form</h1><ul>"
+    html += "".join(f"<li>{html_lib.escape(error)}</li>" for error in errors)
+    html += '</ul><p><a href="javascript:history.back()">⟵ Back to the form</a></p></div>'
+    response = get_base_layout("Invalid submission", html)
+    response.status_code = 400
+    return response
+
+@router.post("/submit", response_class=HTMLResponse)
+async def submit_main(request: Request):
+    data, errors = await validated_form(request, SCHEMA_FILE.stem)
+    if errors:
+        return invalid_form_response(errors)
 
-    initiative_id = get_next_initiative_id()
+    initiative_id = await storage.run(get_next_initiative_id)
     data["initiative_id"] = initiative_id
     base_file = SUBMISSION_FOLDER / f"initiative_{initiative_id}.json"
-    with open(base_file, "w") as f:
-        json.dump(data, f, indent=2)
+    await storage.write_json_async(base_file, data, lock=storage.initiative_lock_name(initiative_id))
+    await storage.run(event_log.append, "initiative_created", initiative_id, record=data)
+    await storage.run(search_index.reindex_initiative, initiative_id)
 
     # Decide next schema based on request_type + services_needed
     request_type = data.get("request_type")
@@ -410,7 +622,7 @@ async def submit_main(request: Request):
         return get_base_layout(f"Initiative #{initiative_id}", html)
 
     # load schema and render details form
-    schema = load_schema(schema_file)
+    schema = await storage.run(load_schema, schema_file)
     if not schema:
         return HTMLResponse(f"<h3>Schema file {schema_file} missing in schema/ folder.</h3>", status_code=500)
 
@@ -422,45 +634,34 @@ async def submit_main(request: Request):
     form_html = form_html.replace(render_progress(1), render_progress(2))
     return get_base_layout(f"Details for Initiative #{initiative_id}", form_html)
 
-@app.post("/update/{initiative_id}", response_class=HTMLResponse)
+@router.post("/update/{initiative_id}", response_class=HTMLResponse)
 async def update_initiative(request: Request, initiative_id: int):
     """Handles updates for the main initiative form."""
-    form = await request.form()
-    data = {}
-    for k, v in form.multi_items():
-        if k in data:
-            if isinstance(data[k], list):
-                data[k].append(v)
-            else:
-                data[k] = [data[k], v]
-        else:
-            data[k] = v
+    data, errors = await validated_form(request, SCHEMA_FILE.stem)
+    if errors:
+        return invalid_form_response(errors)
 
     data["initiative_id"] = initiative_id  # Ensure the ID remains the same
     base_file = SUBMISSION_FOLDER / f"initiative_{initiative_id}.json"
-    with open(base_file, "w") as f:
-        json.dump(data, f, indent=2)
+    await storage.write_json_async(base_file, data, lock=storage.initiative_lock_name(initiative_id))
+    await storage.run(event_log.append, "initiative_updated", initiative_id, record=data)
+    await storage.run(search_index.reindex_initiative, initiative_id)
+    await speculative.discard(initiative_id)
 
     return RedirectResponse(url="/initiatives", status_code=303)
 
-@app.post("/submit/{schema_name}/{initiative_id}", response_class=HTMLResponse)
+@router.post("/submit/{schema_name}/{initiative_id}", response_class=HTMLResponse)
 async def submit_details(request: Request, schema_name: str, initiative_id: int):
-    form = await request.form()
-    data = {}
-    for k, v in form.multi_items():
-        if k in data:
-            if isinstance(data[k], list):
-                data[k].append(v)
-            else:
-                data[k] = [data[k], v]
-        else:
-            data[k] = v
+    data, errors = await validated_form(request, schema_name)
+    if errors:
+        return invalid_form_response(errors)
 
-    # Ensure submissions folder exists
-    SUBMISSION_FOLDER.mkdir(parents=True, exist_ok=True)
     file_path = SUBMISSION_FOLDER / f"initiative_{initiative_id}_{schema_name}.json"
-    with open(file_path, "w") as f:
-        json.dump(data, f, indent=2)
+    await storage.write_json_async(file_path, data, lock=storage.initiative_lock_name(initiative_id))
+    await storage.run(event_log.append, "details_saved", initiative_id, schema=schema_name, record=data)
+    await storage.run(search_index.reindex_initiative, initiative_id)
+    if speculative.ENABLED:
+        await schedule_speculation(initiative_id, schema_name)
 
     # Confirm and provide link to generate RFP
     html = '<div class="container">'
@@ -473,7 +674,7 @@ async def submit_details(request: Request, schema_name: str, initiative_id: int)
     html += "</div>"
     return get_base_layout(f"Initiative #{initiative_id} Saved", html)
 
-@app.get("/rfp/{initiative_id}/{schema_name}", response_class=HTMLResponse)
+@router.get("/rfp/{initiative_id}/{schema_name}", response_class=HTMLResponse)
 async def rfp_loading(initiative_id:int, schema_name:str):
     # show a loading screen, then redirect to result page which actually runs ollama
     html = '<div class="container">'
@@ -489,53 +690,31 @@ async def rfp_loading(initiative_id:int, schema_name:str):
     html += '</div>'
     return get_base_layout("Generating RFP...", html)
 
-@app.get("/rfp_result/{initiative_id}/{schema_name}", response_class=HTMLResponse)
-async def rfp_result(initiative_id:int, schema_name:str):
+@router.get("/rfp_result/{initiative_id}/{schema_name}", response_class=HTMLResponse)
+async def rfp_result(initiative_id:int, schema_name:str, request: Request):
     try:
-        initiative_data = load_initiative_data(initiative_id, schema_name)
+        initiative_data = await storage.run(load_initiative_data, initiative_id, schema_name)
     except FileNotFoundError:
         return HTMLResponse("<h3>Initiative files not found. Make sure both JSON submissions exist.</h3>", status_code=404)
 
-    rfp_text = ""
-    template_path = RFP_TEMPLATE_FOLDER / f"{schema_name}.txt"
-    source_notice = ""
-
-    if template_path.exists():
-        # --- Use Template ---
-        source_notice = f"This RFP was generated from the '{template_path.name}' template."
-        with open(template_path, "r") as f:
-            rfp_text = f.read()
-
-        # Replace placeholders
-        for key, value in initiative_data.items():
-            # Handle list values by joining them
-            if isinstance(value, list):
-                value_str = ", ".join(map(str, value))
-            else:
-                value_str = str(value)
-            rfp_text = rfp_text.replace(f"{{{{{key}}}}}", value_str)
-
-        # Special placeholder for current date
-        rfp_text = rfp_text.replace("{% raw %}{{% endraw %}CURRENT_DATE{% raw %}}{% endraw %}", date.today().isoformat())
-
-    else:
-        # --- Fallback to LLM ---
-        source_notice = "This RFP was generated by Gemini. Review and edit as needed."
-        if not gemini_model:
+    key = rfp_fingerprint(initiative_data, schema_name)
+    # Same inputs and the same saved document as the client's copy: nothing to regenerate
+    rfp_doc = RFP_FOLDER / f"initiative_{initiative_id}_rfp.docx"
+    cached = not_modified(request, page_etag("rfp", key, await storage.run(speculative.file_version, rfp_doc)))
+    if cached:
+        return cached
+    rfp = await speculative.get(initiative_id, "rfp", key)
+    if rfp is None:
+        if not (RFP_TEMPLATE_FOLDER / f"{schema_name}.txt").exists() and not get_gemini_model():
             return HTMLResponse("<h3>Gemini API is not configured. Please set the GOOGLE_API_KEY environment variable.</h3>", status_code=500)
-
-        prompt = f"""
-        Based on the following sourcing initiative data, generate a professional and comprehensive Request for Proposal (RFP) document.
-        The document should be well-structured with clear sections, headings, and lists.
-
-        Sourcing Initiative Data:
-        {json.dumps(initiative_data, indent=2)}
-        """
-        response = gemini_model.generate_content(prompt)
-        rfp_text = response.text
+        rfp = await storage.run(build_rfp, initiative_data, schema_name)
+    rfp_text, source_notice = rfp["text"], rfp["notice"]
 
     # Save docx for download
-    save_rfp_doc(rfp_text, initiative_id)
+    rfp_path = await storage.run(rfp_docx.save_rfp_doc, rfp_text, initiative_id)
+    await storage.run(search_index.index_rfp, initiative_id, rfp_text, Path(rfp_path))
+    await storage.run(event_log.append, "rfp_generated", initiative_id, schema=schema_name,
+                      sha256=vendor_responses.content_hash(rfp_text.encode("utf-8")), chars=len(rfp_text))
     safe_text = html_lib.escape(rfp_text)
     html = '<div class="container">'
     html += render_progress(3)
@@ -545,9 +724,10 @@ async def rfp_result(initiative_id:int, schema_name:str):
     html += f'<p class="notice">{source_notice}</p>'
     html += f'<a class="download" href="/upload_vendor_responses/{initiative_id}">⬆️ Upload Vendor Responses</a>'
     html += '</div>'
-    return get_base_layout(f"RFP for Initiative #{initiative_id}", html)
+    etag = page_etag("rfp", key, await storage.run(speculative.file_version, Path(rfp_path)))
+    return with_etag(get_base_layout(f"RFP for Initiative #{initiative_id}", html), etag)
 
-@app.get("/find_vendors/{initiative_id}/{schema_name}", response_class=HTMLResponse)
+@router.get("/find_vendors/{initiative_id}/{schema_name}", response_class=HTMLResponse)
 async def find_vendors_loading(initiative_id: int, schema_name: str):
     """Show a loading screen while the AI searches for vendors."""
     html = '<div class="container">'
@@ -564,14 +744,39 @@ async def find_vendors_loading(initiative_id: int, schema_name: str):
     return get_base_layout("Finding Vendors...", html)
 
 
-@app.get("/find_vendors_result/{initiative_id}/{schema_name}", response_class=HTMLResponse)
+@router.get("/find_vendors_result/{initiative_id}/{schema_name}", response_class=HTMLResponse)
 async def find_vendors_result(initiative_id: int, schema_name: str):
-    """Use Ollama to find vendors based on initiative data."""
+    """Shortlist vendors from the local registry; Gemini only writes the justifications."""
     try:
-        initiative_data = load_initiative_data(initiative_id, schema_name)
+        initiative_data = await storage.run(load_initiative_data, initiative_id, schema_name)
     except FileNotFoundError:
         return HTMLResponse("<h3>Initiative data not found.</h3>", status_code=404)
 
+    shortlist = await speculative.get(initiative_id, "vendors", vendors_fingerprint(initiative_data))
+    if shortlist is None:
+        shortlist = await storage.run(build_vendor_shortlist, initiative_data)
+    candidates, justifications, notice = shortlist["candidates"], shortlist["justifications"], shortlist["notice"]
+    if not candidates:
+        # Nothing in the registry matches yet - fall back to asking the model for suggestions
+        return await suggest_vendors_from_ai(initiative_id, schema_name, initiative_data, shortlist.get("suggestions"))
+
+    html = '<div class="container">'
+    html += "<h1>🤖 Suggested Vendors</h1>"
+    html += '<ul class="initiative-list">'
+    for candidate in candidates:
+        vendor = candidate["vendor"]
+        matched = "; ".join(f"{field.replace('_', ' ')}: {', '.join(terms)}" for field, terms in candidate["matched"].items())
+        reason = justifications.get(vendor["name"]) or f"Matches {matched}."
+        html += f'<li><div class="info"><strong>{html_lib.escape(vendor["name"])}</strong> &mdash; match score {candidate["score"]}'
+        html += f'<div class="notice">{html_lib.escape(str(reason))}</div></div></li>'
+    html += '</ul>'
+    html += f'<p class="notice">{notice} Further vetting is recommended.</p>'
+    html += f'<p><a href="/rfp_result/{initiative_id}/{schema_name}">← Back to RFP</a></p>'
+    html += '</div>'
+    return get_base_layout(f"Vendors for Initiative #{initiative_id}", html)
+
+def ai_vendor_suggestions(initiative_data: dict) -> str:
+    """Asks Gemini to propose vendors when the registry has no matching candidates."""
     prompt = f"""
 You are a pharmaceutical industry sourcing specialist. Based on the following project details, please identify and list 7 potential vendors that would be a good fit.
 
@@ -582,61 +787,164 @@ Project Details:
 
 Please format your response as a list.
 """
+    return get_gemini_model().generate_content(prompt).text
 
-    if not gemini_model:
-        return HTMLResponse("<h3>Gemini API is not configured. Please set the GOOGLE_API_KEY environment variable.</h3>", status_code=500)
-
-    try:
-        prompt="What is Capital of Italy ?"
-        response = gemini_model.generate_content(prompt) # Use the detailed prompt
-        result_text = response.text
-    except Exception as e:
-        error_message = f"<h3>Error calling Gemini API:</h3><pre>{html_lib.escape(str(e))}</pre>"
-        return HTMLResponse(error_message, status_code=500)
+async def suggest_vendors_from_ai(initiative_id: int, schema_name: str, initiative_data: dict, result_text: str = None):
+    """Renders Gemini's vendor suggestions, reusing a speculatively computed answer when given."""
+    if result_text is None:
+        if not get_gemini_model():
+            return HTMLResponse("<h3>Gemini API is not configured. Please set the GOOGLE_API_KEY environment variable.</h3>", status_code=500)
+        try:
+            result_text = await storage.run(ai_vendor_suggestions, initiative_data)
+        except Exception as e:
+            error_message = f"<h3>Error calling Gemini API:</h3><pre>{html_lib.escape(str(e))}</pre>"
+            return HTMLResponse(error_message, status_code=500)
 
     html = '<div class="container">'
     html += "<h1>🤖 Suggested Vendors</h1>"
     html += f'<div class="rfp-output" style="white-space: pre-wrap;">{html_lib.escape(result_text)}</div>'
-    html += f'<p class="notice">These vendors were suggested by Gemini based on your input. Further vetting is recommended.</p>'
+    html += f'<p class="notice">No registered vendor matched this initiative, so these vendors were suggested by Gemini. Further vetting is recommended.</p>'
     html += f'<p><a href="/rfp_result/{initiative_id}/{schema_name}">← Back to RFP</a></p>'
     html += '</div>'
     return get_base_layout(f"Vendors for Initiative #{initiative_id}", html)
 
-@app.get("/download_rfp/{initiative_id}")
+@router.get("/download_rfp/{initiative_id}")
 async def download_rfp(initiative_id:int):
     path = RFP_FOLDER / f"initiative_{initiative_id}_rfp.docx"
     if path.exists():
         return FileResponse(str(path), filename=f"initiative_{initiative_id}_RFP.docx")
     return HTMLResponse("<h3>RFP not found.</h3>", status_code=404)
 
-@app.get("/initiative/{initiative_id}", response_class=JSONResponse)
-async def get_initiative(initiative_id:int):
+@router.get("/initiative/{initiative_id}", response_class=JSONResponse)
+async def get_initiative(initiative_id:int, request: Request):
     # return base submission if exists
-    file = SUBMISSION_FOLDER / f"initiative_{initiative_id}.json"
-    if not file.exists():
+    base_file = SUBMISSION_FOLDER / f"initiative_{initiative_id}.json"
+    etag = page_etag("initiative", initiative_id, await storage.run(speculative.file_version, base_file))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    data = await storage.read_json_async(base_file)
+    if data is None:
         return JSONResponse({"error":"Initiative not found"}, status_code=404)
-    with open(file,"r") as f:
-        return JSONResponse(json.load(f))
-
-@app.get("/health")
+    return with_etag(JSONResponse(data), etag)
+
+@router.get("/history/{initiative_id}", response_class=HTMLResponse)
+async def initiative_history(initiative_id: int):
+    """Every recorded change to an initiative, newest first."""
+    events = await storage.run(event_log.history, initiative_id)
+    html = f'<div class="container"><h1>🕘 History of Initiative #{initiative_id}</h1>'
+    if not events:
+        html += '<p class="notice">No recorded changes yet.</p>'
+    else:
+        html += '<ul class="initiative-list">'
+        for event in reversed(events):
+            details = {k: v for k, v in event["data"].items() if k != "record"}
+            html += (f'<li><div class="info"><strong>{html_lib.escape(event["event"].replace("_", " "))}</strong> '
+                     f'&mdash; {html_lib.escape(event["at"])}')
+            if details:
+                html += f'<div class="notice">{html_lib.escape(json.dumps(details, default=str)[:300])}</div>'
+            html += '</div></li>'
+        html += '</ul>'
+    html += '<p><a href="/initiatives">← Back to Initiatives</a></p></div>'
+    return get_base_layout(f"History of Initiative #{initiative_id}", html)
+
+@router.get(STYLESHEET_URL.replace(STYLESHEET_VERSION, "{version}"))
+async def stylesheet(version: str):
+    if version != STYLESHEET_VERSION:
+        return Response(status_code=404)
+    return Response(STYLESHEET, media_type="text/css", headers={"Cache-Control": STATIC_CACHE_CONTROL})
+
+@router.get("/health")
 async def health():
     return {"status":"ok"}
 
+@router.get("/search", response_class=HTMLResponse)
+async def search_page(q: str = "", request_type: str = "", gmp_standard: str = "", target_markets: str = "",
+                      kind: str = "", format: str = "html"):
+    """Full-text search across initiatives, generated RFPs and vendor responses."""
+    filters = {"request_type": request_type, "gmp_standard": gmp_standard, "target_markets": target_markets}
+    if q.strip():
+        result = await storage.run(search_index.search, q, filters, kind=kind or None)
+    else:
+        result = {"query": q, "hits": [], "took_ms": 0.0}
+    if format == "json":
+        for hit in result["hits"]:
+            hit["snippet"] = hit["snippet"].replace(search_index.SNIPPET_START, "").replace(search_index.SNIPPET_END, "")
+        return JSONResponse(result)
+
+    options = await storage.run(search_index.filter_options)
+    options["kind"] = ["initiative", "rfp", "vendor"]
+    selected = {**filters, "kind": kind}
+    html = '<div class="container"><h1>🔎 Search</h1>'
+    html += '<form method="get" action="/search">'
+    html += f'<input type="text" name="q" value="{html_lib.escape(q)}" placeholder="e.g. EU GMP fill-finish" autofocus>'
+    html += '<div class="form-grid">'
+    for field, label in [("request_type", "Request Type"), ("gmp_standard", "GMP Standard"),
+                         ("target_markets", "Target Market"), ("kind", "Document Type")]:
+        html += f'<div><label>{label}</label><select name="{field}"><option value="">Any</option>'
+        for opt in options.get(field, []):
+            sel = "selected" if opt == selected[field] else ""
+            html += f'<option value="{html_lib.escape(opt)}" {sel}>{html_lib.escape(opt)}</option>'
+        html += '</select></div>'
+    html += '</div><button type="submit">Search</button></form>'
+
+    if not await storage.run(search_index.archive_indexed):
+        html += '<p class="notice">Older initiatives are still being indexed; results may be incomplete.</p>'
+    if q.strip():
+        html += f'<p class="notice">{len(result["hits"])} results in {result["took_ms"]} ms</p>'
+        html += '<ul class="initiative-list">'
+        for hit in result["hits"]:
+            init_id = hit["initiative_id"]
+            link = {"rfp": f"/download_rfp/{init_id}", "vendor": f"/compare_vendors/{init_id}"}.get(hit["kind"], f"/edit/{init_id}")
+            snippet = html_lib.escape(hit["snippet"])
+            snippet = snippet.replace(search_index.SNIPPET_START, "<mark>").replace(search_index.SNIPPET_END, "</mark>")
+            html += f'<li><div class="info"><strong>#{init_id}</strong> &mdash; {html_lib.escape(hit["kind"])}: '
+            html += f'<a href="{link}">{html_lib.escape(hit["title"] or "")}</a>'
+            html += f'<div class="notice">{snippet}</div></div></li>'
+        html += '</ul>'
+    html += '</div>'
+    return get_base_layout("Search", html)
+
+
 
+def pages_read(record: dict):
+    """"12 page(s)", or "40 of 340 page(s) read" for a response cut at the extraction budget."""
+    if not record.get("pages"):
+        return None
+    if record.get("truncated"):
+        if record["pages"] == 1:
+            return "1 page, cut at the extraction budget"
+        return f"{record['pages_extracted']} of {record['pages']} page(s) read"
+    return f"{record['pages']} page(s)"
 
-@app.get("/upload_vendor_responses/{initiative_id}", response_class=HTMLResponse)
+@router.get("/upload_vendor_responses/{initiative_id}", response_class=HTMLResponse)
 async def upload_vendor_form(initiative_id: int):
     """Show upload form for vendor responses."""
+    manifest = await storage.run(vendor_responses.load_manifest, VENDOR_FOLDER / f"initiative_{initiative_id}")
+    current = ""
+    if manifest:
+        current = '<p class="notice">Currently uploaded:</p><ul>'
+        for name, record in manifest.items():
+            details = [f"{record['size'] / 1024:,.0f} KB" if record.get("size") is not None else None,
+                       pages_read(record),
+                       f"uploaded {record['uploaded_at']}"]
+            link = f"/vendor_response_file/{initiative_id}/{quote(name)}"
+            current += f"<li><a href=\"{link}\">{html_lib.escape(name)}</a> <span class='notice'>({', '.join(filter(None, details))})</span></li>"
+        current += "</ul>"
     html_content = f"""
     <div class="container">
         <h1>📤 Upload Vendor Responses</h1>
         <form action="/upload_vendor_responses/{initiative_id}" method="post" enctype="multipart/form-data">
             <p>Please upload between <b>2 and 7</b> vendor response files (PDF, DOCX, or TXT).</p>
+            {current}
             <input type="file" name="files" multiple required accept=".pdf,.docx,.txt">
-            <br><br>
+            <div class="radio-group">
+                <label><input type="radio" name="mode" value="replace" checked> Replace all existing responses</label>
+                <label><input type="radio" name="mode" value="append"> Add to existing responses (same file name replaces that vendor)</label>
+            </div>
             <button type="submit">Upload & Compare</button>
         </form>
-        <p class="notice">Each vendor response will be analyzed and compared using AI.</p>
+        <p class="notice">Each vendor response will be analyzed and compared using AI. Vendors whose files did not change keep their previous evaluation.</p>
     </div>
     """
     return get_base_layout(f"Upload Responses for Initiative #{initiative_id}", html_content)
@@ -645,51 +953,90 @@ async def upload_vendor_form(initiative_id: int):
 VENDOR_FOLDER = Path("data/vendor_responses")
 VENDOR_FOLDER.mkdir(parents=True, exist_ok=True)
 
-@app.post("/upload_vendor_responses/{initiative_id}")
-async def upload_vendor_files(initiative_id: int, files: list[UploadFile] = File(...)):
-    """Upload and process vendor responses, enforcing 2–7 file count."""
-    if len(files) < 2 or len(files) > 7:
+def upload_record(filename: str, content: bytes, extracted: dict) -> tuple:
+    """(upload record for vendor_responses.save_responses, [(page number, page text)]) of one extracted file."""
+    upload = {
+        "text": extracted["text"], "sha256": vendor_responses.content_hash(content), "size": len(content),
+        "pages": extracted["page_count"], "pages_extracted": extracted["pages_extracted"],
+        "truncated": extracted["truncated"], "page_offsets": extracted["page_offsets"],
+        "extraction_ms": extracted["extraction_ms"],
+    }
+    return upload, extracted["pages"]
+
+def extract_upload(filename: str, content: bytes) -> tuple:
+    """``upload_record`` of one vendor file, extracted within the budget."""
+    return upload_record(filename, content, extraction.extract(filename, content))
+
+def store_vendor_upload(upload_dir: Path, uploads: dict, page_texts: dict, mode: str) -> dict:
+    """Writes texts, the manifest, the chunk index and similarity report; call under the initiative lock."""
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    manifest, _ = vendor_responses.save_responses(upload_dir, uploads, mode)
+    chunk_index = retrieval.save_chunk_index(upload_dir, page_texts, keep_vendors=list(manifest))
+    similarity.save_report(upload_dir, chunk_index)
+    return manifest
+
+async def save_vendor_upload(initiative_id: int, contents: dict, mode: str = "replace") -> dict:
+    """Extracts, stores and indexes uploaded vendor files ({filename: content}); returns the manifest."""
+    upload_dir = VENDOR_FOLDER / f"initiative_{initiative_id}"
+    uploads = {}
+    page_texts = {}  # filename -> [(page number, text)] for retrieval citations
+
+    # Page by page within the budget, several files at once
+    extracted = await storage.run(extraction.extract_many, contents)
+    for filename, content in contents.items():
+        uploads[filename], page_texts[filename] = upload_record(filename, content, extracted[filename])
+        # Content-addressed, so this needs no lock: identical files share one blob
+        uploads[filename]["blob"] = await storage.run(blob_store.put, content)
+
+    manifest = await storage.locked_run(
+        storage.initiative_lock_name(initiative_id), store_vendor_upload, upload_dir, uploads, page_texts, mode,
+    )
+    texts = {filename: upload["text"] for filename, upload in uploads.items()}
+    sources = {filename: vendor_responses.text_path(upload_dir, filename, manifest) for filename in manifest}
+    await storage.run(search_index.index_vendor_responses, initiative_id, texts, sources, list(manifest))
+    await storage.run(event_log.append, "vendor_responses_uploaded", initiative_id, mode=mode, files={
+        filename: {key: upload[key] for key in ("sha256", "size", "pages", "pages_extracted", "truncated", "blob")}
+        for filename, upload in uploads.items()
+    })
+    return manifest
+
+@router.post("/upload_vendor_responses/{initiative_id}")
+async def upload_vendor_files(initiative_id: int, files: list[UploadFile] = File(...), mode: str = Form("replace")):
+    """Upload and process vendor responses, enforcing 2–7 vendors in total."""
+    upload_dir = VENDOR_FOLDER / f"initiative_{initiative_id}"
+    mode = mode if mode in vendor_responses.UPLOAD_MODES else "replace"
+    existing = set(await storage.run(vendor_responses.load_manifest, upload_dir)) if mode == "append" else set()
+    total = len(existing | {file.filename for file in files})
+    if total < 2 or total > 7:
         error_html = f"""
             <div class='container'>
                 <h2>⚠️ Invalid number of files uploaded</h2>
-                <p>You must upload between <b>2 and 7</b> vendor responses. You uploaded {len(files)}.</p>
+                <p>An initiative needs between <b>2 and 7</b> vendor responses. This upload would leave {total}.</p>
                 <a href="/upload_vendor_responses/{initiative_id}">← Try Again</a>
             </div>
             """
         return get_base_layout("Upload Error", error_html)
 
-    upload_dir = VENDOR_FOLDER / f"initiative_{initiative_id}"
-    upload_dir.mkdir(parents=True, exist_ok=True)
-
-    combined_data = {}
-
-    for file in files:
-        content = await file.read()
-        text = ""
-
-        if file.filename.lower().endswith(".pdf"):
-            pdf = PdfReader(io.BytesIO(content))
-            for page in pdf.pages:
-                text += page.extract_text() or ""
-        elif file.filename.lower().endswith(".docx"):
-            doc = Document(io.BytesIO(content))
-            for para in doc.paragraphs:
-                text += para.text + "\n"
-        else:
-            text = content.decode("utf-8", errors="ignore")
-
-        combined_data[file.filename] = text.strip()
-        with open(upload_dir / file.filename, "wb") as f:
-            f.write(content)
-
-    combined_path = upload_dir / "combined_vendor_responses.json"
-    with open(combined_path, "w") as f:
-        json.dump(combined_data, f, indent=2)
+    await save_vendor_upload(initiative_id, {file.filename: await file.read() for file in files}, mode)
 
     # Call compare page handler to run the AI comparison immediately and return its HTML
     return RedirectResponse(url=f"/compare_vendors/{initiative_id}", status_code=303)
 
-@app.get("/download_comparison/{initiative_id}")
+@router.get("/vendor_response_file/{initiative_id}/{filename:path}")
+async def download_vendor_file(initiative_id: int, filename: str):
+    """Stream an uploaded vendor file back from the blob store (or the raw file of a legacy folder)."""
+    upload_dir = VENDOR_FOLDER / f"initiative_{initiative_id}"
+    record = (await storage.run(vendor_responses.load_manifest, upload_dir)).get(filename, {})
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    headers = {"Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}"}
+    if record.get("legacy") and (upload_dir / filename).is_file():
+        return FileResponse(upload_dir / filename, media_type=media_type, headers=headers)
+    sha256 = record.get("blob")
+    if not sha256 or not await storage.run(blob_store.exists, sha256):
+        return HTMLResponse("<h3>Vendor file not found.</h3>", status_code=404)
+    return StreamingResponse(blob_store.iter_blob(sha256), media_type=media_type, headers=headers)
+
+@router.get("/download_comparison/{initiative_id}")
 async def download_comparison(initiative_id: int):
     """Download vendor comparison result."""
     result_path = VENDOR_FOLDER / f"initiative_{initiative_id}" / "comparison_result.txt"
@@ -697,7 +1044,7 @@ async def download_comparison(initiative_id: int):
         return HTMLResponse("<h3>Comparison result not found.</h3>", status_code=404)
     return FileResponse(str(result_path), filename=f"initiative_{initiative_id}_comparison.txt")
 
-@app.get("/download_comparison_docx/{initiative_id}")
+@router.get("/download_comparison_docx/{initiative_id}")
 async def download_comparison_docx(initiative_id: int):
     """Download vendor comparison result as .docx."""
     result_path = VENDOR_FOLDER / f"initiative_{initiative_id}" / "comparison_result.docx"
@@ -705,7 +1052,7 @@ async def download_comparison_docx(initiative_id: int):
         return HTMLResponse("<h3>Word comparison result not found.</h3>", status_code=404)
     return FileResponse(str(result_path), filename=f"initiative_{initiative_id}_comparison.docx")
 
-@app.get("/download_comparison_xlsx/{initiative_id}")
+@router.get("/download_comparison_xlsx/{initiative_id}")
 async def download_comparison_xlsx(initiative_id: int):
     """Download vendor comparison result as .xlsx."""
     result_path = VENDOR_FOLDER / f"initiative_{initiative_id}" / "comparison_result.xlsx"
@@ -713,84 +1060,106 @@ async def download_comparison_xlsx(initiative_id: int):
         return HTMLResponse("<h3>Excel comparison result not found.</h3>", status_code=404)
     return FileResponse(str(result_path), filename=f"initiative_{initiative_id}_comparison.xlsx")
 
-@app.get("/compare_vendors/{initiative_id}", response_class=HTMLResponse)
-async def compare_vendors_page(initiative_id: int):
-    """Compare vendor responses using Ollama AI."""
-    combined_path = VENDOR_FOLDER / f"initiative_{initiative_id}" / "combined_vendor_responses.json"
-    if not combined_path.exists():
+def model_generators(model, samples: int = 1):
+    """A streaming generate function for the comparison, or one per temperature for an ensemble."""
+    if samples <= 1:
+        return lambda prompt: (chunk.text for chunk in model.generate_content(prompt, stream=True))
+    return [
+        lambda prompt, t=t: (chunk.text for chunk in model.generate_content(
+            prompt, stream=True, generation_config={"temperature": t}))
+        for t in comparison.ensemble_temperatures(samples)
+    ]
+
+def stability_text(stability: dict) -> str:
+    if not stability["unstable"]:
+        return f"Ranking is stable across {stability['samples']} samples."
+    pairs = "; ".join(f"{a} / {b}" for a, b in stability["contested"])
+    return f"Ranking is unstable across {stability['samples']} samples: these neighbours swap places in some samples: {pairs}."
+
+def compare_and_export(initiative_id: int, upload_dir: Path, vendors: list, model, samples: int = 1) -> dict:
+    """Runs the comparison and writes the .txt/.docx/.xlsx results; call under the initiative lock."""
+    result = comparison.run_comparison(
+        initiative_id, upload_dir, vendors, load_details_data(initiative_id), model_generators(model, samples),
+    )
+    parsed_data = result["data"]
+    storage.atomic_write_json(upload_dir / "comparison_result.txt", parsed_data)
+    save_comparison_docx(parsed_data, initiative_id)
+    save_comparison_xlsx(parsed_data, initiative_id)
+    return result
+
+@router.get("/compare_vendors/{initiative_id}", response_class=HTMLResponse)
+async def compare_vendors_page(initiative_id: int, samples: int = 1):
+    """Compare vendor responses, re-scoring only vendors that are new or changed.
+
+    ``samples`` > 1 evaluates each vendor that many times at once and ranks the median scores.
+    """
+    samples = max(1, min(samples, comparison.MAX_ENSEMBLE_SAMPLES))
+    upload_dir = VENDOR_FOLDER / f"initiative_{initiative_id}"
+    manifest = await storage.run(vendor_responses.load_manifest, upload_dir)
+    vendors = list(manifest)
+    if not vendors:
         return HTMLResponse("<h3>No vendor responses uploaded yet.</h3>", status_code=404)
 
     try:
-        with open(combined_path) as f:
-            vendor_data = json.load(f)
-
-        # Construct prompt for AI comparison (string)
-        prompt = f"""
-You are an expert RFP evaluation specialist. Your task is to analyze and compare the following vendor responses for initiative {initiative_id}.
-
-**Instructions:**
-1.  Carefully review each vendor's response text provided in the JSON below.
-2.  For each vendor, provide a concise summary, list their key strengths and weaknesses, and identify any potential risks.
-3.  Score each vendor on a scale of 0 to 10 for the following criteria:
-    - Technical Capability
-    - Quality & Compliance
-    - Project Management
-    - Supply Reliability
-    - Cost Competitiveness
-4.  Calculate a percentage for each score (score / 10 * 100).
-5.  Provide an overall recommendation, including a summary of why you are recommending the top vendors.
-6.  Format your entire output as a single, valid JSON object. Do not include any text or formatting outside of the JSON block.
-
-Vendor Responses:
-{json.dumps(vendor_data, indent=2)}
-
-**JSON Output Structure:**
-```json
-{{
-  "vendors": [
-    {{
-      "vendor_name": "Vendor A Name",
-      "summary": "A brief summary of Vendor A's proposal.",
-      "scores": {{
-        "Technical Capability": {{"score": 8, "percentage": 80}},
-        "Quality & Compliance": {{"score": 9, "percentage": 90}},
-        "Project Management": {{"score": 7, "percentage": 70}},
-        "Supply Reliability": {{"score": 8, "percentage": 80}},
-        "Cost Competitiveness": {{"score": 6, "percentage": 60}}
-      }},
-      "strengths": "List of strengths for Vendor A.",
-      "weaknesses": "List of weaknesses for Vendor A.",
-      "risks": "Identified risks for Vendor A."
-    }}
-  ],
-  "recommendation": {{
-    "summary": "Overall summary of the evaluation and justification for the recommendation.",
-    "top_vendors": ["Vendor A Name", "Vendor B Name"]
-  }}
-}}
-```
-        """
-        if not gemini_model:
+        model = get_gemini_model()
+        if not model:
             return HTMLResponse("<h3>Gemini API is not configured. Please set the GOOGLE_API_KEY environment variable.</h3>", status_code=500)
-        response = gemini_model.generate_content(prompt)
-        result_text_raw = response.text
-
-        # Save raw text and structured data
-        (VENDOR_FOLDER / f"initiative_{initiative_id}" / "comparison_result.txt").write_text(result_text_raw)
-        parsed_data = json.loads(result_text_raw)
-        save_comparison_docx(parsed_data, initiative_id)
-        save_comparison_xlsx(parsed_data, initiative_id)
+        # One comparison per initiative at a time; an upload waits until its results are written
+        result = await storage.locked_run(
+            storage.initiative_lock_name(initiative_id), compare_and_export, initiative_id, upload_dir, vendors, model, samples,
+        )
+        parsed_data = result["data"]
+        await storage.run(record_vendor_participation, parsed_data, initiative_id)
+        await storage.run(event_log.append, "comparison_run", initiative_id, rescored=result["rescored"],
+                          reused=result["reused"], top_vendors=parsed_data["recommendation"]["top_vendors"],
+                          samples=samples, unstable=parsed_data.get("stability", {}).get("unstable"))
 
     except Exception as e:
         error_message = f"<h3>Error calling Gemini API:</h3><pre>{html_lib.escape(str(e))}</pre>"
         return HTMLResponse(error_message, status_code=500)
 
     result_text_safe = html_lib.escape(json.dumps(parsed_data, indent=2))
+    if result["rescored"] and samples > 1:
+        status = (f"Evaluated {len(result['rescored'])} vendor(s) {samples} times each, concurrently, and ranked the median scores; "
+                  f"reused {len(result['reused'])} cached evaluation(s) with at least {samples} samples.")
+    elif result["rescored"]:
+        status = (f"Evaluated {len(result['rescored'])} new or changed vendor(s) using {result['prompt_chars']:,} characters "
+                  f"of criterion-relevant passages out of {result['full_chars']:,}; reused {len(result['reused'])} cached evaluation(s).")
+    else:
+        status = f"No vendor responses changed; reused all {len(result['reused'])} cached evaluations and re-ranked them."
+
+    stability = parsed_data.get("stability")
+    if stability:
+        icon = "⚠️ " if stability["unstable"] else ""
+        stability_html = f"<p class='notice'>{icon}{html_lib.escape(stability_text(stability))}</p>"
+    else:
+        stability_html = (f"<p><a href='/compare_vendors/{initiative_id}?samples={comparison.ENSEMBLE_SAMPLES}'>"
+                          f"Check stability: evaluate {comparison.ENSEMBLE_SAMPLES} samples at once</a></p>")
+
+    truncated = [f"{name} ({pages_read(record)})" for name, record in manifest.items() if record.get("truncated")]
+    extraction_html = ""
+    if truncated:
+        extraction_html = (f"<p class='notice'>Only the first {extraction.EXTRACTION_CHAR_BUDGET:,} characters of long responses "
+                           f"were extracted and compared: {html_lib.escape('; '.join(truncated))}. "
+                           "The remaining pages are read on demand.</p>")
+
+    similarity_report = parsed_data["similarity"]
+    similarity_html = ""
+    for pair in similarity_report["near_duplicates"]:
+        similarity_html += (f"<p class='notice'>⚠️ <b>{html_lib.escape(pair['a'])}</b> and <b>{html_lib.escape(pair['b'])}</b> "
+                            f"look like the same submission ({pair['jaccard']:.0%} similar).</p>")
+    if similarity_report["boilerplate_passages"]:
+        similarity_html += (f"<p class='notice'>{similarity_report['boilerplate_passages']} passage(s) shared across vendors "
+                            "were treated as boilerplate and left out of the evidence sent to the model.</p>")
 
     html_content = f"""
     <div class="container">
         <h1>🏁 Vendor Comparison Results</h1>
         <div class="rfp-output">{result_text_safe}</div>
+        <p class="notice">{html_lib.escape(status)}</p>
+        {stability_html}
+        {extraction_html}
+        {similarity_html}
         <a class="download" href="/download_comparison_docx/{initiative_id}">⬇️ Download as Word (.docx)</a>
         <a class="download" href="/download_comparison_xlsx/{initiative_id}">⬇️ Download as Excel (.xlsx)</a>
         <a class="download" href="/download_comparison/{initiative_id}">⬇️ Download Results (.txt)</a>
@@ -799,5 +1168,42 @@ Vendor Responses:
     """
     return get_base_layout(f"Comparison for Initiative #{initiative_id}", html_content)
 
+# --- App factory ---
+def create_app(prewarm_dependencies: bool = None) -> FastAPI:
+    """Builds the application (``uvicorn main:create_app --factory``).
+
+    With ``prewarm_dependencies`` (default: ``PREWARM=1``) the heavy libraries
+    are loaded in a background thread once the server has started, so the
+    first RFP, upload or comparison does not pay for the imports.
+    """
+    if prewarm_dependencies is None:
+        prewarm_dependencies = os.environ.get("PREWARM") == "1"
+    if not GOOGLE_API_KEY and not USE_FAKE_LLM:
+        print("WARNING: GOOGLE_API_KEY environment variable not set. AI features will not work.")
+
+    def in_background(name: str, fn):
+        future = asyncio.get_running_loop().run_in_executor(None, fn)
+        future.add_done_callback(
+            lambda f: f.cancelled() or f.exception() is None or print(f"WARNING: {name} failed: {f.exception()!r}"))
+
+    @asynccontextmanager
+    async def lifespan(application: FastAPI):
+        if prewarm_dependencies:
+            in_background("prewarm", prewarm)
+        # Index submissions, RFPs and responses that predate the search index
+        in_background("search index backfill", search_index.ensure_index)
+        yield
+        event_log.flush()
+        extraction.shutdown()
+
+    application = FastAPI(lifespan=lifespan)
+    application.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, exclude_content_types=GZIP_EXCLUDED_CONTENT_TYPES)
+    application.add_middleware(WeakETagWhenCompressed)  # added last, so it sees the gzip middleware's output
+    application.include_router(router)
+    application.include_router(api.router)
+    return application
+
+app = create_app()
+
 #
 # ---- end of app.py ----
@@ -0,0 +1,184 @@
+"""
+Criterion-aware retrieval over vendor response chunks.
+
+At upload time each vendor response is split into page-aligned chunks and a
+BM25 index (term frequencies, document frequencies, chunk lengths) is stored
+next to the uploads as ``vendor_chunks.json``. When comparing, every
+evaluation criterion is expanded into a query and only the top-k passages per
+vendor go into the prompt, each carrying a citation back to its source file
+and page.
+"""
+import json
+import math
+import re
+from pathlib import Path
+
+import storage
+import vendor_responses
+
+CHUNK_FILE = "vendor_chunks.json"
+CHUNK_CHARS = 900
+TOP_K = 3
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Criterion name -> query terms used to rank passages for it
+CRITERIA_QUERIES = {
+    "Technical Capability": "technical capability technology platform process scale tech transfer equipment "
+                            "capacity expertise development analytical yield optimization bioreactor",
+    "Quality & Compliance": "quality compliance gmp cgmp regulatory inspection inspected fda ema audit qa qc "
+                            "validation deviation capa certification licensed",
+    "Project Management": "project management plan timeline milestone schedule program manager governance "
+                          "communication kickoff team dedicated",
+    "Supply Reliability": "supply reliability continuity capacity dual site redundancy raw materials inventory "
+                          "lead time backup safety stock commercial supply",
+    "Cost Competitiveness": "cost price pricing budget fee discount payment commercial quote usd eur per batch "
+                            "rate total",
+}
+
+STOPWORDS = set("""
+a an and are as at be by for from has have in is it its of on or our that the their this to we will with
+within which all any can per via us your you also into over under been more most other such than then these
+""".split())
+
+
+def tokenize(text: str) -> list:
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+# --- Chunking ---
+def chunk_pages(pages: list, max_chars: int = CHUNK_CHARS) -> list:
+    """Splits [(page, text), ...] into chunks that never cross a page boundary."""
+    chunks = []
+    for page, text in pages:
+        current = ""
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if current and len(current) + len(line) + 1 > max_chars:
+                chunks.append({"page": page, "text": current})
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        if current:
+            chunks.append({"page": page, "text": current})
+    return chunks
+
+
+def _finalize(chunks: list) -> dict:
+    """Renumbers chunks and computes document frequencies and average length."""
+    df = {}
+    for i, chunk in enumerate(chunks):
+        chunk["id"] = i
+        for token in chunk["tf"]:
+            df[token] = df.get(token, 0) + 1
+    avg_len = sum(c["length"] for c in chunks) / len(chunks) if chunks else 0.0
+    return {"chunks": chunks, "df": df, "avg_len": avg_len}
+
+
+def _vendor_chunks(vendor: str, pages: list) -> list:
+    chunks = []
+    for chunk in chunk_pages(pages):
+        tf = {}
+        for token in tokenize(chunk["text"]):
+            tf[token] = tf.get(token, 0) + 1
+        chunks.append({"vendor": vendor, "page": chunk["page"], "text": chunk["text"],
+                       "length": sum(tf.values()), "tf": tf})
+    return chunks
+
+
+def build_chunk_index(page_texts: dict) -> dict:
+    """Chunks every vendor's pages and precomputes the BM25 statistics."""
+    chunks = []
+    for vendor, pages in page_texts.items():
+        chunks += _vendor_chunks(vendor, pages)
+    return _finalize(chunks)
+
+
+def save_chunk_index(upload_dir: Path, page_texts: dict, keep_vendors: list = ()) -> dict:
+    """Indexes ``page_texts`` and keeps the stored chunks of ``keep_vendors`` (append uploads)."""
+    chunks = []
+    path = upload_dir / CHUNK_FILE
+    if keep_vendors and path.exists():
+        with open(path, "r") as f:
+            stored = json.load(f)["chunks"]
+        chunks = [c for c in stored if c["vendor"] in keep_vendors and c["vendor"] not in page_texts]
+    for vendor, pages in page_texts.items():
+        chunks += _vendor_chunks(vendor, pages)
+    index = _finalize(chunks)
+    storage.atomic_write_text(path, json.dumps(index))
+    return index
+
+
+def load_chunk_index(upload_dir: Path, vendors: list) -> dict:
+    """Loads the upload-time index, or builds one from the stored texts for older uploads."""
+    path = upload_dir / CHUNK_FILE
+    if path.exists():
+        with open(path, "r") as f:
+            index = json.load(f)
+        if set(c["vendor"] for c in index["chunks"]) >= set(vendors):
+            return index
+    vendor_texts = vendor_responses.load_texts(upload_dir, vendors)
+    return build_chunk_index({vendor: [(None, text)] for vendor, text in vendor_texts.items()})
+
+
+# --- Ranking ---
+def _postings(index: dict) -> dict:
+    """term -> [(chunk_id, tf, chunk_length)], built once per loaded index."""
+    if "_postings" not in index:
+        postings = {}
+        for chunk in index["chunks"]:
+            for term, freq in chunk["tf"].items():
+                postings.setdefault(term, []).append((chunk["id"], freq, chunk["length"]))
+        index["_postings"] = postings
+    return index["_postings"]
+
+
+def bm25_scores(index: dict, query: str) -> dict:
+    """Scores only the chunks that contain a query term; returns {chunk_id: score}."""
+    postings, df = _postings(index), index["df"]
+    n, avg_len = len(index["chunks"]), index["avg_len"] or 1.0
+    scores = {}
+    for term in set(tokenize(query)):
+        if term not in df:
+            continue
+        idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+        for chunk_id, freq, length in postings[term]:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len)
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * freq * (BM25_K1 + 1) / (freq + norm)
+    return scores
+
+
+def citation(chunk: dict) -> str:
+    return f"{chunk['vendor']}, p. {chunk['page']}" if chunk.get("page") else chunk["vendor"]
+
+
+def select_evidence(index: dict, vendors: list, k: int = TOP_K, skip: set = frozenset()) -> dict:
+    """Top-k passages per vendor for every criterion.
+
+    Chunk ids in ``skip`` (shared boilerplate) are only used when a vendor has
+    no other matching passages for a criterion.
+
+    Returns {vendor: {"passages": {ref: {"source", "text"}}, "criteria": {criterion: [ref, ...]}}}
+    so a passage relevant to several criteria is only sent once.
+    """
+    by_id = {c["id"]: c for c in index["chunks"]}
+    evidence = {vendor: {"passages": {}, "criteria": {}} for vendor in vendors}
+    for criterion, query in CRITERIA_QUERIES.items():
+        ranked = sorted(bm25_scores(index, f"{criterion} {query}").items(), key=lambda kv: (kv[0] in skip, -kv[1]))
+        taken = {vendor: 0 for vendor in vendors}
+        for chunk_id, _ in ranked:
+            chunk = by_id[chunk_id]
+            vendor = chunk["vendor"]
+            if vendor not in taken or taken[vendor] >= k or (chunk_id in skip and taken[vendor]):
+                continue
+            taken[vendor] += 1
+            ref = f"P{chunk_id}"
+            evidence[vendor]["passages"][ref] = {"source": citation(chunk), "text": chunk["text"]}
+            evidence[vendor]["criteria"].setdefault(criterion, []).append(ref)
+    return evidence
+
+
+def evidence_size(evidence: dict) -> int:
+    """Characters of passage text that will be sent to the model."""
+    return sum(len(p["text"]) for v in evidence.values() for p in v["passages"].values())
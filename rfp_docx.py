@@ -0,0 +1,194 @@
+"""
+Markdown RFP text to Word, in one pass.
+
+RFP drafts (templates and model output) are lightweight markdown: ``#``
+headings, ``-``/``*`` and ``1.`` lists (indented for nesting), pipe tables,
+``>`` quotes and ``**bold**``/``*italic*``/```code``` inline. ``markdown_to_docx``
+walks the lines once, buffering only the rows of the table being read. Each
+numbered list starts again at 1.
+``save_rfp_doc`` stores a SHA-256 of the text next to the document and skips
+the rebuild when the text has not changed.
+"""
+import hashlib
+import re
+from pathlib import Path
+
+import storage
+
+RFP_FOLDER = Path("data/rfps")
+CONVERTER_VERSION = "2"  # bump to rebuild every stored document after changing the converter
+HASH_SUFFIX = ".sha256"
+
+HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*$")
+BULLET = re.compile(r"^(\s*)[-*+]\s+(.*)$")
+NUMBERED = re.compile(r"^(\s*)\d+[.)]\s+(.*)$")
+TABLE_SEPARATOR = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$")
+RULE = re.compile(r"^(\*\s*){3,}$|^(-\s*){3,}$|^(_\s*){3,}$")
+INLINE = re.compile(r"(\*\*\*.+?\*\*\*|\*\*.+?\*\*|__.+?__|\*(?!\s).+?(?<!\s)\*|`[^`]+`)")
+MAX_LIST_LEVEL = 3  # the default template has "List Bullet", "List Bullet 2" and "List Bullet 3"
+
+
+def _add_runs(paragraph, text: str):
+    """Adds ``text`` to ``paragraph``, turning inline emphasis markers into formatted runs."""
+    for part in INLINE.split(text):
+        if not part:
+            continue
+        if part.startswith("***") and part.endswith("***") and len(part) > 6:
+            run = paragraph.add_run(part[3:-3])
+            run.bold = run.italic = True
+        elif (part.startswith("**") and part.endswith("**") or part.startswith("__") and part.endswith("__")) and len(part) > 4:
+            paragraph.add_run(part[2:-2]).bold = True
+        elif part.startswith("*") and part.endswith("*") and len(part) > 2:
+            paragraph.add_run(part[1:-1]).italic = True
+        elif part.startswith("`") and part.endswith("`") and len(part) > 2:
+            paragraph.add_run(part[1:-1]).font.name = "Courier New"
+        else:
+            paragraph.add_run(part)
+
+
+def _table_cells(line: str) -> list:
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def _flush_table(writer, rows: list):
+    if not rows:
+        return
+    width = max(len(row) for row in rows)
+    table = writer.table(len(rows), width, "Table Grid")
+    for r, row in enumerate(rows):
+        for c in range(width):
+            paragraph = table.cell(r, c).paragraphs[0]
+            _add_runs(paragraph, row[c] if c < len(row) else "")
+            if r == 0:
+                for run in paragraph.runs:
+                    run.bold = True
+    rows.clear()
+
+
+class _Writer:
+    """Appends paragraphs and tables with each style id resolved once per document.
+
+    Passing a style (name or object) to python-docx scans the whole stylesheet
+    on every paragraph, so styles and list numbering are set on the XML
+    elements python-docx exposes (``paragraph_format.element``, ``doc.element``)
+    instead. Every numbered list gets its own Word numbering instance, so it
+    restarts at 1 rather than continuing the previous list.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.styles = {}  # style name -> style object
+        self.style_ids = {}  # style name -> style id
+        self.list_numbers = {}  # list level -> numId of the numbered list being written
+
+    def paragraph(self, style: str = None):
+        """A paragraph outside any list (it ends the lists before it)."""
+        self.end_list()
+        return self._add(style)
+
+    def table(self, rows: int, cols: int, style: str):
+        self.end_list()
+        table = self.doc.add_table(rows, cols)
+        # The new table is the body's last block, just before the section properties
+        self.doc.element.body.sectPr.getprevious().tblPr.style = self._style_id(style)
+        return table
+
+    def bullet(self, level: int):
+        # A bullet ends any numbered list at its own level or deeper
+        self.end_list(level)
+        return self._add("List Bullet" + (f" {level + 1}" if level else ""))
+
+    def numbered(self, level: int):
+        self.end_list(level + 1)
+        style = "List Number" + (f" {level + 1}" if level else "")
+        paragraph = self._add(style)
+        if level not in self.list_numbers:
+            self.list_numbers[level] = self._new_numbering(style)
+        num_pr = paragraph.paragraph_format.element.get_or_add_pPr().get_or_add_numPr()
+        num_pr.get_or_add_numId().val = self.list_numbers[level]
+        return paragraph
+
+    def end_list(self, level: int = 0):
+        """Numbered lists at ``level`` and deeper start again at 1 from the next item on."""
+        for open_level in [k for k in self.list_numbers if k >= level]:
+            del self.list_numbers[open_level]
+
+    def _add(self, style: str = None):
+        paragraph = self.doc.add_paragraph()
+        if style:
+            paragraph.paragraph_format.element.get_or_add_pPr().style = self._style_id(style)
+        return paragraph
+
+    def _new_numbering(self, style: str) -> int:
+        """numId of a new numbering instance of ``style``'s list definition, starting at 1."""
+        numbering = self.doc.part.numbering_part.element
+        style_num_id = self._style(style).element.pPr.numPr.numId.val
+        num = numbering.add_num(numbering.num_having_numId(style_num_id).abstractNumId.val)
+        num.add_lvlOverride(ilvl=0).add_startOverride(1)
+        return num.numId
+
+    def _style(self, style: str):
+        if style not in self.styles:
+            self.styles[style] = self.doc.styles[style]
+        return self.styles[style]
+
+    def _style_id(self, style: str) -> str:
+        if style not in self.style_ids:
+            self.style_ids[style] = self._style(style).style_id
+        return self.style_ids[style]
+
+
+def _list_level(indent: str) -> int:
+    return min(len(indent.replace("\t", "    ")) // 2, MAX_LIST_LEVEL - 1)
+
+
+def markdown_to_docx(text: str):
+    """Builds a python-docx ``Document`` from markdown ``text``."""
+    from docx import Document
+
+    doc = Document()
+    writer = _Writer(doc)
+    table_rows = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("|") or (table_rows and "|" in stripped):
+            if not TABLE_SEPARATOR.match(stripped):
+                table_rows.append(_table_cells(stripped))
+            continue
+        _flush_table(writer, table_rows)
+
+        if not stripped:
+            continue  # blank lines only separate blocks
+        if heading := HEADING.match(stripped):
+            _add_runs(writer.paragraph(f"Heading {len(heading.group(1))}"), heading.group(2))
+        elif RULE.match(stripped):
+            writer.paragraph()
+        elif bullet := BULLET.match(line):
+            _add_runs(writer.bullet(_list_level(bullet.group(1))), bullet.group(2))
+        elif numbered := NUMBERED.match(line):
+            _add_runs(writer.numbered(_list_level(numbered.group(1))), numbered.group(2))
+        elif stripped.startswith(">"):
+            _add_runs(writer.paragraph("Quote"), stripped.lstrip("> "))
+        else:
+            _add_runs(writer.paragraph(), stripped)
+    _flush_table(writer, table_rows)
+    return doc
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(f"{CONVERTER_VERSION}\n{text}".encode("utf-8")).hexdigest()
+
+
+def save_rfp_doc(text: str, initiative_id: int, folder: Path = RFP_FOLDER) -> str:
+    """Writes the initiative's RFP .docx unless the stored one was built from the same text."""
+    output_file = folder / f"initiative_{initiative_id}_rfp.docx"
+    hash_file = output_file.with_name(output_file.name + HASH_SUFFIX)
+    digest = text_hash(text)
+    with storage.initiative_lock(initiative_id):
+        if output_file.exists() and hash_file.exists() and hash_file.read_text().strip() == digest:
+            return str(output_file)
+        # Drop the old hash first: a crash mid-write then means a rebuild, never a stale match
+        hash_file.unlink(missing_ok=True)
+        storage.atomic_save_document(output_file, markdown_to_docx(text))
+        storage.atomic_write_text(hash_file, digest)
+    return str(output_file)
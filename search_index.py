@@ -0,0 +1,378 @@
+"""
+Full-text search over initiatives, generated RFPs and vendor responses.
+
+Backed by a single SQLite database using FTS5. Documents are keyed by
+``doc_key`` (``initiative:12``, ``rfp:12``, ``vendor:12:CDMO Response 1.pdf``)
+and are re-indexed whenever the web routes write the underlying file, so the
+index stays current without scanning the archive. ``rebuild_index`` walks the
+``data/`` folders and only re-reads files whose mtime/size changed; the
+application runs it once in the background at startup (``ensure_index``) until
+the ``meta`` table records that the archive has been indexed.
+
+Usage:
+    python search_index.py rebuild
+    python search_index.py query "EU GMP fill-finish" --gmp-standard "EU GMP"
+"""
+import argparse
+import json
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import storage
+import vendor_responses
+
+INDEX_FILE = Path("data/search/search_index.sqlite3")
+SUBMISSION_FOLDER = Path("data/submissions")
+RFP_FOLDER = Path("data/rfps")
+VENDOR_FOLDER = Path("data/vendor_responses")
+
+FILTER_FIELDS = ("request_type", "gmp_standard", "target_markets")
+SNIPPET_START, SNIPPET_END = "\x02", "\x03"
+ARCHIVE_INDEXED = "archive_indexed"  # meta key set once rebuild_index has walked the whole archive
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    doc_key TEXT UNIQUE NOT NULL,
+    kind TEXT NOT NULL,
+    initiative_id INTEGER NOT NULL,
+    title TEXT,
+    source TEXT,
+    request_type TEXT,
+    gmp_standard TEXT,
+    target_markets TEXT,
+    fingerprint TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_initiative ON documents(initiative_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(title, body, tokenize='porter unicode61');
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+_initialized = set()
+
+
+@contextmanager
+def _connect(write: bool = False):
+    """Yields a connection; the schema is created once per process.
+
+    With ``write`` the block runs in one ``BEGIN IMMEDIATE`` transaction, so
+    writers in other threads and workers queue up instead of interleaving.
+    """
+    INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(INDEX_FILE, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        if INDEX_FILE.resolve() not in _initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            _initialized.add(INDEX_FILE.resolve())
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if not write:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def _fingerprint(sources: list) -> str:
+    parts = []
+    for path in sources:
+        path = Path(path)
+        if path.exists():
+            stat = path.stat()
+            parts.append(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size}")
+    return "|".join(parts)
+
+
+def _as_text(value) -> str:
+    if isinstance(value, list):
+        return ", ".join(map(str, value))
+    return "" if value is None else str(value)
+
+
+def _filter_values(initiative_data: dict) -> dict:
+    values = {}
+    for field in FILTER_FIELDS:
+        value = initiative_data.get(field)
+        values[field] = "|".join(map(str, value)) if isinstance(value, list) else _as_text(value)
+    return values
+
+
+def _upsert(conn, doc_key: str, kind: str, initiative_id: int, title: str, body: str,
+            filters: dict, source: str = "", fingerprint: str = ""):
+    """Inserts or replaces one document; call inside a ``_connect(write=True)`` block."""
+    now = datetime.now().isoformat(timespec="seconds")
+    doc_id = conn.execute(
+        "INSERT INTO documents (doc_key, kind, initiative_id, title, source, request_type, gmp_standard, "
+        "target_markets, fingerprint, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(doc_key) DO UPDATE SET kind=excluded.kind, initiative_id=excluded.initiative_id, "
+        "title=excluded.title, source=excluded.source, request_type=excluded.request_type, "
+        "gmp_standard=excluded.gmp_standard, target_markets=excluded.target_markets, "
+        "fingerprint=excluded.fingerprint, updated_at=excluded.updated_at RETURNING id",
+        (doc_key, kind, initiative_id, title, source, filters.get("request_type"),
+         filters.get("gmp_standard"), filters.get("target_markets"), fingerprint, now),
+    ).fetchone()["id"]
+    conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (doc_id,))
+    conn.execute("INSERT INTO documents_fts (rowid, title, body) VALUES (?, ?, ?)", (doc_id, title, body))
+
+
+def _delete_where(conn, where: str, params: tuple):
+    ids = [r["id"] for r in conn.execute(f"SELECT id FROM documents WHERE {where}", params)]
+    for doc_id in ids:
+        conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (doc_id,))
+    conn.execute(f"DELETE FROM documents WHERE {where}", params)
+
+
+def _read_json(path: Path) -> dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _initiative_filters(conn, initiative_id: int) -> dict:
+    row = conn.execute(
+        "SELECT request_type, gmp_standard, target_markets FROM documents WHERE doc_key = ?",
+        (f"initiative:{initiative_id}",),
+    ).fetchone()
+    return dict(row) if row else {}
+
+
+# --- Indexing (called by the web routes after each write) ---
+def index_initiative(initiative_id: int, initiative_data: dict, sources: list = ()):
+    """Indexes the merged base + details record and propagates its filter fields."""
+    title = " - ".join(filter(None, [_as_text(initiative_data.get("project_name")),
+                                     _as_text(initiative_data.get("company_name"))])) or f"Initiative {initiative_id}"
+    body = "\n".join(f"{key.replace('_', ' ')}: {_as_text(value)}" for key, value in initiative_data.items())
+    filters = _filter_values(initiative_data)
+    with _connect(write=True) as conn:
+        _upsert(conn, f"initiative:{initiative_id}", "initiative", initiative_id, title, body, filters,
+                source=str(SUBMISSION_FOLDER / f"initiative_{initiative_id}.json"), fingerprint=_fingerprint(sources))
+        conn.execute(
+            "UPDATE documents SET request_type=?, gmp_standard=?, target_markets=? WHERE initiative_id=?",
+            (filters["request_type"], filters["gmp_standard"], filters["target_markets"], initiative_id),
+        )
+
+
+def _initiative_sources(initiative_id: int) -> list:
+    base_file = SUBMISSION_FOLDER / f"initiative_{initiative_id}.json"
+    return [base_file] + sorted(SUBMISSION_FOLDER.glob(f"initiative_{initiative_id}_*.json"))
+
+
+def reindex_initiative(initiative_id: int):
+    """Re-reads the base and detail files of an initiative and indexes the merged record."""
+    sources = _initiative_sources(initiative_id)
+    if not sources[0].exists():
+        return
+    data = {}
+    for path in sources:
+        data.update(_read_json(path))
+    index_initiative(initiative_id, data, sources)
+
+
+def index_rfp(initiative_id: int, rfp_text: str, source: Path = None):
+    with _connect(write=True) as conn:
+        _upsert(conn, f"rfp:{initiative_id}", "rfp", initiative_id, f"RFP for Initiative #{initiative_id}",
+                rfp_text, _initiative_filters(conn, initiative_id), source=str(source or ""),
+                fingerprint=_fingerprint([source] if source else []))
+
+
+def index_vendor_responses(initiative_id: int, texts: dict, sources: dict = None, keep: list = None):
+    """Indexes ``texts`` ({filename: text}) and drops vendors of the initiative not in ``keep``.
+
+    ``sources`` maps filename -> its stored text file; ``keep`` defaults to the
+    filenames in ``texts``, so vendors that did not change are not re-read.
+    """
+    sources = sources or {}
+    keep = set(texts) | set(keep if keep is not None else texts)
+    with _connect(write=True) as conn:
+        filters = _initiative_filters(conn, initiative_id)
+        stale = [r["doc_key"] for r in conn.execute(
+            "SELECT doc_key FROM documents WHERE kind = 'vendor' AND initiative_id = ?", (initiative_id,))
+            if r["doc_key"].split(":", 2)[2] not in keep]
+        for doc_key in stale:
+            _delete_where(conn, "doc_key = ?", (doc_key,))
+        for filename, text in texts.items():
+            source = sources.get(filename)
+            _upsert(conn, f"vendor:{initiative_id}:{filename}", "vendor", initiative_id, filename, text,
+                    filters, source=str(source or ""), fingerprint=_fingerprint([source] if source else []))
+
+
+# --- Querying ---
+def _match_expression(query: str) -> str:
+    """Turns free text into an FTS5 expression: every term must match, last term as prefix."""
+    terms = re.findall(r"\w+", query.lower())
+    if not terms:
+        return ""
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search(query: str, filters: dict = None, kind: str = None, limit: int = 20) -> dict:
+    """Returns ranked hits with snippets, plus the query time in milliseconds."""
+    start = time.perf_counter()
+    expression = _match_expression(query)
+    if not expression:
+        return {"query": query, "hits": [], "took_ms": 0.0}
+
+    sql = (
+        "SELECT d.doc_key, d.kind, d.initiative_id, d.title, d.request_type, d.gmp_standard, d.target_markets, "
+        f"snippet(documents_fts, 1, '{SNIPPET_START}', '{SNIPPET_END}', '…', 16) AS snippet, "
+        "bm25(documents_fts, 5.0, 1.0) AS rank "
+        "FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid "
+        "WHERE documents_fts MATCH ?"
+    )
+    params = [expression]
+    for field, value in (filters or {}).items():
+        if field not in FILTER_FIELDS or not value:
+            continue
+        if field == "target_markets":
+            sql += " AND d.target_markets LIKE ?"
+            params.append(f"%{value}%")
+        else:
+            sql += f" AND d.{field} = ?"
+            params.append(value)
+    if kind:
+        sql += " AND d.kind = ?"
+        params.append(kind)
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(limit)
+
+    with _connect() as conn:
+        hits = [dict(row) for row in conn.execute(sql, params)]
+    return {"query": query, "hits": hits, "took_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+
+def filter_options() -> dict:
+    """Distinct values for the filter drop-downs on the search page."""
+    options = {}
+    with _connect() as conn:
+        for field in ("request_type", "gmp_standard"):
+            rows = conn.execute(f"SELECT DISTINCT {field} FROM documents WHERE {field} != '' ORDER BY {field}")
+            options[field] = [r[0] for r in rows if r[0]]
+        markets = set()
+        for row in conn.execute("SELECT DISTINCT target_markets FROM documents WHERE target_markets != ''"):
+            markets.update(m for m in (row[0] or "").split("|") if m)
+        options["target_markets"] = sorted(markets)
+    return options
+
+
+# --- Archive rebuild ---
+def _docx_text(path: Path) -> str:
+    from docx import Document
+
+    return "\n".join(p.text for p in Document(str(path)).paragraphs)
+
+
+def archive_indexed() -> bool:
+    """Whether the archive has been indexed; routes index their own writes either way."""
+    with _connect() as conn:
+        return conn.execute("SELECT 1 FROM meta WHERE key = ?", (ARCHIVE_INDEXED,)).fetchone() is not None
+
+
+def ensure_index():
+    """Indexes the archive unless that has been done before (run at startup, off the request path)."""
+    # Every worker starts one; the first does the work, the others find the marker
+    with storage.locked("search_index"):
+        if not archive_indexed():
+            rebuild_index()
+
+
+def rebuild_index() -> dict:
+    """Re-indexes files whose mtime/size changed and drops documents whose files are gone."""
+    stats = {"indexed": 0, "unchanged": 0, "removed": 0}
+    with _connect() as conn:
+        known = {r["doc_key"]: r["fingerprint"] for r in conn.execute("SELECT doc_key, fingerprint FROM documents")}
+    seen = set()
+
+    for base_file in SUBMISSION_FOLDER.glob("initiative_*.json"):
+        suffix = base_file.stem.replace("initiative_", "")
+        if "_" in suffix or not suffix.isdigit():
+            continue
+        initiative_id = int(suffix)
+        key = f"initiative:{initiative_id}"
+        seen.add(key)
+        if known.get(key) == _fingerprint(_initiative_sources(initiative_id)):
+            stats["unchanged"] += 1
+            continue
+        try:
+            reindex_initiative(initiative_id)
+        except (json.JSONDecodeError, OSError):
+            continue
+        stats["indexed"] += 1
+
+    for rfp_file in RFP_FOLDER.glob("initiative_*_rfp.docx"):
+        initiative_id = int(rfp_file.stem.split("_")[1])
+        key = f"rfp:{initiative_id}"
+        seen.add(key)
+        if known.get(key) == _fingerprint([rfp_file]):
+            stats["unchanged"] += 1
+            continue
+        index_rfp(initiative_id, _docx_text(rfp_file), rfp_file)
+        stats["indexed"] += 1
+
+    for upload_dir in VENDOR_FOLDER.glob("initiative_*"):
+        if not upload_dir.is_dir():
+            continue
+        initiative_id = int(upload_dir.name.split("_")[1])
+        manifest = vendor_responses.load_manifest(upload_dir)
+        sources = {name: vendor_responses.text_path(upload_dir, name, manifest) for name in manifest}
+        changed = []
+        for name, source in sources.items():
+            key = f"vendor:{initiative_id}:{name}"
+            seen.add(key)
+            if known.get(key) == _fingerprint([source]):
+                stats["unchanged"] += 1
+            else:
+                changed.append(name)
+        if changed:
+            index_vendor_responses(initiative_id, vendor_responses.load_texts(upload_dir, changed), sources, list(manifest))
+            stats["indexed"] += len(changed)
+
+    stale = [key for key in known if key not in seen]
+    with _connect(write=True) as conn:
+        for key in stale:
+            _delete_where(conn, "doc_key = ?", (key,))
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                     (ARCHIVE_INDEXED, datetime.now().isoformat(timespec="seconds")))
+    stats["removed"] = len(stale)
+    return stats
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Maintain and query the full-text search index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="Incrementally index the data/ archive.")
+    query_cmd = sub.add_parser("query", help="Run a search from the command line.")
+    query_cmd.add_argument("text")
+    query_cmd.add_argument("--kind", choices=["initiative", "rfp", "vendor"])
+    for field in FILTER_FIELDS:
+        query_cmd.add_argument(f"--{field.replace('_', '-')}")
+    query_cmd.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        print(rebuild_index())
+        return
+    filters = {field: getattr(args, field) for field in FILTER_FIELDS}
+    result = search(args.text, filters, kind=args.kind, limit=args.limit)
+    for hit in result["hits"]:
+        snippet = hit["snippet"].replace(SNIPPET_START, "[").replace(SNIPPET_END, "]").replace("\n", " ")
+        print(f"#{hit['initiative_id']:<5} {hit['kind']:<10} {hit['title']}\n        {snippet}")
+    print(f"{len(result['hits'])} hits in {result['took_ms']} ms")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,115 @@
+"""
+Cross-vendor similarity over uploaded responses.
+
+Each vendor's text is reduced to a set of hashed word shingles. Pairwise
+Jaccard similarity flags near-duplicate submissions (the same document under
+two filenames), and chunks whose shingles mostly appear in another vendor's
+response are marked as shared boilerplate so they can be left out of the
+evidence sent to the model. The report is stored as ``similarity.json`` next
+to the uploads and recomputed on every upload.
+"""
+import hashlib
+import json
+import re
+import zlib
+from itertools import combinations
+from pathlib import Path
+
+import storage
+
+SIMILARITY_FILE = "similarity.json"
+SHINGLE_WORDS = 5
+NEAR_DUPLICATE = 0.8  # pairwise Jaccard at or above this flags a near-duplicate
+BOILERPLATE_OVERLAP = 0.8  # share of a chunk's shingles found in another vendor's response
+MIN_BOILERPLATE_SHINGLES = 8  # ignore chunks too short to judge
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> set:
+    """Hashed ``size``-word shingles of ``text`` (case and punctuation ignored)."""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def text_key(text: str) -> str:
+    """Stable id for a chunk's text, independent of chunk numbering."""
+    return hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()[:16]
+
+
+# --- Analysis ---
+def analyze_index(index: dict) -> dict:
+    """Computes the similarity report from a retrieval chunk index."""
+    chunk_shingles = {}
+    vendor_shingles = {}
+    for chunk in index["chunks"]:
+        grams = shingles(chunk["text"])
+        chunk_shingles[chunk["id"]] = grams
+        vendor_shingles.setdefault(chunk["vendor"], set()).update(grams)
+
+    pairs = []
+    duplicates = {vendor: set() for vendor in vendor_shingles}
+    for a, b in combinations(sorted(vendor_shingles), 2):
+        score = round(jaccard(vendor_shingles[a], vendor_shingles[b]), 3)
+        pairs.append({"a": a, "b": b, "jaccard": score})
+        if score >= NEAR_DUPLICATE:
+            duplicates[a].add(b)
+            duplicates[b].add(a)
+
+    # Shingle -> vendors using it, to test each chunk against every other response at once
+    owners = {}
+    for vendor, grams in vendor_shingles.items():
+        for gram in grams:
+            owners.setdefault(gram, []).append(vendor)
+
+    boilerplate = {}
+    for chunk in index["chunks"]:
+        grams = chunk_shingles[chunk["id"]]
+        if len(grams) < MIN_BOILERPLATE_SHINGLES:
+            continue
+        # Text shared only with a near-duplicate of this vendor is not boilerplate
+        ignore = duplicates[chunk["vendor"]] | {chunk["vendor"]}
+        shared = sum(1 for gram in grams if any(v not in ignore for v in owners[gram]))
+        if shared / len(grams) >= BOILERPLATE_OVERLAP:
+            boilerplate[text_key(chunk["text"])] = chunk["vendor"]
+
+    return {
+        "pairs": sorted(pairs, key=lambda p: -p["jaccard"]),
+        "near_duplicates": [p for p in pairs if p["jaccard"] >= NEAR_DUPLICATE],
+        "boilerplate": boilerplate,
+    }
+
+
+def save_report(upload_dir: Path, index: dict) -> dict:
+    report = analyze_index(index)
+    storage.atomic_write_json(upload_dir / SIMILARITY_FILE, report)
+    return report
+
+
+def load_report(upload_dir: Path, index: dict) -> dict:
+    """Stored report, or one computed on the fly for uploads that predate it."""
+    path = upload_dir / SIMILARITY_FILE
+    if path.exists():
+        with open(path, "r") as f:
+            return json.load(f)
+    return analyze_index(index)
+
+
+def boilerplate_chunk_ids(index: dict, report: dict) -> set:
+    keys = report.get("boilerplate", {})
+    return {chunk["id"] for chunk in index["chunks"] if text_key(chunk["text"]) in keys}
+
+
+def summary(report: dict) -> dict:
+    """The part of the report included in the comparison output."""
+    return {
+        "pairs": report["pairs"],
+        "near_duplicates": report["near_duplicates"],
+        "boilerplate_passages": len(report["boilerplate"]),
+    }
@@ -0,0 +1,107 @@
+"""
+Opt-in speculative precomputation (``SPECULATIVE_PRECOMPUTE=1``).
+
+Once an initiative's details are saved, the user almost always asks for the
+RFP or the vendor shortlist next. ``schedule`` starts those jobs in the
+background and stores each result under ``data/speculative`` together with a
+fingerprint of the inputs it was computed from. ``get`` hands back a result
+only while that fingerprint still matches - waiting for a job that is still
+running - and ``discard`` cancels pending jobs and drops stored results when
+the initiative is edited. Finished jobs are forgotten once their result is
+stored; file access runs in the thread pool.
+"""
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import storage
+
+ENABLED = os.environ.get("SPECULATIVE_PRECOMPUTE") == "1"
+SPECULATION_FOLDER = Path("data/speculative")
+
+_tasks = {}  # (initiative_id, kind) -> (fingerprint, asyncio.Task), while the job runs
+
+
+def fingerprint(initiative_data: dict, *versions) -> str:
+    """Hash of the initiative data plus anything else the result depends on."""
+    payload = json.dumps([initiative_data, versions], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_version(path: Path) -> str:
+    """Version marker for an input file (modification time and size, or absent)."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return "missing"
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _result_path(initiative_id: int, kind: str) -> Path:
+    return SPECULATION_FOLDER / f"initiative_{initiative_id}_{kind}.json"
+
+
+def _store(initiative_id: int, kind: str, key: str, result):
+    storage.atomic_write_json(_result_path(initiative_id, kind), {
+        "fingerprint": key, "created_at": datetime.now().isoformat(timespec="seconds"), "result": result,
+    })
+
+
+async def _run(initiative_id: int, kind: str, key: str, job, *args):
+    result = await asyncio.to_thread(job, *args)
+    current = _tasks.get((initiative_id, kind))
+    # A newer edit may have superseded this job while it ran in its thread
+    if current and current[0] == key:
+        await storage.run(_store, initiative_id, kind, key, result)
+    return result
+
+
+def _finished(task_key: tuple, task: asyncio.Task):
+    # Failures are not worth surfacing: the route simply computes the result itself
+    task.cancelled() or task.exception()
+    current = _tasks.get(task_key)
+    # From here on get() reads the stored result
+    if current and current[1] is task:
+        del _tasks[task_key]
+
+
+async def schedule(initiative_id: int, jobs: dict):
+    """Starts background jobs; ``jobs`` maps kind -> (fingerprint, callable, *args)."""
+    if not ENABLED:
+        return
+    await discard(initiative_id)
+    for kind, (key, job, *args) in jobs.items():
+        task = asyncio.create_task(_run(initiative_id, kind, key, job, *args))
+        task.add_done_callback(lambda t, task_key=(initiative_id, kind): _finished(task_key, t))
+        _tasks[(initiative_id, kind)] = (key, task)
+
+
+def _remove_results(initiative_id: int):
+    for path in SPECULATION_FOLDER.glob(f"initiative_{initiative_id}_*.json"):
+        path.unlink(missing_ok=True)
+
+
+async def discard(initiative_id: int):
+    """Cancels pending jobs and removes stored results for an edited initiative."""
+    for task_key in [k for k in _tasks if k[0] == initiative_id]:
+        _tasks.pop(task_key)[1].cancel()
+    await storage.run(_remove_results, initiative_id)
+
+
+async def get(initiative_id: int, kind: str, key: str):
+    """The speculative result if it was computed from the same inputs, else None."""
+    if not ENABLED:
+        return None
+    pending = _tasks.get((initiative_id, kind))
+    if pending and pending[0] == key:
+        task = pending[1]
+        # asyncio.wait never cancels the job, even if this request is cancelled
+        await asyncio.wait({task})
+        if task.cancelled() or task.exception():
+            return None
+        return task.result()
+    stored = await storage.read_json_async(_result_path(initiative_id, kind))
+    return stored["result"] if stored and stored.get("fingerprint") == key else None
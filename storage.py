@@ -0,0 +1,170 @@
+"""
+Crash-safe writes and cross-worker locks for on-disk artifacts.
+
+Every file is written to a temporary sibling, flushed and fsynced, then
+renamed over the target, so readers only ever see the old or the new
+content - never a truncated file. ``locked`` serialises read-modify-write
+sequences between threads (an in-process lock) and between uvicorn workers
+(``flock`` on a file under ``data/locks``). Hold locks around synchronous
+sections only; never across an ``await``.
+
+Request handlers use the ``*_async`` variants (or ``run``), which do the
+blocking work in the thread pool so a slow disk never stalls the event loop.
+"""
+import io
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+LOCK_FOLDER = Path("data/locks")
+
+
+# --- Reads ---
+def read_json(path, default=None):
+    path = Path(path)
+    if not path.exists():
+        return default
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def read_text(path) -> str:
+    with open(path, "r") as f:
+        return f.read()
+
+
+# --- Atomic writes ---
+def _fsync_dir(folder: Path):
+    """Persists the rename itself; not supported on every platform."""
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_bytes(path, data: bytes):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_dir(path.parent)
+
+
+def atomic_write_text(path, text: str):
+    atomic_write_bytes(path, text.encode("utf-8"))
+
+
+def atomic_write_json(path, data, indent: int = 2):
+    atomic_write_text(path, json.dumps(data, indent=indent))
+
+
+def atomic_save_document(path, document):
+    """Saves a python-docx ``Document`` or openpyxl ``Workbook`` atomically."""
+    buffer = io.BytesIO()
+    document.save(buffer)
+    atomic_write_bytes(path, buffer.getvalue())
+
+
+# --- Locks ---
+_locks = {}
+_locks_guard = threading.Lock()
+_depth = {}
+
+
+def _thread_lock(name: str) -> threading.RLock:
+    with _locks_guard:
+        return _locks.setdefault(name, threading.RLock())
+
+
+@contextmanager
+def locked(name: str):
+    """Exclusive lock on ``name`` across threads and worker processes (re-entrant per thread)."""
+    lock = _thread_lock(name)
+    with lock:
+        outermost = _depth.get(name, 0) == 0
+        _depth[name] = _depth.get(name, 0) + 1
+        handle = None
+        try:
+            if outermost and fcntl is not None:
+                LOCK_FOLDER.mkdir(parents=True, exist_ok=True)
+                handle = open(LOCK_FOLDER / f"{name}.lock", "a")
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            yield
+        finally:
+            if handle is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+                handle.close()
+            _depth[name] -= 1
+
+
+def initiative_lock_name(initiative_id: int) -> str:
+    return f"initiative_{initiative_id}"
+
+
+def initiative_lock(initiative_id: int):
+    return locked(initiative_lock_name(initiative_id))
+
+
+# --- Async API (thread offload) ---
+async def run(fn, *args, **kwargs):
+    """Runs blocking work (file I/O, document building, model calls) in the thread pool."""
+    return await run_in_threadpool(fn, *args, **kwargs)
+
+
+def _under_lock(lock_name, fn, *args):
+    if lock_name is None:
+        return fn(*args)
+    with locked(lock_name):
+        return fn(*args)
+
+
+async def read_json_async(path, default=None):
+    return await run(read_json, path, default)
+
+
+async def read_text_async(path) -> str:
+    return await run(read_text, path)
+
+
+async def write_json_async(path, data, lock: str = None):
+    await run(_under_lock, lock, atomic_write_json, path, data)
+
+
+async def write_bytes_async(path, data: bytes, lock: str = None):
+    await run(_under_lock, lock, atomic_write_bytes, path, data)
+
+
+async def save_document_async(path, document, lock: str = None):
+    await run(_under_lock, lock, atomic_save_document, path, document)
+
+
+async def locked_run(lock_name: str, fn, *args):
+    """Runs ``fn(*args)`` in the thread pool while holding ``locked(lock_name)``."""
+    return await run(_under_lock, lock_name, fn, *args)
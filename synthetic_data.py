@@ -0,0 +1,300 @@
+"""
+Synthetic data generator for benchmarks and load tests.
+
+Produces initiatives in the same on-disk layout the app writes
+(``initiative_{id}.json`` + ``initiative_{id}_clinical_manufacturing.json``),
+minimal form schemas matching those fields, and synthetic vendor response
+documents (PDF or DOCX) of a configurable size.
+
+Usage:
+    python synthetic_data.py initiatives --count 5000 --root /tmp/rfp_data
+    python synthetic_data.py vendors --count 7 --size-kb 250 --format pdf --out /tmp/responses
+"""
+import argparse
+import io
+import json
+import random
+from pathlib import Path
+
+COMPANIES = ["ABC Pharma", "Helix Bio", "Northwind Therapeutics", "Aurora Biologics", "Keystone Pharma",
+             "BlueRiver Bio", "Meridian Oncology", "Cobalt Genetics", "Solstice Vaccines", "Tidewater Rx"]
+CONTACTS = ["John Doe", "Priya Shah", "Marco Rossi", "Ana Lima", "Wei Chen", "Fatima Khan", "Tom Becker"]
+STAGES = ["Startup", "Clinical-stage", "Commercial", "Virtual"]
+MARKETS = ["United States (FDA)", "European Union (EMA)", "Japan (PMDA)", "China (NMPA)", "Canada (Health Canada)"]
+PROGRAMS = ["Oncology Trial", "Rare Disease Program", "Gene Therapy Launch", "Vaccine Scale-up", "Biosimilar Transfer"]
+SUBSTANCES = ["Protein X", "mAb-217", "AAV9 vector", "siRNA-44", "Peptide K", "Small molecule Z-12"]
+DOSAGE_FORMS = ["Injectable", "Lyophilized powder", "Oral solid", "Prefilled syringe", "Oral liquid"]
+CONTAINERS = ["Vial", "Prefilled syringe", "Blister", "Bottle", "Cartridge"]
+DETAIL_SERVICES = ["Drug Substance", "Drug Product", "Fill-Finish", "Analytical Testing", "Tech Transfer"]
+GMP_STANDARDS = ["FDA cGMP", "EU GMP", "PIC/S GMP", "WHO GMP"]
+DOCUMENTS = ["COA", "Batch Records", "Stability Data", "CMC Package"]
+MILESTONES = ["Tech transfer", "Engineering batch", "PPQ batches", "Commercial supply"]
+SHIPPING = ["", "2-8C cold chain", "-80C frozen", "Ambient"]
+DETAIL_SCHEMA = "clinical_manufacturing"
+CRITERIA_FIELDS = ["criteria_technical", "criteria_quality", "criteria_pm", "criteria_supply", "criteria_cost"]
+
+VENDOR_SECTIONS = [
+    ("Company Overview", "{vendor} is a global CDMO with FDA and EMA inspected sites and {years} years of "
+                         "biologics manufacturing experience across clinical and commercial programs."),
+    ("Technical Approach", "Tech transfer follows a structured four-phase process with comparability packages; "
+                           "platforms scale to {scale} L with yield optimisation of {yield_gain}%."),
+    ("Project Plan", "A dedicated program manager leads kickoff, engineering batch, three PPQ batches and "
+                     "commercial supply from Q{quarter} {year}."),
+    ("Regulatory & Quality", "Sites operate under {gmp} with the last inspection in {inspection} and no "
+                             "critical observations; QC analytics are performed in-house."),
+    ("Supply Reliability", "Business continuity relies on dual-site production and safety stock of "
+                           "{buffer} weeks for critical raw materials."),
+    ("Commercials", "Indicative pricing is USD {price} per batch with volume discounts above {volume} batches."),
+]
+
+
+# --- Initiatives ---
+def make_initiative(initiative_id: int, rng: random.Random) -> tuple:
+    """Returns (base, details) records in the field layout of the web forms."""
+    markets = rng.sample(MARKETS, rng.choice([1, 1, 2]))
+    base = {
+        "company_name": rng.choice(COMPANIES),
+        "primary_contact": rng.choice(CONTACTS),
+        "email": f"contact{initiative_id}@example.com",
+        "project_name": rng.choice(PROGRAMS),
+        "company_stage": rng.choice(STAGES),
+        "request_type": "Clinical",
+        "services_needed": "Manufacturing",
+        "target_markets": markets[0] if len(markets) == 1 else markets,
+        "additional_info": "",
+        "initiative_id": initiative_id,
+    }
+    weights = [rng.randint(1, 6) for _ in CRITERIA_FIELDS]
+    percents = [w * 100 // sum(weights) for w in weights]
+    percents[0] += 100 - sum(percents)
+    details = {
+        "drug_substance": rng.choice(SUBSTANCES),
+        "dosage_form": rng.choice(DOSAGE_FORMS),
+        "strength": f"{rng.choice([5, 10, 25, 50, 100])} mg/mL",
+        "container_system": rng.choice(CONTAINERS),
+        "shelf_life": str(rng.choice([12, 18, 24, 36])),
+        "services_needed": rng.choice(DETAIL_SERVICES),
+        "batch_size": str(rng.choice([50, 100, 200, 500, 2000])),
+        "num_batches": str(rng.randint(1, 12)),
+        "timeline": f"{rng.randint(2026, 2028)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "gmp_standard": rng.choice(GMP_STANDARDS),
+        "documentation_needed": rng.choice(DOCUMENTS),
+        "milestones": ", ".join(rng.sample(MILESTONES, 2)),
+        "shipping_reqs": rng.choice(SHIPPING),
+        "temperature_controlled": rng.choice(["Yes", "No"]),
+        "budget_range": str(rng.choice([250000, 500000, 1000000, 2500000])),
+    }
+    details.update({field: str(p) for field, p in zip(CRITERIA_FIELDS, percents)})
+    return base, details
+
+
+def write_initiatives(count: int, submission_folder: Path, start_id: int = 1, seed: int = 0,
+                      detail_ratio: float = 1.0) -> list:
+    """Writes ``count`` initiatives and returns their ids."""
+    rng = random.Random(seed)
+    submission_folder.mkdir(parents=True, exist_ok=True)
+    ids = []
+    for initiative_id in range(start_id, start_id + count):
+        base, details = make_initiative(initiative_id, rng)
+        with open(submission_folder / f"initiative_{initiative_id}.json", "w") as f:
+            json.dump(base, f, indent=2)
+        if rng.random() < detail_ratio:
+            with open(submission_folder / f"initiative_{initiative_id}_{DETAIL_SCHEMA}.json", "w") as f:
+                json.dump(details, f, indent=2)
+        ids.append(initiative_id)
+    return ids
+
+
+def _field(name, label, ftype="text", section="General", options=None, required=False):
+    field = {"name": name, "label": label, "type": ftype, "section": section}
+    if options:
+        field["options"] = options
+    if required:
+        field["required"] = True
+    return field
+
+
+def form_schemas() -> dict:
+    """Minimal schemas matching the sample submission field layout."""
+    main_schema = {"title": "New Vendor Request", "fields": [
+        _field("company_name", "Company Name", section="Company", required=True),
+        _field("primary_contact", "Primary Contact", section="Company"),
+        _field("email", "Email", "email", section="Company"),
+        _field("project_name", "Project Name", section="Project"),
+        _field("company_stage", "Company Stage", "select", "Company", STAGES),
+        _field("request_type", "Request Type", "select", "Project", ["Clinical", "Commercial"]),
+        _field("services_needed", "Services Needed", "select", "Project", ["Manufacturing", "Testing", "Packaging"]),
+        _field("target_markets", "Target Markets", "checkbox", "Project", MARKETS),
+        _field("additional_info", "Additional Information", "textarea", "Project"),
+    ]}
+    details_schema = {"title": "Clinical Manufacturing Details", "fields": [
+        _field("drug_substance", "Drug Substance", section="Product"),
+        _field("dosage_form", "Dosage Form", "select", "Product", DOSAGE_FORMS),
+        _field("strength", "Strength", section="Product"),
+        _field("container_system", "Container System", "select", "Product", CONTAINERS),
+        _field("shelf_life", "Shelf Life (months)", "number", "Product"),
+        _field("services_needed", "Services Needed", "select", "Scope", DETAIL_SERVICES),
+        _field("batch_size", "Batch Size (L)", "number", "Scope"),
+        _field("num_batches", "Number of Batches", "number", "Scope"),
+        _field("timeline", "Target Timeline", section="Scope"),
+        _field("gmp_standard", "GMP Standard", "select", "Quality", GMP_STANDARDS),
+        _field("documentation_needed", "Documentation Needed", "select", "Quality", DOCUMENTS),
+        _field("milestones", "Milestones", "textarea", "Scope"),
+        _field("shipping_reqs", "Shipping Requirements", section="Logistics"),
+        _field("temperature_controlled", "Temperature Controlled", "radio", "Logistics", ["Yes", "No"]),
+        _field("budget_range", "Budget (USD)", "number", "Commercial"),
+        _field("criteria_technical", "Technical Capability (%)", "number", "Scoring"),
+        _field("criteria_quality", "Quality & Compliance (%)", "number", "Scoring"),
+        _field("criteria_pm", "Project Management (%)", "number", "Scoring"),
+        _field("criteria_supply", "Supply Reliability (%)", "number", "Scoring"),
+        _field("criteria_cost", "Cost Competitiveness (%)", "number", "Scoring"),
+    ]}
+    return {"form_schema.json": main_schema, f"{DETAIL_SCHEMA}.json": details_schema}
+
+
+def write_schemas(schema_dir: Path, overwrite: bool = False):
+    schema_dir.mkdir(parents=True, exist_ok=True)
+    for file_name, schema in form_schemas().items():
+        path = schema_dir / file_name
+        if overwrite or not path.exists():
+            with open(path, "w") as f:
+                json.dump(schema, f, indent=2)
+
+
+# --- Vendor responses ---
+def vendor_lines(vendor: str, size_kb: int, rng: random.Random) -> list:
+    """Proposal text of roughly ``size_kb`` kilobytes as a list of lines."""
+    lines = [f"{vendor} - Response to Request for Proposal"]
+    total = len(lines[0])
+    section = 0
+    while total < size_kb * 1024:
+        title, body = VENDOR_SECTIONS[section % len(VENDOR_SECTIONS)]
+        text = body.format(
+            vendor=vendor, years=rng.randint(5, 60), scale=rng.choice([200, 500, 2000]),
+            yield_gain=rng.randint(5, 30), quarter=rng.randint(1, 4), year=rng.randint(2026, 2028),
+            gmp=rng.choice(GMP_STANDARDS), inspection=rng.randint(2019, 2025), buffer=rng.randint(4, 16),
+            price=f"{rng.randint(150, 900)},000", volume=rng.randint(3, 10),
+        )
+        new_lines = [f"Section {section + 1} - {title}"] + _wrap(text, 90)
+        lines += new_lines
+        total += sum(len(line) + 1 for line in new_lines)
+        section += 1
+    return lines
+
+
+def _wrap(text: str, width: int) -> list:
+    lines, current = [], ""
+    for word in text.split():
+        if current and len(current) + len(word) + 1 > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}".strip()
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _pdf_escape(text: str) -> str:
+    text = text.encode("latin-1", errors="replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def build_pdf(lines: list, lines_per_page: int = 55) -> bytes:
+    """Writes a plain multi-page text PDF without third-party dependencies."""
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[""]]
+    first_page_id = 4
+    kids = " ".join(f"{first_page_id + i * 2} 0 R" for i in range(len(pages)))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, page_lines in enumerate(pages):
+        content_id = first_page_id + i * 2 + 1
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {content_id} 0 R >>".encode()
+        )
+        text_ops = " ".join(f"({_pdf_escape(line)}) Tj T*" for line in page_lines)
+        stream = f"BT /F1 10 Tf 13 TL 50 760 Td {text_ops} ET".encode("latin-1")
+        objects.append(b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref_offset = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def build_docx(lines: list) -> bytes:
+    from docx import Document
+
+    doc = Document()
+    for line in lines:
+        if line.startswith("Section "):
+            doc.add_heading(line, level=2)
+        else:
+            doc.add_paragraph(line)
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+def make_vendor_documents(count: int, size_kb: int = 50, fmt: str = "pdf", seed: int = 0) -> dict:
+    """Returns {filename: bytes} for ``count`` synthetic vendor responses."""
+    rng = random.Random(seed)
+    documents = {}
+    for i in range(count):
+        vendor = f"{rng.choice(['Apex', 'Nova', 'Vertex', 'Sterling', 'Halo', 'Orion', 'Summit'])} " \
+                 f"{rng.choice(['Biologics', 'CDMO', 'Pharma Services', 'Manufacturing'])} {i + 1}"
+        lines = vendor_lines(vendor, size_kb, rng)
+        file_fmt = fmt if fmt != "mixed" else ("pdf" if i % 2 == 0 else "docx")
+        content = build_pdf(lines) if file_fmt == "pdf" else build_docx(lines)
+        documents[f"CDMO Response {i + 1}.{file_fmt}"] = content
+    return documents
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Generate synthetic initiatives and vendor responses.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    init_cmd = sub.add_parser("initiatives", help="Write N initiatives plus form schemas under --root.")
+    init_cmd.add_argument("--count", type=int, default=1000)
+    init_cmd.add_argument("--root", default=".")
+    init_cmd.add_argument("--seed", type=int, default=0)
+
+    vendor_cmd = sub.add_parser("vendors", help="Write synthetic vendor response documents.")
+    vendor_cmd.add_argument("--count", type=int, default=7)
+    vendor_cmd.add_argument("--size-kb", type=int, default=50)
+    vendor_cmd.add_argument("--format", choices=["pdf", "docx", "mixed"], default="pdf")
+    vendor_cmd.add_argument("--out", default="synthetic_vendor_responses")
+    vendor_cmd.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "initiatives":
+        root = Path(args.root)
+        ids = write_initiatives(args.count, root / "data" / "submissions", seed=args.seed)
+        write_schemas(root / "schema")
+        counter_file = root / "global" / "global_counter.json"
+        counter_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(counter_file, "w") as f:
+            json.dump({"last_id": ids[-1] if ids else 0}, f, indent=2)
+        print(f"wrote {len(ids)} initiatives to {root / 'data' / 'submissions'}")
+    else:
+        out = Path(args.out)
+        out.mkdir(parents=True, exist_ok=True)
+        for name, content in make_vendor_documents(args.count, args.size_kb, args.format, args.seed).items():
+            (out / name).write_bytes(content)
+        print(f"wrote {args.count} vendor responses to {out}")
+
+
+if __name__ == "__main__":
+    main_cli()
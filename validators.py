@@ -0,0 +1,248 @@
+"""
+Typed validation of form posts, compiled from the JSON form schemas.
+
+``validator_for(path)`` compiles a schema file into a ``FormValidator`` once and
+keeps it until the file changes. ``validate`` turns a posted form (or an
+imported record) into a typed record:
+
+* ``number`` fields become ``int`` or ``float`` (``None`` when left blank),
+* ``checkbox`` fields become lists (``[]`` when nothing is ticked),
+* ``select``, ``radio`` and ``checkbox`` values must be one of the options,
+* ``required`` fields must be filled in,
+* ``criteria_*`` weight fields, once any is filled in, must total 100.
+
+Keys the schema does not know are kept as posted. Stored records are
+therefore ready for scoring and prompting without re-parsing.
+
+Usage:
+    python validators.py check                      # validate every stored submission
+    python validators.py import initiatives.json    # [{"base": {...}, "details": {schema: {...}}}, ...]
+"""
+import argparse
+import json
+import re
+import sys
+import threading
+from pathlib import Path
+
+import storage
+
+SCHEMA_DIR = Path("schema")
+MAIN_SCHEMA = "form_schema"
+SUBMISSION_FOLDER = Path("data/submissions")
+WEIGHT_PREFIX = "criteria_"
+WEIGHT_TOTAL = 100
+WEIGHT_TOLERANCE = 0.5
+CHOICE_TYPES = ("select", "radio", "checkbox")
+
+_cache = {}  # schema path -> (mtime_ns, FormValidator)
+_cache_lock = threading.Lock()
+
+
+def form_to_dict(items) -> dict:
+    """Form ``(name, value)`` pairs to a dict; repeated names (checkboxes) become lists."""
+    data = {}
+    for key, value in items:
+        if key in data:
+            if isinstance(data[key], list):
+                data[key].append(value)
+            else:
+                data[key] = [data[key], value]
+        else:
+            data[key] = value
+    return data
+
+
+# --- Field coercion ---
+def _is_blank(value) -> bool:
+    return value is None or value == [] or (isinstance(value, str) and not value.strip())
+
+
+def _to_number(value):
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, (int, float)):
+        return value
+    number = float(re.sub(r"[,_\s]", "", str(value)))
+    if number != number or number in (float("inf"), float("-inf")):
+        raise ValueError
+    return int(number) if number.is_integer() else number
+
+
+class FormValidator:
+    """Per-field coercers compiled from one form schema."""
+
+    def __init__(self, schema: dict):
+        self.fields = {}
+        for field in schema.get("fields", []):
+            ftype = field.get("type", "text")
+            self.fields[field["name"]] = {
+                "label": field.get("label", field["name"]),
+                "type": ftype,
+                "required": bool(field.get("required")),
+                "options": {str(o): o for o in field.get("options", [])} if ftype in CHOICE_TYPES else None,
+            }
+        self.weight_fields = [name for name, f in self.fields.items()
+                              if name.startswith(WEIGHT_PREFIX) and f["type"] == "number"]
+
+    def _coerce(self, name: str, value, errors: list):
+        field = self.fields[name]
+        label, ftype, options = field["label"], field["type"], field["options"]
+        if ftype == "checkbox":
+            values = value if isinstance(value, list) else ([] if _is_blank(value) else str(value).split(","))
+            values = [str(v).strip() for v in values if not _is_blank(v)]
+            unknown = [v for v in values if options and v not in options]
+            if unknown:
+                errors.append(f"{label}: unknown option(s) {', '.join(unknown)}")
+            return values
+        if isinstance(value, list):
+            # A single-valued field posted more than once: the last value wins, as in the browser
+            value = value[-1] if value else ""
+        if _is_blank(value):
+            return None if ftype == "number" else ""
+        if ftype == "number":
+            try:
+                return _to_number(value)
+            except ValueError:
+                errors.append(f"{label}: '{value}' is not a number")
+                return value
+        value = str(value).strip()
+        if options and value not in options:
+            errors.append(f"{label}: '{value}' is not one of the options")
+        return value
+
+    def validate(self, data) -> tuple:
+        """``(record, errors)`` for a dict or form ``(name, value)`` pairs."""
+        raw = data if isinstance(data, dict) else form_to_dict(data)
+        record, errors = {}, []
+        for name, value in raw.items():
+            record[name] = self._coerce(name, value, errors) if name in self.fields else value
+        for name, field in self.fields.items():
+            if field["type"] == "checkbox":
+                record.setdefault(name, [])
+            if field["required"] and _is_blank(record.get(name)):
+                errors.append(f"{field['label']}: required")
+
+        filled = [record[name] for name in self.weight_fields if record.get(name) is not None]
+        # Weights that are not numbers were reported above
+        if filled and all(isinstance(w, (int, float)) for w in filled):
+            if min(filled) < 0:
+                errors.append("Scoring weights: must not be negative")
+            elif abs(sum(filled) - WEIGHT_TOTAL) > WEIGHT_TOLERANCE:
+                errors.append(f"Scoring weights: must total {WEIGHT_TOTAL}% (got {sum(filled):g}%)")
+        return record, errors
+
+
+def validator_for(path: Path):
+    """The compiled validator for a schema file, or None if the file does not exist."""
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    validator = FormValidator(storage.read_json(path, {}))
+    with _cache_lock:
+        _cache[path] = (mtime, validator)
+    return validator
+
+
+def validate_form(schema_name: str, data, schema_dir: Path = SCHEMA_DIR) -> tuple:
+    """``(record, errors)`` against ``schema_dir/<schema_name>.json``; passed through untyped without a schema."""
+    validator = validator_for(schema_dir / f"{schema_name}.json")
+    if validator is None:
+        return (dict(data) if isinstance(data, dict) else form_to_dict(data)), []
+    return validator.validate(data)
+
+
+# --- Bulk import and checks ---
+def validate_initiative(record: dict, schema_dir: Path = SCHEMA_DIR) -> tuple:
+    """Validates a ``{"base": ..., "details": {schema: ...}}`` record; returns ``(typed, errors)``."""
+    typed, errors = {"base": None, "details": {}}, []
+    if record.get("base") is not None:
+        typed["base"], found = validate_form(MAIN_SCHEMA, record["base"], schema_dir)
+        errors += found
+    for schema_name, details in (record.get("details") or {}).items():
+        typed["details"][schema_name], found = validate_form(schema_name, details, schema_dir)
+        errors += [f"[{schema_name}] {e}" for e in found]
+    return typed, errors
+
+
+def import_initiatives(records: list) -> list:
+    """Validates every record, then stores each as a new initiative. Returns the new ids.
+
+    Nothing is written unless all records are valid.
+    """
+    typed, problems = [], []
+    for number, record in enumerate(records, start=1):
+        checked, errors = validate_initiative(record)
+        if record.get("base") is None:
+            errors.append("missing 'base' record")
+        typed.append(checked)
+        problems += [f"record {number}: {e}" for e in errors]
+    if problems:
+        raise ValueError("\n".join(problems))
+
+    import data_service
+    import event_log
+    import search_index
+
+    ids = []
+    for record in typed:
+        initiative_id = data_service.get_next_initiative_id()
+        base = {**record["base"], "initiative_id": initiative_id}
+        with storage.initiative_lock(initiative_id):
+            storage.atomic_write_json(SUBMISSION_FOLDER / f"initiative_{initiative_id}.json", base)
+            for schema_name, details in record["details"].items():
+                storage.atomic_write_json(SUBMISSION_FOLDER / f"initiative_{initiative_id}_{schema_name}.json", details)
+        event_log.append("initiative_created", initiative_id, record=base)
+        for schema_name, details in record["details"].items():
+            event_log.append("details_saved", initiative_id, schema=schema_name, record=details)
+        search_index.reindex_initiative(initiative_id)
+        ids.append(initiative_id)
+    event_log.flush()
+    return ids
+
+
+def check_submissions(submission_folder: Path = SUBMISSION_FOLDER) -> dict:
+    """Errors per stored submission file, for the files that have any."""
+    problems = {}
+    for path in sorted(submission_folder.glob("initiative_*.json")):
+        match = re.fullmatch(r"initiative_(\d+)(?:_(.+))?\.json", path.name)
+        if not match:
+            continue
+        _, errors = validate_form(match.group(2) or MAIN_SCHEMA, storage.read_json(path, {}))
+        if errors:
+            problems[path.name] = errors
+    return problems
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Validate stored submissions or bulk-import initiatives.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("check", help="Validate every stored submission against its schema.")
+    import_cmd = sub.add_parser("import", help="Validate and store initiatives from a JSON list.")
+    import_cmd.add_argument("file")
+    args = parser.parse_args()
+
+    if args.command == "check":
+        problems = check_submissions()
+        for name, errors in problems.items():
+            for error in errors:
+                print(f"{name}: {error}")
+        print(f"{len(problems)} submission file(s) with problems.")
+    else:
+        with open(args.file, "r") as f:
+            records = json.load(f)
+        try:
+            ids = import_initiatives(records)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        print(f"Imported {len(ids)} initiative(s): {', '.join(map(str, ids))}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,307 @@
+"""
+Per-vendor response records for an initiative.
+
+Each initiative's upload folder keeps one extracted text file per vendor under
+``texts/`` and a small ``responses_manifest.json`` with one record per vendor
+file (content hash, size, page count, extraction time, upload time, the name
+of its text file and the ``blob`` hash of the original file in ``blob_store``).
+Listing responses or showing upload status only reads the manifest; texts are
+loaded per vendor when they are actually needed.
+Uploads either replace the whole set or are appended to it; a file uploaded
+again under the same name replaces that vendor only.
+
+Folders written before this layout (a single ``combined_vendor_responses.json``,
+raw uploads next to it) are read in place, without writing anything. The first
+upload to such a folder, or the ``migrate`` command, converts it. Migrating copies
+the raw uploads into ``blob_store`` and writes the texts and manifest, but it
+leaves the legacy files where they are.
+
+Usage:
+    python vendor_responses.py migrate         # migrate every initiative folder now
+    python vendor_responses.py verify          # re-hash every referenced blob
+    python vendor_responses.py gc --dry-run    # blobs no initiative references any more
+"""
+import argparse
+import hashlib
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+
+import blob_store
+import storage
+
+VENDOR_FOLDER = Path("data/vendor_responses")
+COMBINED_FILE = "combined_vendor_responses.json"  # legacy single-file layout
+MANIFEST_FILE = "responses_manifest.json"
+TEXT_FOLDER = "texts"
+UPLOAD_MODES = ("replace", "append")
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _read_json(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def text_file_name(filename: str) -> str:
+    """Filesystem-safe, collision-free name for a vendor's extracted text."""
+    stem = re.sub(r"[^\w.\- ]", "_", filename)[:80]
+    return f"{stem}.{content_hash(filename.encode('utf-8'))[:8]}.txt"
+
+
+# --- Reading ---
+def _is_legacy(upload_dir: Path, manifest: dict) -> bool:
+    # Folders of the combined layout have no manifest, or one without per-vendor text files
+    if not (upload_dir / COMBINED_FILE).exists():
+        return False
+    return not (upload_dir / MANIFEST_FILE).exists() or any("text_file" not in r for r in manifest.values())
+
+
+def _legacy_records(upload_dir: Path, manifest: dict) -> dict:
+    """Records for the texts of a legacy combined file, keeping what its old manifest knew."""
+    combined_path = upload_dir / COMBINED_FILE
+    uploaded_at = datetime.fromtimestamp(combined_path.stat().st_mtime).isoformat(timespec="seconds")
+    records = {}
+    for filename, text in _read_json(combined_path).items():
+        record = manifest.get(filename, {})
+        raw = upload_dir / filename
+        records[filename] = {
+            # Text hash for folders that predate hashes, as the evaluation cache was keyed on it
+            "sha256": record.get("sha256") or content_hash(text.encode("utf-8")),
+            "size": record.get("size", raw.stat().st_size if raw.is_file() else None),
+            "pages": None,
+            "chars": len(text),
+            "extraction_ms": None,
+            "uploaded_at": record.get("uploaded_at", uploaded_at),
+        }
+    return records
+
+
+def load_manifest(upload_dir: Path) -> dict:
+    """filename -> record, in upload order.
+
+    A legacy folder gets read-only records marked ``"legacy": True``; nothing is written.
+    """
+    manifest = _read_json(upload_dir / MANIFEST_FILE)
+    if not _is_legacy(upload_dir, manifest):
+        return manifest
+    return {filename: {**record, "legacy": True, "blob": None}
+            for filename, record in _legacy_records(upload_dir, manifest).items()}
+
+
+def text_path(upload_dir: Path, filename: str, manifest: dict = None) -> Path:
+    """The file holding a vendor's text (the combined file for a legacy folder)."""
+    manifest = manifest if manifest is not None else load_manifest(upload_dir)
+    record = manifest.get(filename, {})
+    if record.get("legacy"):
+        return upload_dir / COMBINED_FILE
+    return upload_dir / TEXT_FOLDER / record.get("text_file", text_file_name(filename))
+
+
+def load_text(upload_dir: Path, filename: str, manifest: dict = None) -> str:
+    manifest = manifest if manifest is not None else load_manifest(upload_dir)
+    if manifest.get(filename, {}).get("legacy"):
+        return _read_json(upload_dir / COMBINED_FILE).get(filename, "")
+    return storage.read_text(text_path(upload_dir, filename, manifest))
+
+
+def read_original(upload_dir: Path, filename: str, record: dict):
+    """Bytes of the uploaded file: from ``blob_store``, or the raw file of a legacy folder. None if gone."""
+    if record.get("blob"):
+        return blob_store.read(record["blob"]) if blob_store.exists(record["blob"]) else None
+    raw = upload_dir / filename
+    if record.get("legacy") and raw.is_file() and filename not in (MANIFEST_FILE, COMBINED_FILE):
+        return raw.read_bytes()
+    return None
+
+
+def load_texts(upload_dir: Path, vendors: list = None) -> dict:
+    """Texts of ``vendors`` (default: all), reading only those files."""
+    manifest = load_manifest(upload_dir)
+    names = list(manifest) if vendors is None else [name for name in vendors if name in manifest]
+    if any(manifest[name].get("legacy") for name in names):
+        combined = _read_json(upload_dir / COMBINED_FILE)
+        return {name: combined.get(name, "") for name in names}
+    return {name: load_text(upload_dir, name, manifest) for name in names}
+
+
+def load_pages(upload_dir: Path, filename: str, first: int, last: int) -> list:
+    """[(page number, text)] for pages ``first``..``last`` of one response.
+
+    Pages within the extraction budget come from the stored text; pages past it
+    are extracted now from the original file in the blob store.
+    """
+    import extraction
+
+    manifest = load_manifest(upload_dir)
+    record = manifest[filename]
+    if record.get("legacy") or (record.get("truncated") and record.get("pages") == 1):
+        # No page offsets, or a Word or text file cut short within its only page
+        original = read_original(upload_dir, filename, record)
+        if original is not None:
+            return extraction.extract_pages(filename, original, first, last)
+    offsets = record.get("page_offsets") or []
+    pages = []
+    if offsets:
+        text = load_text(upload_dir, filename, manifest)
+        ends = offsets[1:] + [len(text) + len(extraction.PAGE_SEPARATOR)]
+        for number in range(max(first, 1), min(last, len(offsets)) + 1):
+            start, end = offsets[number - 1], ends[number - 1] - len(extraction.PAGE_SEPARATOR)
+            pages.append((number, text[start:max(start, end)]))
+        first = max(first, len(offsets) + 1)
+    if first <= last and (not offsets or record.get("truncated")) and record.get("blob"):
+        pages += extraction.extract_pages(filename, blob_store.read(record["blob"]), first, last)
+    return pages
+
+
+def vendor_hashes(upload_dir: Path, vendors: list) -> dict:
+    """Content hash per vendor, as recorded in the manifest."""
+    manifest = load_manifest(upload_dir)
+    return {name: manifest[name]["sha256"] for name in vendors if name in manifest}
+
+
+# --- Writing ---
+def save_responses(upload_dir: Path, uploads: dict, mode: str = "replace") -> tuple:
+    """Stores newly uploaded responses; call under the initiative lock.
+
+    ``uploads`` maps filename -> {"text", "sha256", "size", "pages",
+    "extraction_ms", "blob"} and optionally "pages_extracted", "truncated" and
+    "page_offsets" (see ``extraction.extract``) and the ``uploaded_at`` to keep. Only the uploaded vendors' text files are written;
+    the original files must already be in ``blob_store``.
+    Returns ``(manifest, changed)`` where ``changed`` lists the vendors whose
+    content is new or different from what was stored before.
+    """
+    # Appended uploads need the legacy vendors as real records
+    migrate(upload_dir)
+    previous_manifest = load_manifest(upload_dir)
+    manifest = dict(previous_manifest) if mode == "append" else {}
+
+    now = datetime.now().isoformat(timespec="seconds")
+    changed = []
+    for filename, upload in uploads.items():
+        if previous_manifest.get(filename, {}).get("sha256") != upload["sha256"]:
+            changed.append(filename)
+        record = {
+            "sha256": upload["sha256"],
+            "size": upload["size"],
+            "pages": upload.get("pages"),
+            "pages_extracted": upload.get("pages_extracted", upload.get("pages")),
+            "truncated": upload.get("truncated", False),
+            "page_offsets": upload.get("page_offsets"),
+            "chars": len(upload["text"]),
+            "extraction_ms": upload.get("extraction_ms"),
+            "uploaded_at": upload.get("uploaded_at") or now,
+            "text_file": text_file_name(filename),
+            "blob": upload.get("blob"),
+        }
+        storage.atomic_write_text(upload_dir / TEXT_FOLDER / record["text_file"], upload["text"])
+        manifest[filename] = record
+
+    storage.atomic_write_json(upload_dir / MANIFEST_FILE, manifest)
+    # Text files of vendors dropped by a replace upload
+    for filename, record in previous_manifest.items():
+        if filename not in manifest:
+            (upload_dir / TEXT_FOLDER / record["text_file"]).unlink(missing_ok=True)
+    return manifest, changed
+
+
+# --- Migration from combined_vendor_responses.json and raw files ---
+def _raw_file_details(path: Path) -> tuple:
+    """(size, page count) of an uploaded file kept next to the texts, if it is still there."""
+    if not path.is_file():
+        return None, None
+    pages = 1
+    if path.suffix.lower() == ".pdf":
+        from PyPDF2 import PdfReader
+
+        try:
+            pages = len(PdfReader(str(path)).pages)
+        except Exception:
+            pages = None
+    return path.stat().st_size, pages
+
+
+def _split_combined(upload_dir: Path) -> dict:
+    migrated = _legacy_records(upload_dir, _read_json(upload_dir / MANIFEST_FILE))
+    combined = _read_json(upload_dir / COMBINED_FILE)
+    for filename, record in migrated.items():
+        _, record["pages"] = _raw_file_details(upload_dir / filename)
+        record["text_file"] = text_file_name(filename)
+        storage.atomic_write_text(upload_dir / TEXT_FOLDER / record["text_file"], combined[filename])
+    return migrated
+
+
+def migrate(upload_dir: Path) -> bool:
+    """Splits a legacy combined file into per-vendor texts and copies raw uploads
+    into the blob store. The legacy files are left in place; once the manifest
+    exists, the folder counts as migrated. Idempotent; returns True if anything changed."""
+    # The folder is named like the initiative's lock, so uploads and comparisons wait for this
+    with storage.locked(upload_dir.name):
+        manifest = _read_json(upload_dir / MANIFEST_FILE)
+        if _is_legacy(upload_dir, manifest):
+            manifest = _split_combined(upload_dir)
+        elif all("blob" in record for record in manifest.values()):
+            return False
+        for filename, record in manifest.items():
+            if "blob" in record:
+                continue
+            raw = upload_dir / filename
+            # An upload named like one of our own files was overwritten by it long ago
+            if raw.is_file() and filename not in (MANIFEST_FILE, COMBINED_FILE):
+                record["blob"] = blob_store.put(raw.read_bytes())
+            else:
+                record["blob"] = None
+        storage.atomic_write_json(upload_dir / MANIFEST_FILE, manifest)
+    return True
+
+
+def initiative_folders(vendor_folder: Path = VENDOR_FOLDER) -> list:
+    return [path for path in sorted(vendor_folder.glob("initiative_*")) if path.is_dir()]
+
+
+def migrate_all(vendor_folder: Path = VENDOR_FOLDER) -> int:
+    return sum(migrate(upload_dir) for upload_dir in initiative_folders(vendor_folder))
+
+
+def referenced_blobs(vendor_folder: Path = VENDOR_FOLDER) -> dict:
+    """blob hash -> ["initiative_N/filename", ...] across every manifest."""
+    refs = {}
+    for upload_dir in initiative_folders(vendor_folder):
+        for filename, record in load_manifest(upload_dir).items():
+            if record.get("blob"):
+                refs.setdefault(record["blob"], []).append(f"{upload_dir.name}/{filename}")
+    return refs
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Maintain stored vendor responses.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="Convert legacy initiative folders to per-vendor texts and blobs.")
+    sub.add_parser("verify", help="Check every referenced blob against its hash.")
+    gc_cmd = sub.add_parser("gc", help="Delete blobs that no initiative references.")
+    gc_cmd.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    if args.command == "migrate":
+        print(f"Migrated {migrate_all()} initiative folder(s).")
+    elif args.command == "verify":
+        refs = referenced_blobs()
+        bad = 0
+        for sha256, users in refs.items():
+            if not blob_store.verify(sha256):
+                bad += 1
+                print(f"MISSING OR CORRUPT {sha256}: {', '.join(users)}")
+        print(f"Checked {len(refs)} blob(s), {bad} problem(s).")
+    elif args.command == "gc":
+        stats = blob_store.collect_garbage(set(referenced_blobs()), dry_run=args.dry_run)
+        action = "Would remove" if args.dry_run else "Removed"
+        print(f"{action} {stats['removed']} blob(s) ({stats['freed_bytes'] / 1024:,.0f} KB), kept {stats['kept']}.")
+
+
+if __name__ == "__main__":
+    main_cli()
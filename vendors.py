@@ -0,0 +1,260 @@
+"""
+Local vendor registry with indexed capability matching.
+
+Vendors live in ``data/vendors/registry.json`` as a list of records:
+
+    {
+      "vendor_id": "lonza-ag",
+      "name": "Lonza AG",
+      "services": ["Drug Substance", "Fill-Finish"],
+      "gmp_standards": ["FDA cGMP", "EU GMP"],
+      "markets": ["United States (FDA)", "European Union (EMA)"],
+      "modalities": ["Injectable", "Lyophilized powder"],
+      "capabilities": ["AAV", "Tech Transfer"],
+      "participation": [{"initiative_id": 2, "score": 8.2, "rank": 1, "date": "2025-10-01"}]
+    }
+
+On load we build one inverted index per matchable field (normalised term ->
+vendor ids), so shortlisting an initiative only touches vendors that share at
+least one requested term and runs in milliseconds regardless of registry size.
+The process-wide registry is read and changed under the ``vendor_registry``
+lock, so a shortlist never sees a registry that is being reloaded or updated.
+
+Usage:
+    python vendors.py import my_vendors.json
+    python vendors.py list
+    python vendors.py match 12 clinical_manufacturing
+"""
+import argparse
+import json
+import re
+from datetime import date
+from pathlib import Path
+
+import storage
+
+REGISTRY_FILE = Path("data/vendors/registry.json")
+REGISTRY_LOCK = "vendor_registry"
+SUBMISSION_FOLDER = Path("data/submissions")
+
+INDEXED_FIELDS = ("services", "gmp_standards", "markets", "modalities", "capabilities")
+MATCH_WEIGHTS = {"services": 3.0, "gmp_standards": 2.5, "markets": 2.0, "modalities": 2.0, "capabilities": 1.0}
+HISTORY_WEIGHT = 1.0  # bonus for a perfect 10/10 average in past comparisons
+
+# Initiative fields -> registry fields they are matched against
+REQUIREMENT_FIELDS = {
+    "services_needed": ("services", "capabilities"),
+    "gmp_standard": ("gmp_standards",),
+    "target_markets": ("markets",),
+    "dosage_form": ("modalities",),
+}
+
+
+def vendor_id_for(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def _terms(value) -> set:
+    """Normalised match terms; ``United States (FDA)`` also yields ``fda``."""
+    values = value if isinstance(value, list) else [value]
+    terms = set()
+    for v in values:
+        if v is None or str(v).strip() == "":
+            continue
+        text = str(v).strip().lower()
+        terms.add(re.sub(r"\s+", " ", text))
+        terms.update(t.strip() for t in re.findall(r"\(([^)]+)\)", text))
+    return terms
+
+
+class VendorRegistry:
+    def __init__(self, path: Path = REGISTRY_FILE):
+        self.path = path
+        self.vendors = {}
+        self.index = {field: {} for field in INDEXED_FIELDS}
+        self.mtime = None
+        self.load()
+
+    # --- Persistence ---
+    def load(self):
+        vendors = {}
+        if self.path.exists():
+            with open(self.path, "r") as f:
+                for record in json.load(f):
+                    record.setdefault("vendor_id", vendor_id_for(record["name"]))
+                    record.setdefault("participation", [])
+                    vendors[record["vendor_id"]] = record
+            self.mtime = self.path.stat().st_mtime_ns
+        self.vendors = vendors
+        self._build_index()
+
+    def save(self):
+        storage.atomic_write_json(self.path, sorted(self.vendors.values(), key=lambda v: v["name"]))
+        self.mtime = self.path.stat().st_mtime_ns
+
+    def is_stale(self) -> bool:
+        current = self.path.stat().st_mtime_ns if self.path.exists() else None
+        return current != self.mtime
+
+    # --- Indexes ---
+    def _build_index(self):
+        self.index = {field: {} for field in INDEXED_FIELDS}
+        for vendor_id, record in self.vendors.items():
+            self._index_vendor(vendor_id, record)
+
+    def _index_vendor(self, vendor_id: str, record: dict):
+        for field in INDEXED_FIELDS:
+            for term in _terms(record.get(field, [])):
+                self.index[field].setdefault(term, set()).add(vendor_id)
+
+    def _unindex_vendor(self, vendor_id: str):
+        for postings in self.index.values():
+            for ids in postings.values():
+                ids.discard(vendor_id)
+
+    # --- Mutations ---
+    def upsert(self, record: dict) -> dict:
+        """Adds or merges a vendor; list fields are unioned, scalars overwritten."""
+        vendor_id = record.get("vendor_id") or vendor_id_for(record["name"])
+        existing = self.vendors.get(vendor_id, {"vendor_id": vendor_id, "name": record["name"], "participation": []})
+        for key, value in record.items():
+            if key in INDEXED_FIELDS:
+                merged = list(existing.get(key, []))
+                merged += [v for v in (value if isinstance(value, list) else [value]) if v not in merged]
+                existing[key] = merged
+            elif key != "participation":
+                existing[key] = value
+        existing["vendor_id"] = vendor_id
+        self._unindex_vendor(vendor_id)
+        self.vendors[vendor_id] = existing
+        self._index_vendor(vendor_id, existing)
+        return existing
+
+    def record_participation(self, name: str, initiative_id: int, score: float = None, rank: int = None):
+        record = self.upsert({"name": name})
+        history = [p for p in record["participation"] if p.get("initiative_id") != initiative_id]
+        history.append({"initiative_id": initiative_id, "score": score, "rank": rank, "date": date.today().isoformat()})
+        record["participation"] = history
+
+    # --- Matching ---
+    def average_score(self, record: dict):
+        scores = [p["score"] for p in record.get("participation", []) if p.get("score") is not None]
+        return sum(scores) / len(scores) if scores else None
+
+    def shortlist(self, initiative_data: dict, limit: int = 7) -> list:
+        """Ranks vendors against an initiative's requirements.
+
+        Each requirement field contributes its weight times the fraction of
+        requested terms the vendor covers; past comparison scores add a small
+        bonus. Returns dicts with ``vendor``, ``score`` and ``matched`` terms.
+        """
+        with storage.locked(REGISTRY_LOCK):
+            return self._shortlist(initiative_data, limit)
+
+    def _shortlist(self, initiative_data: dict, limit: int) -> list:
+        requested = {}
+        for source_field, registry_fields in REQUIREMENT_FIELDS.items():
+            for registry_field in registry_fields:
+                requested.setdefault(registry_field, set()).update(_terms(initiative_data.get(source_field)))
+
+        candidates = {}
+        for field, terms in requested.items():
+            for term in terms:
+                for vendor_id in self.index[field].get(term, ()):
+                    candidates.setdefault(vendor_id, {}).setdefault(field, set()).add(term)
+
+        ranked = []
+        for vendor_id, matched in candidates.items():
+            record = self.vendors[vendor_id]
+            score = sum(MATCH_WEIGHTS[field] * len(terms) / len(requested[field]) for field, terms in matched.items())
+            average = self.average_score(record)
+            if average is not None:
+                score += HISTORY_WEIGHT * average / 10
+            ranked.append({
+                "vendor": record,
+                "score": round(score, 3),
+                "matched": {field: sorted(terms) for field, terms in matched.items()},
+            })
+        ranked.sort(key=lambda r: (-r["score"], r["vendor"]["name"]))
+        return ranked[:limit]
+
+
+_registry = None
+
+
+def get_registry() -> VendorRegistry:
+    """Process-wide registry, reloaded when another worker has rewritten the file.
+
+    Hold ``storage.locked(REGISTRY_LOCK)`` around changes and the ``save`` that follows.
+    """
+    global _registry
+    with storage.locked(REGISTRY_LOCK):
+        if _registry is None or _registry.path != REGISTRY_FILE:
+            _registry = VendorRegistry(REGISTRY_FILE)
+        elif _registry.is_stale():
+            _registry.load()
+        return _registry
+
+
+def justification_prompt(initiative_data: dict, candidates: list) -> str:
+    """Prompt asking the model to justify an already ranked shortlist (it must not add vendors)."""
+    requirements = {key: initiative_data.get(key) for key in
+                    ("request_type", "services_needed", "gmp_standard", "target_markets", "dosage_form",
+                     "drug_substance", "batch_size", "timeline") if initiative_data.get(key)}
+    profiles = [
+        {key: c["vendor"].get(key) for key in ("name",) + INDEXED_FIELDS if c["vendor"].get(key)}
+        for c in candidates
+    ]
+    return f"""
+You are a pharmaceutical industry sourcing specialist. The vendors below were shortlisted for this project from our vendor registry.
+For each vendor, write a brief (1-2 sentence) justification of why they are a good match for the project requirements. Do not add or remove vendors.
+
+Project Requirements:
+{json.dumps(requirements, indent=2)}
+
+Shortlisted Vendors:
+{json.dumps(profiles, indent=2)}
+
+Respond with a single JSON object mapping each vendor name to its justification, and nothing else.
+"""
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Manage the local vendor registry.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_cmd = sub.add_parser("import", help="Merge vendor records from a JSON list.")
+    import_cmd.add_argument("file")
+    sub.add_parser("list", help="List registered vendors.")
+    match_cmd = sub.add_parser("match", help="Shortlist vendors for an initiative.")
+    match_cmd.add_argument("initiative_id", type=int)
+    match_cmd.add_argument("schema_name")
+    match_cmd.add_argument("--limit", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        with open(args.file, "r") as f:
+            records = json.load(f)
+        # Web workers may be recording comparison results at the same time
+        with storage.locked(REGISTRY_LOCK):
+            registry = get_registry()
+            for record in records:
+                registry.upsert(record)
+            registry.save()
+        print(f"imported {len(records)} vendors ({len(registry.vendors)} registered)")
+        return
+    registry = get_registry()
+    if args.command == "list":
+        for record in sorted(registry.vendors.values(), key=lambda v: v["name"]):
+            print(f"{record['name']:<40} services={', '.join(record.get('services', []))}")
+    else:
+        data = {}
+        for path in (SUBMISSION_FOLDER / f"initiative_{args.initiative_id}.json",
+                     SUBMISSION_FOLDER / f"initiative_{args.initiative_id}_{args.schema_name}.json"):
+            with open(path, "r") as f:
+                data.update(json.load(f))
+        for c in registry.shortlist(data, args.limit):
+            print(f"{c['score']:>6.2f}  {c['vendor']['name']:<40} {c['matched']}")
+
+
+if __name__ == "__main__":
+    main_cli()